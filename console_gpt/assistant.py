@@ -54,12 +54,10 @@ def assistant(console, data) -> None:
             )
             break
         conversation = message.id
-        # Start the loading bar until API response is returned
-        with console.status("[bold green]Generating a response...", spinner="aesthetic"):
-            # Step 4: Run the Assistant
-            run_thread(client, data.assistant_id, data.thread_id)
-        # Step 6: Display the Assistant's Response
-        conversation, new_replies = update_conversation(client, conversation, data.thread_id)
+        # Step 4: Run the Assistant, the reply is rendered while it streams
+        shown = run_thread(client, data.assistant_id, data.thread_id, console, capitalize(data.assistant_name))
+        # Step 6: Display anything the stream did not render
+        conversation, new_replies = update_conversation(client, conversation, data.thread_id, shown)
         if new_replies:
             for reply in new_replies:
                 assistance_reply(reply["content"], capitalize(data.assistant_name))
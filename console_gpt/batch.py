@@ -0,0 +1,391 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from unichat import MODELS_LIST
+from unichat.api_helper import openai
+
+from console_gpt.config_manager import fetch_variable
+from console_gpt.custom_stdout import custom_print
+from console_gpt.event_loop import run_until_complete
+from console_gpt.model_requests import (build_request_params, create_client,
+                                        create_response, uses_responses_api)
+from console_gpt.provider_gateway import acall, limiter_for
+
+"""
+Headless batch mode: runs a JSONL file of conversations through the configured models without any menus.
+
+Input lines:  {"id": "q1", "model": "gpt-5", "messages": [...], "temperature": 1}
+              or {"id": "q1", "prompt": "...", "system": "..."}; "model" and "temperature" are optional.
+Output lines: {"id", "model", "content", "usage", "latency"} or {"id", "model", "error"}.
+
+The output file doubles as the checkpoint: ids with a successful record are skipped when the same command is
+run again, failed ones are retried and the last record of an id wins. OpenAI batch jobs that were submitted
+but not collected yet are kept in "<output>.batches.json".
+"""
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RETRIES = 4
+BATCH_POLL_INTERVAL = 30
+# The Batch API accepts up to 50k requests per input file
+BATCH_MAX_REQUESTS = 50000
+PROGRESS_EVERY = 25
+
+
+def _valid_messages(messages: Any) -> bool:
+    """A non-empty list of {"role": str, "content": str or list of parts} messages."""
+    return (
+        isinstance(messages, list)
+        and bool(messages)
+        and all(
+            isinstance(message, dict)
+            and isinstance(message.get("role"), str)
+            and isinstance(message.get("content"), (str, list))
+            for message in messages
+        )
+    )
+
+
+def load_jobs(input_path: str) -> List[Dict[str, Any]]:
+    """
+    Read and normalize the input file
+    :param input_path: path of the JSONL file
+    :return: jobs with "id", "model", "messages" and "temperature" keys
+    """
+    jobs = []
+    first_lines: Dict[str, int] = {}
+    with open(input_path, encoding="utf-8") as file:
+        for line_number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                messages = entry.get("messages")
+                if messages is None:
+                    messages = [{"role": "user", "content": entry["prompt"]}]
+                    if entry.get("system"):
+                        messages.insert(0, {"role": "system", "content": entry["system"]})
+            except (ValueError, KeyError, AttributeError):
+                messages = None
+            if not _valid_messages(messages):
+                custom_print(
+                    "error",
+                    f"Skipping line {line_number} of {input_path}: expected a JSON object with a prompt or "
+                    f"a non-empty list of role/content messages",
+                )
+                continue
+            job_id = str(entry.get("id", f"line-{line_number}"))
+            if job_id in first_lines:
+                # Results are matched to jobs by id, a second job would be skipped or mixed up on resume
+                custom_print(
+                    "error",
+                    f"Skipping line {line_number} of {input_path}: id {job_id} is already used on line "
+                    f"{first_lines[job_id]}",
+                )
+                continue
+            first_lines[job_id] = line_number
+            jobs.append(
+                {
+                    "id": job_id,
+                    "model": entry.get("model"),
+                    "messages": messages,
+                    "temperature": entry.get("temperature"),
+                }
+            )
+    return jobs
+
+
+def completed_ids(output_path: str) -> Set[str]:
+    """
+    Ids whose last record in the output file is a success
+    :param output_path: path of the output JSONL file
+    :return: ids to skip
+    """
+    latest = {}
+    if os.path.exists(output_path):
+        with open(output_path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                    latest[record["id"]] = "error" not in record
+                except (ValueError, KeyError, TypeError):
+                    continue  # A line cut short by an interrupted run
+    return {job_id for job_id, succeeded in latest.items() if succeeded}
+
+
+class ResultWriter:
+    def __init__(self, output_path: str, total: int):
+        self.file = open(output_path, "a", encoding="utf-8")
+        self.total = total
+        self.written = 0
+        self.failed = 0
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.file.flush()
+        self.written += 1
+        self.failed += "error" in record
+        if self.written % PROGRESS_EVERY == 0 or self.written == self.total:
+            custom_print("info", f"{self.written}/{self.total} done, {self.failed} failed")
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def _extract_reply(response: Any, use_responses: bool) -> Tuple[str, Dict[str, int]]:
+    if use_responses:
+        usage = getattr(response, "usage", None)
+        tokens = {"input_tokens": usage.input_tokens, "output_tokens": usage.output_tokens} if usage else {}
+        return response.output_text, tokens
+    usage = getattr(response, "usage", None)
+    tokens = (
+        {"input_tokens": getattr(usage, "prompt_tokens", 0), "output_tokens": getattr(usage, "completion_tokens", 0)}
+        if usage
+        else {}
+    )
+    return response.choices[0].message.content or "", tokens
+
+
+async def _run_job(job: Dict[str, Any], model_data: Dict[str, Any], client: Any, retries: int) -> Dict[str, Any]:
+    use_responses = uses_responses_api(model_data["model_name"])
+    record = {"id": job["id"], "model": job["model"]}
+    started = time.perf_counter()
+    try:
+        params = build_request_params(model_data, job["messages"], job["temperature"], False, False)
+        response = await acall(model_data, lambda: create_response(client, params), retries)
+    except Exception as e:
+        record["error"] = str(e)
+        return record
+    record["content"], record["usage"] = _extract_reply(response, use_responses)
+    record["latency"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+async def _run_live(jobs, models, writer: ResultWriter, concurrency: int, rpm: int, retries: int) -> None:
+    """Send the jobs through the regular APIs with a fixed number of workers."""
+    clients = {title: create_client(model_data) for title, model_data in models.items()}
+    for model_data in models.values():
+        limiter = limiter_for(model_data)
+        limiter.max_concurrency = max(limiter.max_concurrency, concurrency)
+        if rpm:
+            limiter.set_rpm(rpm)
+    queue: asyncio.Queue = asyncio.Queue()
+    for job in jobs:
+        queue.put_nowait(job)
+
+    async def worker() -> None:
+        while not queue.empty():
+            job = queue.get_nowait()
+            title = job["model"]
+            writer.write(await _run_job(job, models[title], clients[title], retries))
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(min(concurrency, len(jobs)))))
+    finally:
+        for client in clients.values():
+            if isinstance(client, openai.AsyncOpenAI):
+                await client.close()
+
+
+def _batch_state_path(output_path: str) -> str:
+    return f"{output_path}.batches.json"
+
+
+def _load_batch_state(output_path: str) -> List[Dict[str, Any]]:
+    path = _batch_state_path(output_path)
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def _save_batch_state(output_path: str, batches: List[Dict[str, Any]]) -> None:
+    path = _batch_state_path(output_path)
+    if not batches:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(batches, file, indent=2)
+
+
+def _batch_record(line: Dict[str, Any], title: str) -> Dict[str, Any]:
+    record = {"id": line["custom_id"], "model": title}
+    response = line.get("response") or {}
+    body = response.get("body") or {}
+    if line.get("error") or response.get("status_code") != 200:
+        record["error"] = str(line.get("error") or body.get("error") or response.get("status_code"))
+        return record
+    texts = [
+        part.get("text", "")
+        for item in body.get("output", [])
+        if item.get("type") == "message"
+        for part in item.get("content", [])
+        if part.get("type") == "output_text"
+    ]
+    usage = body.get("usage") or {}
+    record["content"] = "".join(texts)
+    record["usage"] = {"input_tokens": usage.get("input_tokens"), "output_tokens": usage.get("output_tokens")}
+    return record
+
+
+async def _collect_batches(batches, models, writer: ResultWriter, output_path: str) -> None:
+    """Poll the submitted batch jobs and write their results as they finish."""
+    # Batches of models removed from config.toml stay in the state file, they are collected once the model is back
+    orphaned = [batch for batch in batches if batch["model"] not in models]
+    for batch in orphaned:
+        error = f"Cannot collect batch {batch['batch_id']}: model {batch['model']} is not configured in config.toml"
+        custom_print("error", error)
+        for job_id in batch["ids"]:
+            writer.write({"id": job_id, "model": batch["model"], "error": error})
+    batches = [batch for batch in batches if batch["model"] in models]
+    while batches:
+        for batch in list(batches):
+            client = create_client(models[batch["model"]])
+            try:
+                status = await client.batches.retrieve(batch["batch_id"])
+                if status.status in ("validating", "in_progress", "finalizing", "cancelling"):
+                    continue
+                seen = set()
+                for file_id in (status.output_file_id, status.error_file_id):
+                    if not file_id:
+                        continue
+                    content = await client.files.content(file_id)
+                    for line in content.text.splitlines():
+                        if line.strip():
+                            record = _batch_record(json.loads(line), batch["model"])
+                            seen.add(record["id"])
+                            writer.write(record)
+                for job_id in set(batch["ids"]) - seen:
+                    writer.write(
+                        {
+                            "id": job_id,
+                            "model": batch["model"],
+                            "error": f"No result in batch {batch['batch_id']} ({status.status})",
+                        }
+                    )
+                batches.remove(batch)
+                _save_batch_state(output_path, orphaned + batches)
+            finally:
+                await client.close()
+        if batches:
+            await asyncio.sleep(BATCH_POLL_INTERVAL)
+
+
+def _batch_line(job: Dict[str, Any], model_data: Dict[str, Any], writer: ResultWriter) -> Optional[str]:
+    """Batch API input line of a job, None after writing an error record if its request cannot be built."""
+    try:
+        body = build_request_params(model_data, job["messages"], job["temperature"], False, False)
+    except Exception as e:
+        writer.write({"id": job["id"], "model": job["model"], "error": str(e)})
+        return None
+    return json.dumps(
+        {"custom_id": job["id"], "method": "POST", "url": "/v1/responses", "body": body}, ensure_ascii=False
+    )
+
+
+async def _submit_batches(jobs, models, writer: ResultWriter, output_path: str) -> List[Dict[str, Any]]:
+    """Upload the jobs of each OpenAI model as Batch API input files."""
+    batches = _load_batch_state(output_path)
+    by_model: Dict[str, List[Dict[str, Any]]] = {}
+    for job in jobs:
+        by_model.setdefault(job["model"], []).append(job)
+    for title, model_jobs in by_model.items():
+        client = create_client(models[title])
+        try:
+            for start in range(0, len(model_jobs), BATCH_MAX_REQUESTS):
+                built = [
+                    (job, _batch_line(job, models[title], writer))
+                    for job in model_jobs[start : start + BATCH_MAX_REQUESTS]
+                ]
+                chunk = [job for job, line in built if line is not None]
+                if not chunk:
+                    continue
+                lines = [line for _, line in built if line is not None]
+                upload = await client.files.create(file=("batch.jsonl", "\n".join(lines).encode()), purpose="batch")
+                batch = await client.batches.create(
+                    input_file_id=upload.id, endpoint="/v1/responses", completion_window="24h"
+                )
+                batches.append({"batch_id": batch.id, "model": title, "ids": [job["id"] for job in chunk]})
+                _save_batch_state(output_path, batches)
+                custom_print("ok", f"Submitted batch {batch.id} with {len(chunk)} requests for {title}")
+        finally:
+            await client.close()
+    return batches
+
+
+def _supports_provider_batch(model_data: Dict[str, Any]) -> bool:
+    # Only the OpenAI Batch API is supported, the other providers have no compatible endpoint
+    return model_data["model_name"] in MODELS_LIST["openai_models"] and not model_data.get("base_url")
+
+
+async def _run(jobs, models, output_path: str, concurrency: int, rpm: int, retries: int, provider_batch: bool):
+    pending = _load_batch_state(output_path)
+    in_flight = {job_id for batch in pending for job_id in batch["ids"]}
+    jobs = [job for job in jobs if job["id"] not in in_flight]
+    batch_jobs, live_jobs = [], []
+    for job in jobs:
+        (batch_jobs if provider_batch and _supports_provider_batch(models[job["model"]]) else live_jobs).append(job)
+
+    writer = ResultWriter(output_path, len(jobs) + len(in_flight))
+    try:
+        batches = await _submit_batches(batch_jobs, models, writer, output_path) if batch_jobs else pending
+        tasks = []
+        if live_jobs:
+            tasks.append(_run_live(live_jobs, models, writer, concurrency, rpm, retries))
+        if batches:
+            tasks.append(_collect_batches(batches, models, writer, output_path))
+        await asyncio.gather(*tasks)
+    finally:
+        writer.close()
+    return writer
+
+
+def run_batch(
+    input_path: str,
+    output_path: str,
+    model: Optional[str] = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    rpm: int = 0,
+    retries: int = DEFAULT_RETRIES,
+    provider_batch: bool = False,
+) -> None:
+    """
+    Run every conversation of the input file that has no successful result yet
+    :param input_path: JSONL file with the conversations
+    :param output_path: JSONL file the results are appended to
+    :param model: model title from config.toml for entries without a "model", defaults to [chat.defaults] model
+    :param concurrency: number of requests in flight
+    :param rpm: requests per minute allowed for each provider and API key, 0 to go by the provider's headers
+    :param retries: retries of a request after rate limits, timeouts and server errors
+    :param provider_batch: submit the requests of OpenAI models through the Batch API
+    """
+    all_models = fetch_variable("models")
+    default_model = model or fetch_variable("defaults", "model")
+    default_temperature = fetch_variable("defaults", "temperature")
+
+    done = completed_ids(output_path)
+    jobs, skipped = [], []
+    for job in load_jobs(input_path):
+        if job["id"] in done:
+            continue
+        job["model"] = job["model"] or default_model
+        if job["temperature"] is None:
+            job["temperature"] = default_temperature
+        (jobs if job["model"] in all_models else skipped).append(job)
+    for job in skipped:
+        custom_print("error", f"Skipping {job['id']}: model {job['model']} is not configured in config.toml")
+    if not jobs and not _load_batch_state(output_path):
+        custom_print("info", f"Nothing to do, all {len(done)} results are already in {output_path}")
+        return
+
+    titles = {job["model"] for job in jobs} | {batch["model"] for batch in _load_batch_state(output_path)}
+    models = {title: dict(all_models[title], model_title=title) for title in titles if title in all_models}
+    custom_print("info", f"Running {len(jobs)} requests ({len(done)} already done)")
+    try:
+        writer = run_until_complete(_run(jobs, models, output_path, concurrency, rpm, retries, provider_batch))
+    except asyncio.CancelledError:
+        custom_print("warn", "Interrupted. Run the same command again to continue where it stopped.", 130)
+    custom_print("ok", f"Finished: {writer.written - writer.failed} succeeded, {writer.failed} failed -> {output_path}")
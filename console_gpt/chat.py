@@ -1,21 +1,63 @@
-from unichat import MODELS_LIST, UnifiedChatApi
-from unichat.api_helper import openai
+import asyncio
 
-from console_gpt.catch_errors import handle_with_exceptions
 from console_gpt.config_manager import fetch_variable
 from console_gpt.custom_stdout import custom_print
+from console_gpt.event_loop import run_until_complete
 from console_gpt.menus.command_handler import command_handler
-from console_gpt.menus.tools_menu import (openai_completion_tools,
-                                          openai_response_tools)
+from console_gpt.menus.tools_menu import openai_completion_tools
+from console_gpt.model_requests import (build_request_params, create_client,
+                                        create_response, uses_responses_api)
 from console_gpt.ollama_helper import start_ollama
 from console_gpt.prompts.save_chat_prompt import save_chat
 from console_gpt.prompts.user_prompt import chat_user_prompt
+from console_gpt.provider_gateway import acall
 from console_gpt.unichat_handler import (handle_non_streaming_completion,
                                          handle_non_streaming_response,
                                          handle_streaming_completion,
                                          handle_streaming_response)
-from mcp_servers.mcp_tcp_client import MCPClient
 from mcp_servers.server_manager import ServerManager
+from mcp_servers.tool_prefetch import get_prefetched_tools
+
+
+def _await_mcp_tools(model_title):
+    """
+    Collect the tools discovered by the background MCP prefetch started at launch
+    :param model_title: the model title used in the current chat
+    :return: the tools in the format expected by the model or False if MCP is unavailable
+    """
+    try:
+        available_tools = get_prefetched_tools()
+    except KeyboardInterrupt:
+        ready = False
+        while not ready:
+            _, message = ServerManager().stop_server()
+            if message in ["Server stopped successfully", "Server force stopped", "Server is not running"]:
+                ready = True
+        custom_print("exit", "Goodbye, see you soon!", 130)
+    if available_tools is None:
+        custom_print("error", "Could not establish connection to MCP server. Chat functionality may be limited.")
+        return False
+    tools = openai_completion_tools(available_tools) if model_title == "ollama" else available_tools
+    custom_print("info", f"Total tools initialized: {len(tools)}", start="\n")
+    return tools
+
+
+async def _generate_reply(console, client, use_responses, params, model_data, conversation):
+    """
+    One model turn: create the request, consume the reply and run its tool calls.
+    Runs as a task on the shared event loop, so Ctrl-C cancels it wherever it is waiting.
+    :return: the conversation extended with the reply
+    """
+    streaming = params["stream"]
+    # Start the loading bar until API response is returned
+    with console.status("[bold green]Generating a response...", spinner="aesthetic"):
+        response = await acall(model_data, lambda: create_response(client, params))
+
+    if use_responses:
+        handler = handle_streaming_response if streaming else handle_non_streaming_response
+    else:
+        handler = handle_streaming_completion if streaming else handle_non_streaming_completion
+    return await handler(model_data.get("model_name"), response, conversation)
 
 
 def chat(console, data, managed_user_prompt) -> None:
@@ -46,47 +88,18 @@ def chat(console, data, managed_user_prompt) -> None:
             1,
         )
 
-    client_params = {"api_key": api_key}
-    if base_url:
-        client_params["base_url"] = base_url
-
-    use_responses = model_name in MODELS_LIST["openai_models"] or model_name in MODELS_LIST["xai_models"]
-    if use_responses:
-        client = openai.OpenAI(**client_params)
-        verbosity = model_data.get("verbosity")
-    else:
-        client = openai.OpenAI(**client_params) if model_title == "ollama" else UnifiedChatApi(**client_params)
+    use_responses = uses_responses_api(model_name)
+    client = create_client(model_data)
     conversation = data.conversation
     temperature = data.temperature
 
     cached = model_title.startswith("anthropic")
 
-    tools = False
-    if fetch_variable("features", "mcp_client"):
-        try:
-            with MCPClient() as mcp:
-                if mcp is None:
-                    custom_print(
-                        "error", "Could not establish connection to MCP server. Chat functionality may be limited."
-                    )
-                else:
-                    tools = (
-                        openai_completion_tools(mcp.get_available_tools())
-                        if model_title == "ollama"
-                        else mcp.get_available_tools()
-                    )
-                    custom_print("info", f"Total tools initialized: {len(tools)}", start="\n")
-        except KeyboardInterrupt:
-            ready = False
-            while not ready:
-                _, message = ServerManager().stop_server()
-                if message in ["Server stopped successfully", "Server force stopped"]:
-                    ready = True
-            custom_print("exit", "Goodbye, see you soon!", 130)
+    # None means the MCP tools are still being prefetched, they are awaited once the first request is built
+    tools = None if fetch_variable("features", "mcp_client") else False
 
     # Inner Loop
     while True:
-        response = ""  # Adding this to satisfy the IDE
         # Check if we're not in the middle of a tool call
         if (
             not conversation
@@ -109,7 +122,7 @@ def chat(console, data, managed_user_prompt) -> None:
                     tools = new_tools
                     if tools is False:
                         custom_print("info", "Tools are disabled. Continuing without tools.")
-                    else:
+                    elif tools is not None:
                         custom_print("info", f"Total tools initialized: {len(tools)}", start="\n")
                     continue
                 case "continue" | None:
@@ -125,86 +138,33 @@ def chat(console, data, managed_user_prompt) -> None:
             # Add user's input to the overall conversation
             conversation.append(user_input)
 
+        if tools is None:
+            tools = _await_mcp_tools(model_title)
+
         # Get chat completion
         streaming = fetch_variable("features", "streaming")
-        # Start the loading bar until API response is returned
-        with console.status("[bold green]Generating a response...", spinner="aesthetic"):
-            if use_responses:
-                params = {
-                    "model": model_name,
-                    "input": conversation[1:] if conversation[0]["role"] == "system" else conversation,
-                    "stream": streaming,
-                }
-                if conversation[0]["role"] == "system":
-                    params["instructions"] = "Formatting re-enabled\n" + conversation[0]["content"]
-                if tools is not False:
-                    res_tools = openai_response_tools(tools)
-                    res_tools.extend(
-                        [{"type": "web_search"}, {"type": "code_interpreter", "container": {"type": "auto"}}]
-                    )
-                    if model_name in MODELS_LIST["xai_models"]:
-                        res_tools.append({"type": "x_search"})
-                    if model_name in MODELS_LIST["openai_models"]:
-                        res_tools.append({"type": "image_generation", "input_fidelity": "high"})
-                    params["tools"] = res_tools
-                    params["parallel_tool_calls"] = False
-                reasoning_disabled_text = False
-                if isinstance(reasoning_effort, str):
-                    reasoning_disabled_text = reasoning_effort.strip().lower() in ("off", "none", "false", "0")
-
-                if reasoning_effort and not reasoning_disabled_text:
-                    params.setdefault("reasoning", {})["effort"] = reasoning_effort
-                    params["reasoning"]["summary"] = "detailed"
-                else:
-                    params["temperature"] = temperature
-                if verbosity:
-                    params.setdefault("text", {})["verbosity"] = verbosity
-                if model_name == "o3-pro":
-                    params["background"] = True
-
-                response = handle_with_exceptions(lambda: client.responses.create(**params))
-            else:
-                params = {
-                    "model": model_name,
-                    "messages": conversation,
-                    "temperature": temperature,
-                    "tools": tools if tools is not False else [],
-                    "stream": streaming,
-                }
-                if cached is not False:
-                    params["cached"] = cached
-                if reasoning_effort:
-                    params["reasoning_effort"] = reasoning_effort
-
-                response = handle_with_exceptions(lambda: client.chat.completions.create(**params))
-
-        if response not in ["interrupted", "error_appeared"]:
-            if streaming:
-                attempted_conversation = (
-                    handle_with_exceptions(lambda: handle_streaming_response(model_name, response, conversation))
-                    if use_responses
-                    else handle_with_exceptions(lambda: handle_streaming_completion(model_name, response, conversation))
-                )
-                if attempted_conversation not in ["interrupted", "error_appeared"]:
-                    conversation = attempted_conversation
-                else:
-                    response = attempted_conversation  # Replacing it with "response" so it can be automatically handled
-
-            else:
-                conversation = (
-                    handle_non_streaming_response(model_name, response, conversation)
-                    if use_responses
-                    else handle_non_streaming_completion(model_name, response, conversation)
-                )
+        params = build_request_params(model_data, conversation, temperature, tools, streaming, cached)
 
-        if response == "interrupted":
-            last_user_index = next((i for i, msg in enumerate(reversed(conversation)) if msg["role"] == "user"), None)
+        try:
+            conversation = run_until_complete(
+                _generate_reply(console, client, use_responses, params, model_data, conversation)
+            )
+        except asyncio.CancelledError:
+            custom_print("info", "Interrupted the request. Continue normally.")
+            last_user_index = next(
+                (
+                    i
+                    for i, msg in enumerate(reversed(conversation))
+                    if isinstance(msg, dict) and msg.get("role") == "user"
+                ),
+                None,
+            )
 
             if last_user_index is not None:
                 conversation = conversation[: len(conversation) - 1 - last_user_index]
             continue
-
-        if response == "error_appeared":
+        except Exception as e:
+            print(f"An error occurred: {e}")
             if model_title == "ollama":
                 custom_print("warn", "Restarting Ollama Server...")
                 start_ollama()
@@ -0,0 +1,205 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from rich.console import Console
+from rich.live import Live
+from rich.table import Table
+
+from console_gpt.config_manager import fetch_variable
+from console_gpt.custom_stdout import custom_print
+from console_gpt.event_loop import run_until_complete
+from console_gpt.menus.skeleton_menus import preview_multiselect_menu
+from console_gpt.model_requests import (build_request_params, create_client,
+                                        create_response, uses_responses_api)
+from console_gpt.prompts.assistant_prompt import assistance_reply
+from console_gpt.provider_gateway import acall
+
+"""
+Compare mode: the same conversation is sent to several configured models at once
+"""
+
+# Rough characters per token, used when a provider does not report usage for streamed replies
+CHARS_PER_TOKEN = 4
+REFRESH_INTERVAL = 0.1
+
+
+@dataclass
+class ModelRun:
+    title: str
+    model_data: Dict[str, Any]
+    status: str = "waiting"
+    text: str = ""
+    started: Optional[float] = None
+    first_token: Optional[float] = None
+    finished: Optional[float] = None
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    estimated: bool = False
+
+    @property
+    def ttft(self) -> Optional[float]:
+        return self.first_token - self.started if self.first_token else None
+
+    @property
+    def latency(self) -> Optional[float]:
+        return self.finished - self.started if self.finished else None
+
+    @property
+    def cost(self) -> float:
+        input_price = self.model_data.get("model_input_pricing_per_1k") or 0
+        output_price = self.model_data.get("model_output_pricing_per_1k") or 0
+        return ((self.input_tokens or 0) * input_price + (self.output_tokens or 0) * output_price) / 1000
+
+    def mark_token(self) -> None:
+        if self.first_token is None:
+            self.first_token = time.perf_counter()
+            self.status = "streaming"
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN) if text else 0
+
+
+async def _consume(run: ModelRun, response: Any, use_responses: bool) -> None:
+    """Collect the streamed text and usage of one model."""
+    async for item in response:
+        if use_responses:
+            if item.type == "response.reasoning_summary_text.delta":
+                run.mark_token()
+            elif item.type == "response.output_text.delta":
+                run.mark_token()
+                run.text += item.delta
+            elif item.type == "response.completed" and item.response.usage:
+                run.input_tokens = item.response.usage.input_tokens
+                run.output_tokens = item.response.usage.output_tokens
+            continue
+
+        usage = getattr(item, "usage", None)
+        if usage and getattr(usage, "completion_tokens", None):
+            run.input_tokens = usage.prompt_tokens
+            run.output_tokens = usage.completion_tokens
+        if not item.choices:
+            continue
+        delta = item.choices[0].delta
+        if getattr(delta, "reasoning_content", None) or getattr(delta, "reasoning", None):
+            run.mark_token()
+        if getattr(delta, "content", None):
+            run.mark_token()
+            run.text += delta.content
+
+
+async def _run_model(run: ModelRun, conversation: List[Dict[str, Any]], temperature: float) -> None:
+    model_name = run.model_data.get("model_name")
+    use_responses = uses_responses_api(model_name)
+    client = create_client(run.model_data)
+    params = build_request_params(run.model_data, conversation, temperature, False, True)
+    run.status = "requesting"
+    run.started = time.perf_counter()
+    try:
+        response = await acall(run.model_data, lambda: create_response(client, params))
+        await _consume(run, response, use_responses)
+        run.status = "done"
+    except Exception as e:
+        run.status = f"error: {e}"
+    finally:
+        run.finished = time.perf_counter()
+        close = getattr(client, "close", None)
+        if asyncio.iscoroutinefunction(close):
+            await close()
+
+    if run.output_tokens is None:
+        run.estimated = True
+        run.output_tokens = _estimate_tokens(run.text)
+        run.input_tokens = sum(_estimate_tokens(str(message.get("content", ""))) for message in conversation)
+
+
+def _metrics_table(runs: List[ModelRun]) -> Table:
+    table = Table(title="Model comparison")
+    for column in ("Model", "Status", "TTFT", "Latency", "Output tokens", "Cost"):
+        table.add_column(column, justify="left" if column in ("Model", "Status") else "right")
+    for run in runs:
+        tokens = run.output_tokens if run.output_tokens is not None else _estimate_tokens(run.text)
+        approximate = "~" if run.estimated or run.output_tokens is None else ""
+        table.add_row(
+            run.title,
+            run.status,
+            f"{run.ttft:.2f}s" if run.ttft is not None else "-",
+            f"{run.latency:.2f}s" if run.latency is not None else "-",
+            f"{approximate}{tokens}",
+            f"{approximate}${run.cost:.5f}" if run.finished else "-",
+        )
+    return table
+
+
+async def _compare(runs: List[ModelRun], conversation: List[Dict[str, Any]], temperature: float) -> float:
+    started = time.perf_counter()
+    with Live(_metrics_table(runs), refresh_per_second=10) as live:
+
+        async def refresh() -> None:
+            while True:
+                await asyncio.sleep(REFRESH_INTERVAL)
+                live.update(_metrics_table(runs))
+
+        refresher = asyncio.create_task(refresh())
+        try:
+            await asyncio.gather(*(_run_model(run, conversation, temperature) for run in runs))
+        finally:
+            refresher.cancel()
+            live.update(_metrics_table(runs))
+    return time.perf_counter() - started
+
+
+def _portable_messages(conversation: List[Any]) -> List[Dict[str, Any]]:
+    """Plain system/user/assistant messages, tool call items are specific to the API that produced them."""
+    return [
+        {"role": message["role"], "content": message["content"]}
+        for message in conversation
+        if isinstance(message, dict)
+        and message.get("role") in ("system", "user", "assistant")
+        and message.get("content")
+    ]
+
+
+def compare_models(conversation: List[Dict[str, Any]]) -> None:
+    """
+    Send the conversation up to the last user message to the selected models concurrently.
+    The answers are printed one after the other, followed by TTFT, latency, output tokens and cost of each model.
+    The conversation itself is left unchanged.
+    :param conversation: the current conversation
+    """
+    messages = _portable_messages(conversation)
+    last_user_index = next((i for i in range(len(messages) - 1, -1, -1) if messages[i]["role"] == "user"), None)
+    if last_user_index is None:
+        custom_print("warn", "Send a message first, compare replays the conversation up to your last message.")
+        return
+
+    all_models = fetch_variable("models")
+    menu_items = [
+        {
+            "label": title,
+            "preview": "\n".join(
+                f"{key}: {model.get(key)}"
+                for key in ("model_name", "model_input_pricing_per_1k", "model_output_pricing_per_1k")
+            ),
+        }
+        for title, model in all_models.items()
+    ]
+    selected = preview_multiselect_menu(menu_items, "Compare models", preview_title="Model details", select=False)
+    if not selected:
+        return
+
+    runs = [ModelRun(title, dict(all_models[title], model_title=title)) for title in selected]
+    temperature = fetch_variable("defaults", "temperature")
+    try:
+        wall_time = run_until_complete(_compare(runs, messages[: last_user_index + 1], temperature))
+    except asyncio.CancelledError:
+        custom_print("info", "Comparison interrupted. Continue normally.")
+        return
+
+    for run in runs:
+        assistance_reply(run.text or f"_{run.status}_", run.title)
+    Console().print(_metrics_table(runs))
+    total = sum(run.latency or 0 for run in runs)
+    custom_print("info", f"Wall time {wall_time:.2f}s (sequential would take ~{total:.2f}s). ~ marks estimated usage.")
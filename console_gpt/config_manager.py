@@ -1,11 +1,22 @@
+import copy
 import os
 import shutil
-from typing import Any, Dict, Iterable, List, Literal, Optional, Union
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import (Any, Dict, Iterable, Iterator, List, Literal, Optional,
+                    Tuple, Union)
 
 import toml
 
 from console_gpt.custom_stdout import colored, custom_print
 
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of this process are serialized
+    fcntl = None
+
 # Define the specific types for 'create' for join_and_check function
 CreateType = Literal["folder", "config.toml", "mcp_config.json"]
 
@@ -29,6 +40,29 @@ def _load_toml(conf_path: str) -> Optional[Dict]:
         )
 
 
+def _dump_toml(conf_path: str, config: Dict) -> None:
+    """
+    Atomically replace a config file: the data goes to a temp file in the same folder,
+    which is flushed to disk and renamed over the original. Readers see either version, never a partial file.
+    :param conf_path: Path to config file
+    :param config: The data to write
+    """
+    folder = os.path.dirname(os.path.abspath(conf_path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(conf_path)}.", suffix=".tmp", dir=folder)
+    try:
+        with os.fdopen(fd, "w") as file:
+            toml.dump(config, file)
+            file.flush()
+            os.fsync(file.fileno())
+        if os.path.exists(conf_path):
+            shutil.copymode(conf_path, tmp_path)
+        os.replace(tmp_path, conf_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
 def _prune_models(conf_path: str) -> None:
     """Trim models in a freshly created config.toml to only the ones referenced elsewhere.
 
@@ -71,8 +105,7 @@ def _prune_models(conf_path: str) -> None:
     pruned_models = {k: models[k] for k in models if k in required_keys}
     if pruned_models:
         chat["models"] = pruned_models
-        with open(conf_path, "w") as f:
-            toml.dump(config, f)
+        _dump_toml(conf_path, config)
         custom_print("ok", f"Trimmed models list to required model(s): {', '.join(pruned_models.keys())}")
 
 
@@ -144,6 +177,54 @@ ASSISTANTS_PATH = _join_and_check(BASE_PATH, "assistants", create="folder")
 IMAGES_PATH = _join_and_check(BASE_PATH, "images", create="folder")
 
 
+# Serializes config writers of this process, the file lock covers other processes
+_config_write_lock = threading.RLock()
+
+
+@contextmanager
+def config_transaction() -> Iterator[Dict]:
+    """
+    Read-modify-write of config.toml under a lock, written back atomically in one dump.
+    Nothing is written if the block raises or leaves the config unchanged.
+    :return: The whole config to modify in place
+    """
+    with _config_write_lock, open(f"{CONFIG_PATH}.lock", "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            config = _load_toml(CONFIG_PATH)
+            original = copy.deepcopy(config)
+            yield config
+            if config != original:
+                _dump_toml(CONFIG_PATH, config)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _set_value(chat: Dict, keys: Tuple[str, ...], new_value: Any, group: bool = False) -> None:
+    """Set a value in the "chat" group of a loaded config"""
+    if not 1 <= len(keys) <= 4:
+        custom_print("error", "Wrong usage of write_to_config", 1)
+    if group:
+        chat[keys[0]] = {keys[1]: new_value}
+        return
+    parent = chat
+    for key in keys[:-1]:
+        parent = parent[key]
+    parent[keys[-1]] = new_value
+
+
+def update_config(updates: Dict[Tuple[str, ...], Any]) -> None:
+    """
+    Write several values to the config file in a single transaction
+    :param updates: The keys to access each value in the "chat" group mapped to its new value
+    """
+    with config_transaction() as config:
+        for keys, new_value in updates.items():
+            _set_value(config["chat"], keys, new_value)
+
+
 def write_to_config(*args, new_value: Any, group: bool = False) -> None:
     """
     Writes a new value to the config file
@@ -151,23 +232,8 @@ def write_to_config(*args, new_value: Any, group: bool = False) -> None:
     :param new_value: The new value to be written
     :param group: Allow creating groups
     """
-    config = _load_toml(CONFIG_PATH)
-    if group:
-        config["chat"][args[0]] = {args[1]: new_value}
-    match len(args):
-        case 1:
-            config["chat"][args[0]] = new_value
-        case 2:
-            config["chat"][args[0]][args[1]] = new_value
-        case 3:
-            config["chat"][args[0]][args[1]][args[2]] = new_value
-        case 4:
-            config["chat"][args[0]][args[1]][args[2]][args[3]] = new_value
-        case _:
-            custom_print("error", "Wrong usage of write_to_config", 1)
-
-    with open(CONFIG_PATH, "w") as file:
-        toml.dump(config, file)
+    with config_transaction() as config:
+        _set_value(config["chat"], args, new_value, group)
 
 
 def fetch_variable(*args, auto_exit: bool = True) -> Any:
@@ -199,13 +265,33 @@ def fetch_variable(*args, auto_exit: bool = True) -> Any:
         return __var_error(args, auto_exit)
 
 
+# Resolved values by their config keys: (config.toml signature, [(path, signature)], value)
+_resolved_cache: Dict[Tuple[str, ...], Tuple[Tuple[int, int, int], List, Any]] = {}
+_resolved_cache_lock = threading.Lock()
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int, int]]:
+    """Modification time, size and inode of a file, None if it is missing. Atomic replaces change the inode."""
+    try:
+        file_stat = os.stat(path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(file_stat.st_mode):
+        return None
+    return file_stat.st_mtime_ns, file_stat.st_size, file_stat.st_ino
+
+
 def resolve_text_or_file(
     value: Any,
     setting_path: str,
     base_path: Optional[str] = None,
     required_dir: Optional[str] = None,
+    sources: Optional[List[Tuple[str, Optional[Tuple[int, int, int]]]]] = None,
 ) -> Any:
-    """Resolve a config text value that can be either inline text or a file path."""
+    """
+    Resolve a config text value that can be either inline text or a file path.
+    The paths that were checked are appended to sources together with their file signature.
+    """
     if not isinstance(value, str):
         return value
 
@@ -241,7 +327,10 @@ def resolve_text_or_file(
         paths_to_try.append(os.path.join(base_path, candidate_path))
 
     for path in paths_to_try:
-        if os.path.isfile(path):
+        signature = _file_signature(path)
+        if sources is not None:
+            sources.append((path, signature))
+        if signature is not None:
             with open(path, "r", encoding="utf-8") as f:
                 return f.read()
 
@@ -250,16 +339,14 @@ def resolve_text_or_file(
     return value
 
 
-def fetch_variable_resolved(*args, auto_exit: bool = True) -> Any:
-    """Fetch config value and resolve supported text fields from file paths."""
-    value = fetch_variable(*args, auto_exit=auto_exit)
-
+def _resolve_variable(args: Tuple[str, ...], value: Any, sources: List) -> Any:
     if len(args) == 2 and args[0] == "managed" and args[1] == "assistant_role":
         return resolve_text_or_file(
             value,
             setting_path="chat.managed.assistant_role",
             base_path=BASE_PATH,
             required_dir="roles",
+            sources=sources,
         )
 
     if len(args) == 1 and args[0] == "roles" and isinstance(value, dict):
@@ -269,6 +356,7 @@ def fetch_variable_resolved(*args, auto_exit: bool = True) -> Any:
                 setting_path=f"chat.roles.{key}",
                 base_path=BASE_PATH,
                 required_dir="roles",
+                sources=sources,
             )
             for key, val in value.items()
         }
@@ -279,11 +367,41 @@ def fetch_variable_resolved(*args, auto_exit: bool = True) -> Any:
             setting_path=f"chat.roles.{args[1]}",
             base_path=BASE_PATH,
             required_dir="roles",
+            sources=sources,
         )
 
     return value
 
 
+def config_signature() -> Optional[Tuple[int, int, int]]:
+    """Changes whenever config.toml is written, for callers that cache values derived from it."""
+    return _file_signature(CONFIG_PATH)
+
+
+def fetch_variable_resolved(*args, auto_exit: bool = True) -> Any:
+    """
+    Fetch config value and resolve supported text fields from file paths.
+    Results are cached until config.toml or one of the role files changes on disk.
+    """
+    config_signature = _file_signature(CONFIG_PATH)
+    with _resolved_cache_lock:
+        cached = _resolved_cache.get(args)
+    if cached is not None:
+        cached_config_signature, sources, value = cached
+        if cached_config_signature == config_signature and all(
+            _file_signature(path) == signature for path, signature in sources
+        ):
+            return dict(value) if isinstance(value, dict) else value
+
+    value = fetch_variable(*args, auto_exit=auto_exit)
+    sources = []
+    resolved = _resolve_variable(args, value, sources)
+    if config_signature is not None:
+        with _resolved_cache_lock:
+            _resolved_cache[args] = (config_signature, sources, resolved)
+    return dict(resolved) if isinstance(resolved, dict) else resolved
+
+
 def __verify_local_version_config() -> None:
     if not os.path.exists(CONFIG_VERSION_PATH_LOCAL):
         dummy_data = 'version = "0.0.0"'
@@ -308,8 +426,7 @@ def fetch_version(config_type: str) -> str:
 def __set_local_version(version: str) -> None:
     config = _load_toml(CONFIG_VERSION_PATH_LOCAL)
     config["version"] = version
-    with open(CONFIG_VERSION_PATH_LOCAL, "w") as file:
-        toml.dump(config, file)
+    _dump_toml(CONFIG_VERSION_PATH_LOCAL, config)
 
 
 def check_config_version() -> None:
@@ -334,8 +451,12 @@ def __read_toml_structure(file_path) -> Dict:
 
     def get_structure(value):
         if isinstance(value, dict):
-            # Skip models and roles because everyone will have different roles and models
-            return {key: get_structure(val) for key, val in value.items() if key not in ["models", "roles"]}
+            # Skip models, roles and per-chat tool lists because everyone will have different ones
+            return {
+                key: get_structure(val)
+                for key, val in value.items()
+                if key not in ["models", "roles", "mcp_chat_tools"]
+            }
             # return {key: get_structure(val) for key, val in value.items()}
         else:
             return type(value).__name__
@@ -12,6 +12,7 @@ help_options = {
     "format": "Allows you to write multiline messages.",
     "save": "Saves the chat to a given file.",
     "chats": "Manage chats",
+    "compare": "Sends the conversation up to your last message to several models at once and compares them.",
     "settings": "Manage available features.",
     "browser": "Scrapes a given page and use the content as input.",
 }
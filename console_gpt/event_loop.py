@@ -0,0 +1,90 @@
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, AsyncIterator, Coroutine, Iterable, Optional
+
+# The prompts (questionary, textual) run their own event loops on the main thread,
+# so the async work of a chat lives on a persistent loop in a background thread.
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+_END = object()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return the shared background event loop, starting it on first use
+    :return: running event loop
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="console-gpt-loop", daemon=True).start()
+        return _loop
+
+
+def run_until_complete(coro: Coroutine) -> Any:
+    """
+    Run a coroutine on the shared loop and block until it finishes.
+    Ctrl-C cancels the task, waits until it has unwound and raises asyncio.CancelledError.
+    :param coro: coroutine to run
+    :return: the result of the coroutine
+    """
+    loop = get_event_loop()
+    task_future = concurrent.futures.Future()
+
+    async def supervised():
+        task_future.set_result(asyncio.current_task())
+        return await coro
+
+    future = asyncio.run_coroutine_threadsafe(supervised(), loop)
+    try:
+        return future.result()
+    except KeyboardInterrupt:
+        loop.call_soon_threadsafe(task_future.result().cancel)
+        try:
+            future.result()
+        except (concurrent.futures.CancelledError, Exception):
+            pass
+        raise asyncio.CancelledError()
+
+
+async def iterate_in_thread(iterable: Iterable) -> AsyncIterator:
+    """
+    Consume a blocking iterator (such as a synchronous SDK stream) in a worker thread.
+    When the consumer is cancelled the worker stops at the next item and closes the iterator.
+    :param iterable: blocking iterable
+    :return: async iterator over the same items
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stopped = threading.Event()
+
+    def pump() -> None:
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if stopped.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, (item, None))
+            loop.call_soon_threadsafe(queue.put_nowait, (_END, None))
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, (_END, e))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close:
+                close()
+
+    worker = loop.run_in_executor(None, pump)
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is _END:
+                if error:
+                    raise error
+                return
+            yield item
+    finally:
+        stopped.set()
+        if worker.done():
+            worker.result()
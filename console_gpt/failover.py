@@ -0,0 +1,196 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import (FIRST_COMPLETED, Future, ThreadPoolExecutor,
+                                wait)
+from typing import Callable, Deque, Dict, Optional, Tuple, TypeVar
+
+from console_gpt.custom_stdout import custom_print
+
+"""
+Hedged requests and failover between a model and its configured fallback_model.
+
+Each model keeps a health record of its recent calls. The primary gets a deadline taken from a percentile of its
+own recent latencies. If it has not answered by then, the fallback is started as well and the first answer wins.
+Hard errors fail over immediately. While the primary's health score is low, requests go to the fallback first and
+the primary is only probed now and then.
+
+The deadline runs from the moment the primary actually starts, not while it waits for a worker. Hedges are only
+started while the pool has a free worker and the model has fewer than MAX_HEDGES_IN_FLIGHT of them running, so a
+saturated system is not loaded with duplicate requests.
+"""
+
+T = TypeVar("T")
+
+HEALTH_WINDOW = 50
+MIN_SAMPLES = 5
+DEFAULT_PERCENTILE = 95
+MIN_DEADLINE = 2.0
+MAX_DEADLINE = 120.0
+# Weight of the latest call in the success score
+SCORE_ALPHA = 0.2
+UNHEALTHY_SCORE = 0.5
+PROBE_INTERVAL = 30.0
+MAX_WORKERS = 16
+MAX_HEDGES_IN_FLIGHT = 2
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="hedge")
+# Calls submitted to the executor and not finished yet, including the ones still waiting for a worker
+_pending_calls = 0
+_pending_lock = threading.Lock()
+
+
+class ModelHealth:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies: Deque[float] = deque(maxlen=HEALTH_WINDOW)
+        self.score = 1.0
+        self.last_attempt = 0.0
+        self.hedges = 0
+
+    def record(self, latency: float, ok: bool) -> None:
+        with self.lock:
+            if ok:
+                self.latencies.append(latency)
+            self.score = (1 - SCORE_ALPHA) * self.score + SCORE_ALPHA * (1.0 if ok else 0.0)
+
+    def deadline(self, percentile: float) -> Optional[float]:
+        """Latency percentile of the recent successful calls, None until there are enough of them."""
+        with self.lock:
+            if len(self.latencies) < MIN_SAMPLES:
+                return None
+            ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * percentile / 100))
+        return min(MAX_DEADLINE, max(MIN_DEADLINE, ordered[index]))
+
+    def should_skip(self) -> bool:
+        """Unhealthy models are skipped, except for one probe every PROBE_INTERVAL."""
+        with self.lock:
+            if self.score >= UNHEALTHY_SCORE or time.monotonic() - self.last_attempt >= PROBE_INTERVAL:
+                self.last_attempt = time.monotonic()
+                return False
+            return True
+
+    def start_hedge(self) -> bool:
+        """Reserve a hedge for this model, False if it already has MAX_HEDGES_IN_FLIGHT running."""
+        with self.lock:
+            if self.hedges >= MAX_HEDGES_IN_FLIGHT:
+                return False
+            self.hedges += 1
+            return True
+
+    def end_hedge(self) -> None:
+        with self.lock:
+            self.hedges -= 1
+
+
+_health: Dict[str, ModelHealth] = {}
+_health_lock = threading.Lock()
+
+
+def health_of(model_title: str) -> ModelHealth:
+    with _health_lock:
+        if model_title not in _health:
+            _health[model_title] = ModelHealth()
+        return _health[model_title]
+
+
+def _timed(model_title: str, action: Callable[[], T], running: Optional[threading.Event] = None) -> Callable[[], T]:
+    health = health_of(model_title)
+
+    def timed() -> T:
+        if running is not None:
+            running.set()
+        started = time.monotonic()
+        try:
+            result = action()
+        except Exception:
+            health.record(time.monotonic() - started, False)
+            raise
+        health.record(time.monotonic() - started, True)
+        return result
+
+    return timed
+
+
+def _call_finished(_: Future) -> None:
+    global _pending_calls
+    with _pending_lock:
+        _pending_calls -= 1
+
+
+def _submit(model_title: str, action: Callable[[], T], running: Optional[threading.Event] = None) -> Future:
+    global _pending_calls
+    with _pending_lock:
+        _pending_calls += 1
+    future = _executor.submit(_timed(model_title, action, running))
+    future.add_done_callback(_call_finished)
+    return future
+
+
+def _has_free_worker() -> bool:
+    with _pending_lock:
+        return _pending_calls < MAX_WORKERS
+
+
+def hedged_call(
+    primary_title: str,
+    primary: Callable[[], T],
+    fallback_title: Optional[str] = None,
+    fallback: Optional[Callable[[], T]] = None,
+    percentile: float = DEFAULT_PERCENTILE,
+) -> Tuple[str, T]:
+    """
+    Run a blocking model call with an optional hedge on the fallback model.
+    Both calls must work on their own copies of any state, since the loser may still finish in the background
+    (blocking SDK calls cannot be interrupted) and its result is dropped.
+    :param primary_title: model title of the primary call
+    :param primary: the primary call
+    :param fallback_title: model title of the fallback call
+    :param fallback: the fallback call, None to run the primary alone
+    :param percentile: latency percentile of the primary used as the hedging deadline
+    :return: the title of the model that answered and its result
+    """
+    if fallback is None:
+        return primary_title, _timed(primary_title, primary)()
+
+    calls = {primary_title: primary, fallback_title: fallback}
+    order = [primary_title, fallback_title]
+    if health_of(primary_title).should_skip():
+        custom_print("warn", f"{primary_title} is unhealthy, sending the request to {fallback_title} first")
+        order.reverse()
+
+    first_title, second_title = order
+    first_health = health_of(first_title)
+    first_running = threading.Event()
+    running = {_submit(first_title, calls[first_title], first_running): first_title}
+    deadline = first_health.deadline(percentile)
+    if deadline is not None:
+        # Time spent waiting for a worker does not count against the deadline
+        first_running.wait()
+    done, _ = wait(running, timeout=deadline)
+    started_second = False
+    last_error: Optional[BaseException] = None
+
+    while True:
+        for future in done:
+            title = running.pop(future)
+            try:
+                return title, future.result()
+            except Exception as e:
+                custom_print("warn", f"{title} failed: {e}")
+                last_error = e
+        if not started_second:
+            if done:
+                # The first call failed, fail over whatever the load
+                running[_submit(second_title, calls[second_title])] = second_title
+                started_second = True
+            elif _has_free_worker() and first_health.start_hedge():
+                custom_print("info", f"{first_title} is slower than its p{percentile:g}, hedging with {second_title}")
+                hedge = _submit(second_title, calls[second_title])
+                hedge.add_done_callback(lambda _: first_health.end_hedge())
+                running[hedge] = second_title
+                started_second = True
+        if not running:
+            raise last_error
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
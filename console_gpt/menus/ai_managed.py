@@ -13,6 +13,7 @@ from console_gpt.menus.command_handler import command_handler
 from console_gpt.menus.key_menu import set_api_key
 from console_gpt.prompts.temperature_prompt import temperature_prompt
 from console_gpt.prompts.user_prompt import chat_user_prompt
+from console_gpt.provider_gateway import call
 
 MODEL_KEYS = [
     "{{assistant_generalist}}",
@@ -117,12 +118,15 @@ def send_request(client, assistant, conversation):
         reasoning_effort = False
     role = {"role": "system", "content": assistant["role"]}
     conversation.insert(0, role)
-    response = client.chat.completions.create(
-        model=assistant["model_name"],
-        messages=conversation,
-        stream=False,
-        tools=get_tools_schema(),
-        reasoning_effort=reasoning_effort,
+    response = call(
+        assistant,
+        lambda: client.chat.completions.create(
+            model=assistant["model_name"],
+            messages=conversation,
+            stream=False,
+            tools=get_tools_schema(),
+            reasoning_effort=reasoning_effort,
+        ),
     )
     return response.choices[0].message.tool_calls
 
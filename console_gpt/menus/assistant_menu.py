@@ -1,3 +1,4 @@
+import asyncio
 import glob
 import json
 import os
@@ -6,13 +7,17 @@ import textwrap
 import time
 from typing import List, Optional, Tuple
 
+from rich.live import Live
+from rich.markdown import Markdown
+from rich.text import Text
 from unichat.api_helper import openai
 
 from console_gpt.config_manager import (ASSISTANTS_PATH, fetch_variable,
                                         fetch_variable_resolved,
                                         write_to_config)
 from console_gpt.custom_stdin import custom_input
-from console_gpt.custom_stdout import custom_print, markdown_print
+from console_gpt.custom_stdout import custom_print
+from console_gpt.event_loop import run_until_complete
 from console_gpt.general_utils import capitalize, decapitalize
 from console_gpt.menus.role_menu import _add_custom_role, role_menu
 from console_gpt.menus.skeleton_menus import (base_checkbox_menu,
@@ -20,6 +25,7 @@ from console_gpt.menus.skeleton_menus import (base_checkbox_menu,
                                               base_settings_menu)
 from console_gpt.menus.tools_menu import transform_tools_selection
 from console_gpt.prompts.save_chat_prompt import _validate_confirmation
+from console_gpt.unichat_handler import RENDER_INTERVAL, run_tool_calls
 from mcp_servers.mcp_tcp_client import MCPClient
 
 TIMEOUT = 300
@@ -388,22 +394,24 @@ def create_message(client, thread_id, user_input):
 ## List message
 
 
-def update_conversation(client, conversation, thread_id):
-    messages = (client.beta.threads.messages.list(thread_id),)
-    messages_list = [
-        {"id": message.id, "content": content.text.value}
-        for message in messages[0].data
-        for content in message.content
-        if content.type == "text"
-    ]
-    messages_list.reverse()
-    # Find the index of the dictionary with the specified id
-    index = next((i for i, message in enumerate(messages_list) if message["id"] == conversation), None)
-    # Slice the list from the next index to the end if the index was found
-    new_messages = messages_list[index + 1 :] if index is not None else []
-    # Get the 'id' of the last item in the filtered list if it's not empty
-    conversation = messages_list[-1]["id"] if new_messages else None
-    # Reverse the list
+def update_conversation(client, conversation, thread_id, shown=()):
+    """
+    Fetch the messages added to the thread after the last seen one
+    :param client: OpenAI client
+    :param conversation: id of the last seen message
+    :param thread_id: thread id
+    :param shown: ids of messages already rendered while streaming
+    :return: id of the newest message and the new messages that were not rendered yet
+    """
+    new_messages = []
+    page = client.beta.threads.messages.list(thread_id, after=conversation, order="asc")
+    for message in page.auto_paging_iter():
+        conversation = message.id
+        if message.id in shown:
+            continue
+        new_messages.extend(
+            {"id": message.id, "content": content.text.value} for content in message.content if content.type == "text"
+        )
     return (conversation, new_messages)
 
 
@@ -414,77 +422,143 @@ def update_conversation(client, conversation, thread_id):
 # Runs
 
 
-def run_thread(client, assistant_id, thread_id):
+class _ReplyView:
+    """
+    Renders the text of a streamed run. The spinner stays until the first delta arrives,
+    then the Markdown is re-rendered at most every RENDER_INTERVAL.
+    """
+
+    def __init__(self, console, title):
+        self.console = console
+        self.title = title
+        self.status = console.status("[bold green]Generating a response...", spinner="aesthetic")
+        self.live: Optional[Live] = None
+        self.text = ""
+        self.rendered_at = 0.0
+
+    def __enter__(self):
+        self.status.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.status.stop()
+        self.finish()
+
+    def add(self, delta: str) -> None:
+        if self.live is None:
+            self.status.stop()
+            self.console.print(Text(f"╰─❯ {self.title}:", style="blue underline bold"))
+            self.live = Live(console=self.console, refresh_per_second=10, vertical_overflow="visible")
+            self.live.start()
+        self.text += delta
+        if time.monotonic() - self.rendered_at >= RENDER_INTERVAL:
+            self._render()
+
+    def _render(self) -> None:
+        self.live.update(Markdown(self.text, code_theme="dracula"))
+        self.rendered_at = time.monotonic()
+
+    def finish(self) -> None:
+        """Final render of the current message, the next delta starts a new one."""
+        if self.live is not None:
+            self._render()
+            self.live.stop()
+            self.live = None
+            self.text = ""
+
+    def pause(self) -> None:
+        """Back to the spinner while tools run and the run resumes."""
+        self.finish()
+        self.status.start()
+
+
+def _tool_outputs(run) -> List[dict]:
+    tool_calls = run.required_action.submit_tool_outputs.tool_calls
+    results = run_until_complete(run_tool_calls([(tool.function.name, tool.function.arguments) for tool in tool_calls]))
+    return [{"tool_call_id": tool.id, "output": output} for tool, output in zip(tool_calls, results)]
+
+
+def _cancel_run(client, thread_id, run_id) -> None:
+    if not run_id:
+        return
+    try:
+        client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run_id)
+    except openai.OpenAIError:
+        pass  # The run has already ended
+
+
+def run_thread(client, assistant_id, thread_id, console, title="Assistant") -> List[str]:
+    """
+    Run the assistant on the thread over the streaming run events.
+    Text is rendered as it arrives and tool outputs are submitted as soon as the run asks for them.
+    :param client: OpenAI client
+    :param assistant_id: assistant id
+    :param thread_id: thread id
+    :param console: rich console for the spinner and the live reply
+    :param title: header of the reply
+    :return: ids of the messages rendered while streaming
+    """
+    shown = []
+    run_id = None
+    deadline = time.monotonic() + TIMEOUT
+    # The deadline is only checked between events, the request timeout bounds a stream that stops sending them
+    stream = client.beta.threads.runs.stream(thread_id=thread_id, assistant_id=assistant_id, timeout=TIMEOUT)
     try:
-        run = client.beta.threads.runs.create(
-            thread_id=thread_id,
-            assistant_id=assistant_id,
-        )
-        # Step 5: Check the Run status
-        start_time = time.time()
-        while run.status != "completed":
-            run = client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
-            match run.status:
-                case "requires_action":
-                    tool_outputs = []
-                    for tool in run.required_action.submit_tool_outputs.tool_calls:
-                        try:
-                            markdown_print(f"> Triggered: `{tool.function.name}`.")
-                            with MCPClient() as mcp:
-                                tool_outputs.append(
-                                    {
-                                        "tool_call_id": tool.id,
-                                        "output": str(
-                                            mcp.call_tool(tool.function.name, json.loads(tool.function.arguments))
-                                        ),
-                                    }
+        with _ReplyView(console, title) as view:
+            while stream is not None:
+                with stream as events:
+                    stream = None
+                    for event in events:
+                        match event.event:
+                            case "thread.run.created":
+                                run_id = event.data.id
+                            case "thread.message.delta":
+                                for content in event.data.delta.content or []:
+                                    if content.type == "text" and content.text and content.text.value:
+                                        view.add(content.text.value)
+                            case "thread.message.completed":
+                                view.finish()
+                                shown.append(event.data.id)
+                            case "thread.run.requires_action":
+                                view.pause()
+                                tool_outputs = _tool_outputs(event.data)
+                                stream = client.beta.threads.runs.submit_tool_outputs_stream(
+                                    thread_id=thread_id,
+                                    run_id=run_id,
+                                    tool_outputs=tool_outputs,
+                                    timeout=max(deadline - time.monotonic(), 1.0),
+                                )
+                            case "thread.run.expired":
+                                custom_print("error", "Maximum wait time exceeded, please try again.")
+                            case "thread.run.cancelled":
+                                custom_print("error", "Request interrupted, please submit a new one.")
+                            case "thread.run.failed":
+                                custom_print("error", event.data.last_error)
+                            case "thread.run.incomplete":
+                                custom_print(
+                                    "error", "Run ended due to max_prompt_tokens or max_completion_tokens reached."
                                 )
-                        except Exception as e:
-                            run = client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run.id)
-                            raise
-                    if tool_outputs:
-                        try:
-                            run = client.beta.threads.runs.submit_tool_outputs_and_poll(
-                                thread_id=thread_id, run_id=run.id, tool_outputs=tool_outputs
-                            )
-                            custom_print("info", "Tool outputs submitted successfully.")
-                        except Exception as e:
-                            custom_print("error", f"Failed to submit tool outputs: {e}")
-                            run = client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run.id)
+                            case "error":
+                                custom_print("error", event.data.message)
+                        if stream is not None:
                             break
-                    else:
-                        custom_print("info", "No tool outputs to submit.")
-                    continue
-                case "expired":
-                    custom_print("error", "Maximum wait time exceeded, please try again.")
-                    break
-                case "cancelled":
-                    custom_print("error", "Request interrupted, please submit a new one.")
-                    break
-                case "failed":
-                    custom_print("error", run.last_error)
-                    break
-                case "incomplete":
-                    custom_print("error", "Run ended due to max_prompt_tokens or max_completion_tokens reached.")
-                    break
-                case _:
-                    continue
-            time.sleep(2)
-            current_time = time.time()
-            if (current_time - start_time) > TIMEOUT:
-                custom_print("error", "Maximum wait time exceeded")
-                run = client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run.id)
-                break  # Exit the loop if more than 5 minutes have passed
-            continue
-        return
-    except KeyboardInterrupt:
-        run = client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run.id)
+                        if time.monotonic() > deadline:
+                            custom_print("error", "Maximum wait time exceeded")
+                            _cancel_run(client, thread_id, run_id)
+                            return shown
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        _cancel_run(client, thread_id, run_id)
         # Notifying the user about the interrupt but continues normally.
         custom_print("info", "Interrupted the request. Continue normally.")
     except openai.BadRequestError as e:
         custom_print("error", str(e))
+    except openai.APITimeoutError:
+        custom_print("error", "Maximum wait time exceeded")
+        _cancel_run(client, thread_id, run_id)
     except Exception as e:
+        _cancel_run(client, thread_id, run_id)
         custom_print("error", f"Unexpected error: {str(e)}")
+    return shown
 
 
 ## Create run
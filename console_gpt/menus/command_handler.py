@@ -1,5 +1,6 @@
 from typing import Optional
 
+from console_gpt.compare import compare_models
 from console_gpt.custom_stdout import custom_print, markdown_print
 from console_gpt.general_utils import help_message
 from console_gpt.menus.chat_manager import chat_manager
@@ -72,6 +73,9 @@ def command_handler(model_title, model_name, user_input, conversation, cached, t
         case "chats":
             chat_manager()
             return "continue"
+        case "compare":
+            compare_models(conversation)
+            return "continue"
         case "settings":
             settings_menu()
             return "continue"
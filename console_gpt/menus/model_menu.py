@@ -1,9 +1,7 @@
 from typing import Dict, Union
 
-import toml
-
-from console_gpt.config_manager import (CONFIG_PATH, CONFIG_SAMPLE_PATH,
-                                        _load_toml, fetch_variable)
+from console_gpt.config_manager import (CONFIG_SAMPLE_PATH, _load_toml,
+                                        config_transaction, fetch_variable)
 from console_gpt.custom_stdout import custom_print
 from console_gpt.general_utils import use_emoji_maybe
 from console_gpt.menus.skeleton_menus import (base_multiselect_menu,
@@ -64,11 +62,9 @@ def model_menu() -> Dict[str, Union[int, str, float]]:
         menu_items = [{"label": k, "preview": str(sample_models[k])} for k in add_candidates]
         selected = preview_multiselect_menu(menu_items, "Add model(s)", preview_title="Model details", select=False)
         if selected:
-            config = _load_toml(CONFIG_PATH)
-            for k in selected:
-                config["chat"]["models"][k] = sample_models[k]
-            with open(CONFIG_PATH, "w") as f:
-                toml.dump(config, f)
+            with config_transaction() as config:
+                for k in selected:
+                    config["chat"]["models"][k] = sample_models[k]
             custom_print("ok", f"Added model(s): {', '.join(selected)}")
         return model_menu()
 
@@ -91,11 +87,9 @@ def model_menu() -> Dict[str, Union[int, str, float]]:
             custom_print("warn", f"Cannot remove {reason}: {pm}. It will be kept.")
             to_remove.discard(pm)
         if to_remove:
-            config = _load_toml(CONFIG_PATH)
-            for k in to_remove:
-                config["chat"]["models"].pop(k, None)
-            with open(CONFIG_PATH, "w") as f:
-                toml.dump(config, f)
+            with config_transaction() as config:
+                for k in to_remove:
+                    config["chat"]["models"].pop(k, None)
             custom_print("ok", f"Removed model(s): {', '.join(to_remove)}")
         return model_menu()
 
@@ -110,10 +104,8 @@ def model_menu() -> Dict[str, Union[int, str, float]]:
             "Change default model", current_models, menu_title, default_model, exit=False
         )
         if new_default and new_default in current_models:
-            config = _load_toml(CONFIG_PATH)
-            config["chat"]["defaults"]["model"] = new_default
-            with open(CONFIG_PATH, "w") as f:
-                toml.dump(config, f)
+            with config_transaction() as config:
+                config["chat"]["defaults"]["model"] = new_default
             custom_print("ok", f"Default model changed to: {new_default}")
         return model_menu()
 
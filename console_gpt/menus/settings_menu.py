@@ -1,19 +1,18 @@
 from typing import Dict
 
-from console_gpt.config_manager import fetch_variable, write_to_config
+from console_gpt.config_manager import fetch_variable, update_config
 from console_gpt.menus.skeleton_menus import base_settings_menu
 from console_gpt.prompts.system_prompt import system_reply
 
 
 def _write_wrapper(data: Dict) -> None:
     """
-    Wrapper for the write_to_config function which breaks down dict into key:value
+    Wrapper for the update_config function which writes all key:value pairs in one go
     Where key is the config entry and value is the new value of that entry
     :param data: Dict data from the base_settings_menu()
     :return: Nothing, just writes
     """
-    for key, value in data.items():
-        write_to_config("features", key, new_value=value)
+    update_config({("features", key): value for key, value in data.items()})
 
 
 def _table_wrapper(col1, col2, col3):
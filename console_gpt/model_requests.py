@@ -0,0 +1,120 @@
+import asyncio
+from typing import Any, Dict, List, Union
+
+from unichat import MODELS_LIST, UnifiedChatApi
+from unichat.api_helper import openai
+
+from console_gpt.event_loop import iterate_in_thread
+from console_gpt.menus.tools_menu import openai_response_tools
+from console_gpt.provider_gateway import async_http_client
+
+"""
+Request building shared by the interactive chat and the other ways of querying a configured model
+"""
+
+
+def uses_responses_api(model_name: str) -> bool:
+    """
+    OpenAI and xAI models are queried through the Responses API, everything else through chat completions
+    :param model_name: API name of the model
+    :return: True if the Responses API is used
+    """
+    return model_name in MODELS_LIST["openai_models"] or model_name in MODELS_LIST["xai_models"]
+
+
+def create_client(model_data: Dict[str, Any]) -> Union[openai.AsyncOpenAI, UnifiedChatApi]:
+    """
+    Create the API client of a model
+    :param model_data: model entry from config.toml including its model_title
+    :return: AsyncOpenAI for the Responses API and Ollama, UnifiedChatApi otherwise
+    """
+    client_params = {"api_key": model_data.get("api_key")}
+    if model_data.get("base_url"):
+        client_params["base_url"] = model_data["base_url"]
+    if uses_responses_api(model_data.get("model_name")) or model_data.get("model_title") == "ollama":
+        return openai.AsyncOpenAI(**client_params, http_client=async_http_client(model_data))
+    return UnifiedChatApi(**client_params)
+
+
+def build_request_params(
+    model_data: Dict[str, Any],
+    conversation: List[Dict[str, Any]],
+    temperature: float,
+    tools: Union[List[Dict[str, Any]], bool],
+    streaming: bool,
+    cached: Union[bool, str] = False,
+) -> Dict[str, Any]:
+    """
+    Build the request for the next reply of the model
+    :param model_data: model entry from config.toml including its model_title
+    :param conversation: the conversation so far
+    :param temperature: sampling temperature, ignored by reasoning models
+    :param tools: MCP tools in the format of the model or False to disable tools
+    :param streaming: whether the reply is streamed
+    :param cached: Anthropic prompt cache setting
+    :return: keyword arguments for responses.create or chat.completions.create
+    """
+    model_name = model_data.get("model_name")
+    reasoning_effort = model_data.get("reasoning_effort")
+
+    if not uses_responses_api(model_name):
+        params = {
+            "model": model_name,
+            "messages": conversation,
+            "temperature": temperature,
+            "tools": tools if tools is not False else [],
+            "stream": streaming,
+        }
+        if cached is not False:
+            params["cached"] = cached
+        if reasoning_effort:
+            params["reasoning_effort"] = reasoning_effort
+        return params
+
+    params = {
+        "model": model_name,
+        "input": conversation[1:] if conversation[0]["role"] == "system" else conversation,
+        "stream": streaming,
+    }
+    if conversation[0]["role"] == "system":
+        params["instructions"] = "Formatting re-enabled\n" + conversation[0]["content"]
+    if tools is not False:
+        res_tools = openai_response_tools(tools)
+        res_tools.extend([{"type": "web_search"}, {"type": "code_interpreter", "container": {"type": "auto"}}])
+        if model_name in MODELS_LIST["xai_models"]:
+            res_tools.append({"type": "x_search"})
+        if model_name in MODELS_LIST["openai_models"]:
+            res_tools.append({"type": "image_generation", "input_fidelity": "high"})
+        params["tools"] = res_tools
+        params["parallel_tool_calls"] = False
+    reasoning_disabled_text = False
+    if isinstance(reasoning_effort, str):
+        reasoning_disabled_text = reasoning_effort.strip().lower() in ("off", "none", "false", "0")
+
+    if reasoning_effort and not reasoning_disabled_text:
+        params.setdefault("reasoning", {})["effort"] = reasoning_effort
+        params["reasoning"]["summary"] = "detailed"
+    else:
+        params["temperature"] = temperature
+    verbosity = model_data.get("verbosity")
+    if verbosity:
+        params.setdefault("text", {})["verbosity"] = verbosity
+    if model_name == "o3-pro":
+        params["background"] = True
+    return params
+
+
+async def create_response(client: Union[openai.AsyncOpenAI, UnifiedChatApi], params: Dict[str, Any]) -> Any:
+    """
+    Send the request built by build_request_params
+    :param client: client from create_client
+    :param params: request parameters
+    :return: the response, or an async iterator of events/chunks when streaming
+    """
+    if isinstance(client, openai.AsyncOpenAI):
+        if "input" in params:
+            return await client.responses.create(**params)
+        return await client.chat.completions.create(**params)
+    # UnifiedChatApi has no async client, its blocking calls and stream run in a worker thread
+    response = await asyncio.to_thread(client.chat.completions.create, **params)
+    return iterate_in_thread(response) if params["stream"] else response
@@ -0,0 +1,314 @@
+import asyncio
+import random
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import (Any, Awaitable, Callable, Deque, Dict, Optional, Tuple,
+                    TypeVar)
+from urllib.parse import urlparse
+
+from unichat import MODELS_LIST
+from unichat.api_helper import openai
+
+"""
+Gateway for every provider call: a token bucket and a concurrency cap per (provider, api_key), plus retries
+with exponential backoff for rate limits, overloads and transient network errors.
+
+The buckets start unlimited and learn the real limits from the rate limit headers the providers send
+(OpenAI/xAI style x-ratelimit-*, Anthropic style anthropic-ratelimit-*, and Retry-After on 429s).
+"""
+
+T = TypeVar("T")
+
+DEFAULT_RETRIES = 3
+DEFAULT_MAX_CONCURRENCY = 8
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+# Status codes worth another attempt: timeout, conflict, rate limit, server errors and Anthropic's overloaded
+RETRYABLE_STATUS = frozenset({408, 409, 429, 500, 502, 503, 504, 529})
+RETRYABLE_ERROR_NAMES = frozenset({"APIConnectionError", "APITimeoutError"})
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def _parse_reset(value: Optional[str]) -> Optional[float]:
+    """Seconds until a limit resets, from "1s"/"6m0s"/"20ms" durations, plain seconds or RFC 3339 timestamps."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if parts:
+        return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+    try:
+        return max(0.0, datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() - time.time())
+    except ValueError:
+        return None
+
+
+def _header_int(headers, name: str) -> Optional[int]:
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+class ProviderLimiter:
+    """
+    Token bucket for the requests sent with one API key, with a FIFO concurrency cap.
+    Usable from threads and from coroutines on any event loop.
+    """
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        self.lock = threading.Lock()
+        self.capacity: Optional[float] = None  # Unknown until the provider reports it
+        self.rate = 0.0  # Tokens per second
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.max_concurrency = max_concurrency
+        self.active = 0
+        self.waiters: Deque[Callable[[], None]] = deque()
+
+    def set_rpm(self, rpm: int) -> None:
+        """Fixed requests-per-minute limit, headers may only lower it."""
+        with self.lock:
+            self._refill()
+            self.capacity = float(rpm)
+            self.rate = rpm / 60
+            self.tokens = min(self.tokens, self.capacity) if self.tokens else self.capacity
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if self.capacity is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Take a token and return how long the caller has to wait before sending."""
+        with self.lock:
+            self._refill()
+            now = time.monotonic()
+            wait = max(0.0, self.paused_until - now)
+            if self.capacity is not None:
+                self.tokens -= 1
+                if self.tokens < 0:
+                    wait = max(wait, -self.tokens / self.rate if self.rate else BACKOFF_MAX)
+            return wait
+
+    def pause(self, seconds: float) -> None:
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def observe(self, headers) -> None:
+        """Learn the limits from the headers of any provider response."""
+        limit = _header_int(headers, "x-ratelimit-limit-requests") or _header_int(
+            headers, "anthropic-ratelimit-requests-limit"
+        )
+        remaining = _header_int(headers, "x-ratelimit-remaining-requests")
+        if remaining is None:
+            remaining = _header_int(headers, "anthropic-ratelimit-requests-remaining")
+        reset = _parse_reset(
+            headers.get("x-ratelimit-reset-requests") or headers.get("anthropic-ratelimit-requests-reset")
+        )
+        with self.lock:
+            self._refill()
+            if limit:
+                # Limits are per minute for every provider that reports them
+                if self.capacity is None:
+                    self.capacity = self.tokens = float(limit)
+                self.capacity = min(self.capacity, float(limit))
+                self.rate = self.capacity / 60
+            if remaining is not None and self.capacity is not None:
+                self.tokens = min(self.tokens, float(remaining))
+            if remaining == 0 and reset:
+                self.paused_until = max(self.paused_until, time.monotonic() + reset)
+            # Running out of input/output tokens blocks requests just as well
+            for prefix in ("x-ratelimit-remaining-tokens", "anthropic-ratelimit-tokens-remaining"):
+                if _header_int(headers, prefix) == 0:
+                    token_reset = _parse_reset(
+                        headers.get("x-ratelimit-reset-tokens") or headers.get("anthropic-ratelimit-tokens-reset")
+                    )
+                    if token_reset:
+                        self.paused_until = max(self.paused_until, time.monotonic() + token_reset)
+
+    def _try_enter(self, waiter: Callable[[], None]) -> bool:
+        with self.lock:
+            if self.active < self.max_concurrency and not self.waiters:
+                self.active += 1
+                return True
+            self.waiters.append(waiter)
+            return False
+
+    def enter(self) -> None:
+        event = threading.Event()
+        if not self._try_enter(event.set):
+            event.wait()
+
+    async def aenter(self) -> None:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake() -> None:
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        if self._try_enter(wake):
+            return
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self.lock:
+                if wake in self.waiters:
+                    self.waiters.remove(wake)
+                    raise
+            self.leave()  # The slot was handed over while cancelling
+            raise
+
+    def leave(self) -> None:
+        """Release a slot, handing it directly to the longest waiting caller."""
+        with self.lock:
+            if self.waiters:
+                self.waiters.popleft()()
+            else:
+                self.active -= 1
+
+
+_limiters: Dict[Tuple[str, str], ProviderLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def provider_of(model_data: Dict[str, Any]) -> str:
+    if model_data.get("base_url"):
+        return urlparse(model_data["base_url"]).netloc or model_data["base_url"]
+    model_name = model_data.get("model_name")
+    for provider, models in MODELS_LIST.items():
+        if model_name in models:
+            return provider.removesuffix("_models")
+    return str(model_data.get("model_title", "unknown"))
+
+
+def limiter_for(model_data: Dict[str, Any]) -> ProviderLimiter:
+    """
+    The shared limiter of the model's provider and API key
+    :param model_data: model entry from config.toml
+    :return: limiter
+    """
+    key = (provider_of(model_data), model_data.get("api_key") or "")
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = ProviderLimiter()
+        return _limiters[key]
+
+
+def _provider_error(error: BaseException) -> BaseException:
+    # unichat re-raises the SDK errors as RuntimeError/ConnectionError with the original as the cause
+    while error.__cause__ is not None and getattr(error, "status_code", None) is None:
+        error = error.__cause__
+    return error
+
+
+def is_rate_limit(error: Exception) -> bool:
+    cause = _provider_error(error)
+    return getattr(cause, "status_code", None) == 429 or "rate limit" in str(error).lower()
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, overloads, server errors and connection problems."""
+    cause = _provider_error(error)
+    if getattr(cause, "status_code", None) in RETRYABLE_STATUS or is_rate_limit(error):
+        return True
+    if isinstance(cause, (ConnectionError, TimeoutError)) or type(cause).__name__ in RETRYABLE_ERROR_NAMES:
+        return True
+    return False
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    response = getattr(_provider_error(error), "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is None:
+        return None
+    return _parse_reset(headers.get("retry-after-ms") and f"{headers['retry-after-ms']}ms") or _parse_reset(
+        headers.get("retry-after")
+    )
+
+
+def backoff(attempt: int) -> float:
+    # Full jitter keeps concurrent callers from retrying in lockstep
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+
+
+def _retry_delay(limiter: ProviderLimiter, error: Exception, attempt: int) -> float:
+    response = getattr(_provider_error(error), "response", None)
+    if response is not None and getattr(response, "headers", None) is not None:
+        limiter.observe(response.headers)
+    delay = retry_after(error) or backoff(attempt)
+    if is_rate_limit(error):
+        limiter.pause(delay)
+    return delay
+
+
+def call(model_data: Dict[str, Any], action: Callable[[], T], retries: int = DEFAULT_RETRIES) -> T:
+    """
+    Run a blocking provider call through the limiter of its provider and API key
+    :param model_data: model entry from config.toml
+    :param action: the call, repeated on retryable errors
+    :param retries: retries after the first attempt
+    :return: the result of the call
+    """
+    limiter = limiter_for(model_data)
+    for attempt in range(retries + 1):
+        time.sleep(limiter.reserve())
+        limiter.enter()
+        try:
+            return action()
+        except Exception as e:
+            if attempt == retries or not is_retryable(e):
+                raise
+            delay = _retry_delay(limiter, e, attempt)
+        finally:
+            limiter.leave()
+        time.sleep(delay)
+
+
+async def acall(model_data: Dict[str, Any], action: Callable[[], Awaitable[T]], retries: int = DEFAULT_RETRIES) -> T:
+    """
+    Async counterpart of call()
+    :param model_data: model entry from config.toml
+    :param action: returns a new awaitable for every attempt
+    :param retries: retries after the first attempt
+    :return: the result of the call
+    """
+    limiter = limiter_for(model_data)
+    for attempt in range(retries + 1):
+        await asyncio.sleep(limiter.reserve())
+        await limiter.aenter()
+        try:
+            return await action()
+        except Exception as e:
+            if attempt == retries or not is_retryable(e):
+                raise
+            delay = _retry_delay(limiter, e, attempt)
+        finally:
+            limiter.leave()
+        await asyncio.sleep(delay)
+
+
+def http_client(model_data: Dict[str, Any]) -> openai.DefaultHttpxClient:
+    """HTTP client for openai.OpenAI that reports every response's rate limit headers to the limiter."""
+    limiter = limiter_for(model_data)
+    return openai.DefaultHttpxClient(event_hooks={"response": [lambda response: limiter.observe(response.headers)]})
+
+
+def async_http_client(model_data: Dict[str, Any]) -> openai.DefaultAsyncHttpxClient:
+    """HTTP client for openai.AsyncOpenAI that reports every response's rate limit headers to the limiter."""
+    limiter = limiter_for(model_data)
+
+    async def observe(response) -> None:
+        limiter.observe(response.headers)
+
+    return openai.DefaultAsyncHttpxClient(event_hooks={"response": [observe]})
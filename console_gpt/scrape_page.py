@@ -1,12 +1,80 @@
 import re
+from typing import Iterable, List
 
 import requests
 from bs4 import BeautifulSoup
-from markdownify import markdownify as md
+from bs4.element import NavigableString, PreformattedString, Tag
 from rich.console import Console
 
 from console_gpt.prompts.system_prompt import system_reply
 
+try:
+    import lxml  # noqa: F401 - only probed to pick the faster parser
+
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# Subtrees that never carry readable content and are skipped during the traversal
+PRUNED_TAGS = frozenset(
+    {
+        "script",
+        "style",
+        "meta",
+        "link",
+        "head",
+        "noscript",
+        "footer",
+        "iframe",
+        "input",
+        "form",
+        "nav",
+        "aside",
+        "svg",
+        "canvas",
+        "template",
+        "button",
+        "select",
+        "textarea",
+        "img",
+        "picture",
+        "video",
+        "audio",
+        "object",
+        "embed",
+    }
+)
+BLOCK_TAGS = frozenset(
+    {
+        "p",
+        "div",
+        "section",
+        "article",
+        "main",
+        "header",
+        "figure",
+        "figcaption",
+        "address",
+        "details",
+        "summary",
+        "dl",
+        "dt",
+        "dd",
+        "center",
+    }
+)
+BOILERPLATE_ROLES = frozenset({"navigation", "banner", "contentinfo", "complementary", "search", "dialog"})
+BOILERPLATE_PATTERN = re.compile(
+    r"(?:^|[\s_-])(?:nav|navbar|menu|breadcrumbs?|sidebar|footer|cookies?|consent|advert|ads|promo|share|social"
+    r"|related|newsletter|subscribe|popup|modal|skip-link)(?:$|[\s_-])",
+    re.IGNORECASE,
+)
+WHITESPACE_PATTERN = re.compile(r"\s+")
+BLANK_LINES_PATTERN = re.compile(r"\n(?:[ \t]*\n)+")
+TRAILING_SPACES_PATTERN = re.compile(r"[ \t]+\n")
+# Below this amount of text the detected main content is considered a miss and the whole body is used
+MIN_MAIN_CONTENT_CHARS = 200
+
 
 def _fetch_html(url) -> tuple[str, bool]:
     """
@@ -34,44 +102,240 @@ def _fetch_html(url) -> tuple[str, bool]:
         return response.text, True
 
 
-def _clean_html(html_content) -> str:
+def _is_boilerplate(tag: Tag) -> bool:
     """
-    Remove unnecessary HTML tags
-    :param html_content: HTML content
-    :return: HTML without unnecessary HTML tags"""
-    soup = BeautifulSoup(html_content, "html.parser")
+    Detect hidden elements and page chrome marked up by ARIA role
+    :param tag: HTML tag
+    :return: True if the tag should be dropped together with its children
+    """
+    attrs = tag.attrs
+    if not attrs:
+        return False
+    if "hidden" in attrs or attrs.get("aria-hidden") == "true":
+        return True
+    return attrs.get("role") in BOILERPLATE_ROLES
 
-    # List of unnecessary tags you might want to remove
-    useless_tags = [
-        "script",
-        "style",
-        "meta",
-        "link",
-        "head",
-        "noscript",
-        "footer",
-        "iframe",
-        "input",
-        "form",
-        "comment",
-    ]
-    for tag in useless_tags:
-        for script in soup(tag):
-            script.decompose()
 
-    return str(soup)
+def _has_boilerplate_name(tag: Tag) -> bool:
+    """
+    Detect navigation, sidebars and similar page chrome by class/id names
+    :param tag: HTML tag
+    :return: True if a class or the id looks like page chrome
+    """
+    attrs = tag.attrs
+    if not attrs:
+        return False
+    classes = attrs.get("class")
+    names = " ".join(classes) if isinstance(classes, list) else str(classes or "")
+    element_id = attrs.get("id")
+    if element_id:
+        names = f"{names} {element_id}"
+    return bool(names) and BOILERPLATE_PATTERN.search(names) is not None
+
+
+def _is_main_candidate(tag: Tag) -> bool:
+    return tag.name in ("main", "article") or tag.get("role") == "main"
+
+
+def _find_main_content(soup: BeautifulSoup) -> Tag:
+    """
+    Locate the main content of the page (<main>, role="main" or a single <article>)
+    :param soup: parsed document
+    :return: the main content tag or the body when nothing stands out
+    """
+    candidates = soup.find_all(_is_main_candidate)
+    mains = [tag for tag in candidates if tag.name == "main" or tag.get("role") == "main"]
+    if len(mains) == 1:
+        return mains[0]
+    articles = [tag for tag in candidates if tag.name == "article"]
+    if len(articles) == 1:
+        return articles[0]
+    return soup.body or soup
 
 
-def _convert_html_to_markdown(html) -> str:
+class _MarkdownEmitter:
+    """
+    Walks the parsed document once, skipping pruned subtrees and emitting Markdown directly
+    :param prune_chrome: drop page chrome (hidden elements, ARIA roles, class/id names)
+    :param keep: tags never dropped as page chrome, i.e. the detected main content and its ancestors
     """
-    Convert HTML to Markdown to reduce token usage
-    :param html: HTML content
+
+    def __init__(self, prune_chrome: bool = True, keep: Iterable[Tag] = ()):
+        self.prune_chrome = prune_chrome
+        self.keep = {id(tag) for tag in keep}
+        self.root_chars = 0
+
+    def render(self, node: Tag) -> str:
+        self.root_chars = len(node.get_text()) if self.prune_chrome else 0
+        markdown = self._render_children(node)
+        markdown = TRAILING_SPACES_PATTERN.sub("\n", markdown)
+        return BLANK_LINES_PATTERN.sub("\n\n", markdown).strip()
+
+    def _render_children(self, node: Tag) -> str:
+        parts: List[str] = []
+        for child in node.children:
+            text = self._render(child)
+            if not text:
+                continue
+            # Avoid indenting text that follows a block element
+            if isinstance(child, NavigableString) and (not parts or parts[-1].endswith("\n")):
+                text = text.lstrip(" ")
+                if not text:
+                    continue
+            parts.append(text)
+        return "".join(parts)
+
+    def _render(self, node) -> str:
+        if isinstance(node, NavigableString):
+            # Comments, CDATA, doctype and processing instructions are all preformatted strings
+            if isinstance(node, PreformattedString):
+                return ""
+            return WHITESPACE_PATTERN.sub(" ", node)
+        if not isinstance(node, Tag):
+            return ""
+
+        name = node.name
+        if name in PRUNED_TAGS or self._is_chrome(node):
+            return ""
+
+        match name:
+            case "h1" | "h2" | "h3" | "h4" | "h5" | "h6":
+                text = self._inline_text(node)
+                return f"\n\n{'#' * int(name[1])} {text}\n\n" if text else ""
+            case "br":
+                return "\n"
+            case "hr":
+                return "\n\n---\n\n"
+            case "a":
+                return self._render_link(node)
+            case "strong" | "b":
+                return self._wrap(self._render_children(node), "**")
+            case "em" | "i":
+                return self._wrap(self._render_children(node), "*")
+            case "code" | "kbd" | "samp":
+                text = node.get_text()
+                return f"`{text}`" if text.strip() else ""
+            case "pre":
+                return self._render_pre(node)
+            case "ul" | "ol":
+                return self._render_list(node, ordered=name == "ol")
+            case "li":
+                # Stray list item outside of a list
+                return self._render_list_item(node, "- ")
+            case "blockquote":
+                content = BLANK_LINES_PATTERN.sub("\n\n", self._render_children(node)).strip()
+                if not content:
+                    return ""
+                quoted = "\n".join(f"> {line}" if line else ">" for line in content.split("\n"))
+                return f"\n\n{quoted}\n\n"
+            case "table":
+                return self._render_table(node)
+            case _ if name in BLOCK_TAGS:
+                content = self._render_children(node).strip()
+                return f"\n\n{content}\n\n" if content else ""
+            case _:
+                return self._render_children(node)
+
+    def _is_chrome(self, node: Tag) -> bool:
+        if not self.prune_chrome or id(node) in self.keep:
+            return False
+        if _is_boilerplate(node):
+            return True
+        # Class/id names are a weak hint: wrappers like <div class="container has-sidebar"> hold the whole
+        # article, so only elements carrying a minor part of the page text are dropped on a name match
+        return _has_boilerplate_name(node) and len(node.get_text()) * 2 < self.root_chars
+
+    def _inline_text(self, node: Tag) -> str:
+        return WHITESPACE_PATTERN.sub(" ", self._render_children(node)).strip()
+
+    @staticmethod
+    def _wrap(content: str, marker: str) -> str:
+        stripped = content.strip()
+        if not stripped:
+            return content
+        leading = " " if content[0].isspace() else ""
+        trailing = " " if content[-1].isspace() else ""
+        return f"{leading}{marker}{stripped}{marker}{trailing}"
+
+    def _render_link(self, node: Tag) -> str:
+        text = self._inline_text(node)
+        href = node.get("href") or ""
+        if not text:
+            return ""
+        if not href or href.startswith(("#", "javascript:", "mailto:")):
+            return text
+        return f"[{text}]({href})"
+
+    @staticmethod
+    def _render_pre(node: Tag) -> str:
+        code = node.get_text().strip("\n")
+        if not code.strip():
+            return ""
+        language = ""
+        code_tag = node.find("code")
+        if code_tag is not None:
+            for css_class in code_tag.get("class") or []:
+                if css_class.startswith(("language-", "lang-")):
+                    language = css_class.split("-", 1)[1]
+                    break
+        return f"\n\n```{language}\n{code}\n```\n\n"
+
+    def _render_list(self, node: Tag, ordered: bool) -> str:
+        items = []
+        for index, item in enumerate(node.find_all("li", recursive=False), start=1):
+            rendered = self._render_list_item(item, f"{index}. " if ordered else "- ")
+            if rendered:
+                items.append(rendered)
+        return "\n\n" + "\n".join(items) + "\n\n" if items else ""
+
+    def _render_list_item(self, node: Tag, bullet: str) -> str:
+        content = BLANK_LINES_PATTERN.sub("\n", self._render_children(node).strip())
+        if not content:
+            return ""
+        indent = " " * len(bullet)
+        return bullet + content.replace("\n", "\n" + indent)
+
+    def _render_table(self, node: Tag) -> str:
+        rows = []
+        for row in node.find_all("tr"):
+            cells = [
+                self._inline_text(cell).replace("|", "\\|") for cell in row.find_all(("th", "td"), recursive=False)
+            ]
+            if any(cells):
+                rows.append(cells)
+        if not rows:
+            return ""
+        width = max(len(cells) for cells in rows)
+        lines = []
+        for index, cells in enumerate(rows):
+            cells = cells + [""] * (width - len(cells))
+            lines.append("| " + " | ".join(cells) + " |")
+            if index == 0:
+                lines.append("|" + "---|" * width)
+        return "\n\n" + "\n".join(lines) + "\n\n"
+
+
+def html_to_markdown(html_content: str, main_content_only: bool = True) -> str:
+    """
+    Convert HTML to Markdown in a single parse and a single traversal.
+    Unnecessary tags and page chrome (navigation, banners, footers) are pruned while walking the tree.
+    :param html_content: HTML content
+    :param main_content_only: restrict the output to the detected main content of the page
     :return: Markdown
     """
-    markdown_text_raw = md(html)
-    # Remove useless empty lines from purged HTML
-    markdown_text = re.sub(r"\n{3,}", "\n\n", markdown_text_raw).strip()
-    return markdown_text
+    soup = BeautifulSoup(html_content, HTML_PARSER)
+    body = soup.body or soup
+    root = _find_main_content(soup) if main_content_only else body
+    keep = [root, *root.parents] if root is not body else []
+    markdown = _MarkdownEmitter(keep=keep).render(root)
+    if root is not body and len(markdown) < MIN_MAIN_CONTENT_CHARS:
+        markdown = _MarkdownEmitter(keep=keep).render(body)
+    if len(markdown) < MIN_MAIN_CONTENT_CHARS:
+        # Pruning is heuristic, rather return the page with its chrome than (almost) nothing
+        unfiltered = _MarkdownEmitter(prune_chrome=False).render(body)
+        if len(unfiltered) > len(markdown):
+            markdown = unfiltered
+    return markdown
 
 
 def page_content(url: str) -> tuple[str, int]:
@@ -85,8 +349,7 @@ def page_content(url: str) -> tuple[str, int]:
         return "", False
     html_content, success = _fetch_html(url)
     if success:
-        cleaned_html = _clean_html(html_content)
-        markdown_output = _convert_html_to_markdown(cleaned_html)
+        markdown_output = html_to_markdown(html_content)
         if markdown_output:
             return markdown_output, success
         system_reply(url, "[ERROR] No content was found on the page:")
@@ -1,30 +1,43 @@
-import base64
 import hmac
-import html
-import io
+import json
 import re
 import secrets
 import select
+import ssl
 import subprocess
 import sys
+import tempfile
 import threading
 import time
 from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import IO, Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
 
 import requests
-from pypdf import PdfReader
 from unichat import MODELS_LIST, UnifiedChatApi
 from unichat.api_helper import openai
 
-from console_gpt.config_manager import (fetch_variable,
+from console_gpt.config_manager import (config_signature, fetch_variable,
                                         fetch_variable_resolved,
                                         write_to_config)
 from console_gpt.custom_stdout import custom_print
+from console_gpt.failover import DEFAULT_PERCENTILE, hedged_call
+from console_gpt.menus.tools_menu import (openai_completion_tools,
+                                          openai_response_tools)
 from console_gpt.ollama_helper import (is_ollama_running, list_ollama_models,
                                        start_ollama)
+from console_gpt.provider_gateway import call, http_client
+from console_gpt.telegram_markdown import (html_chunks, html_to_text,
+                                           markdown_chunks)
+from console_gpt.telegram_media import (encode_image, extract_pdf_text_in_pool,
+                                        image_max_side, media_cache,
+                                        pick_photo_size)
+from console_gpt.telegram_webhook import (DEFAULT_MAX_PENDING_UPDATES,
+                                          WebhookServer)
+from mcp_servers.mcp_pool import shared_pool
 from mcp_servers.server_manager import ServerManager
+from mcp_servers.tool_prefetch import get_prefetched_tools, start_tool_prefetch
 
 ANTHROPIC_WEB_SEARCH_MAX_USES = 5
 ANTHROPIC_WEB_FETCH_MAX_USES = 5
@@ -33,11 +46,25 @@ ANTHROPIC_WEB_FETCH_MAX_CONTENT_TOKENS = 50000
 ANTHROPIC_WEB_SEARCH_TOOL_TYPE = "web_search_20260209"
 ANTHROPIC_WEB_FETCH_TOOL_TYPE = "web_fetch_20260209"
 OPENAI_WEB_SEARCH_TOOL_TYPE = "web_search"
-TELEGRAM_TEXT_CHUNK_SIZE = 3900
+# Telegram's limit for the text of a message, chunks are measured by their HTML which is never shorter
+TELEGRAM_TEXT_CHUNK_SIZE = 4096
 TELEGRAM_RICH_CHUNK_SIZE = 32000
 PAIRING_CODE_TTL_SECONDS = 600
 PAIRING_MAX_FAILED_ATTEMPTS = 5
 PAIRING_LOCKOUT_SECONDS = 300
+DEFAULT_MCP_MAX_TOOL_ROUNDS = 5
+# getFile serves files up to 20 MB
+TELEGRAM_MAX_FILE_BYTES = 20 * 1024 * 1024
+TELEGRAM_SPOOL_MEMORY_BYTES = 2 * 1024 * 1024
+TELEGRAM_DOWNLOAD_CHUNK_BYTES = 64 * 1024
+DEFAULT_MCP_TOOL_TIMEOUT = 60
+# Quiet period after the last part of an album before it is processed as one message
+DEFAULT_MEDIA_GROUP_WAIT_SECONDS = 1.0
+DEFAULT_WEBHOOK_LISTEN = "127.0.0.1"
+DEFAULT_WEBHOOK_PORT = 8443
+MEDIA_WORKERS = 4
+
+_media_executor = ThreadPoolExecutor(max_workers=MEDIA_WORKERS, thread_name_prefix="tg-media")
 
 
 class _TelegramModelRequestError(RuntimeError):
@@ -113,73 +140,45 @@ def _consume_terminal_control_command() -> Optional[str]:
         return None
 
 
-def _telegram_get_file_bytes(token: str, file_id: str) -> bytes:
+def _too_large_error(size: int) -> _UnsupportedTelegramInputError:
+    return _UnsupportedTelegramInputError(
+        f"The file is too large ({size / 1024 / 1024:.1f} MB), the limit is {TELEGRAM_MAX_FILE_BYTES // 1024 // 1024} MB."
+    )
+
+
+def _telegram_download(token: str, file_id: str, known_size: Optional[int] = None) -> IO[bytes]:
+    """
+    Stream a Telegram file to a spooled temporary file, which stays in memory for small files
+    :param token: bot token
+    :param file_id: Telegram file id
+    :param known_size: file_size reported in the message, oversized files are rejected before any request
+    :return: the spool, positioned at the start
+    """
+    if known_size and known_size > TELEGRAM_MAX_FILE_BYTES:
+        raise _too_large_error(known_size)
     file_meta = _telegram_api(token, "getFile", {"file_id": file_id}).get("result", {})
     file_path = file_meta.get("file_path")
     if not file_path:
         raise RuntimeError("Missing file_path in Telegram getFile response")
+    if (file_meta.get("file_size") or 0) > TELEGRAM_MAX_FILE_BYTES:
+        raise _too_large_error(file_meta["file_size"])
 
     file_url = f"https://api.telegram.org/file/bot{token}/{file_path}"
-    file_response = requests.get(file_url, timeout=60)
-    file_response.raise_for_status()
-    return file_response.content
-
-
-def _chunk_text(text: str, chunk_size: int = TELEGRAM_TEXT_CHUNK_SIZE) -> List[str]:
-    if len(text) <= chunk_size:
-        return [text]
-
-    chunks: List[str] = []
-    start = 0
-    while start < len(text):
-        end = min(start + chunk_size, len(text))
-        if end < len(text):
-            split = text.rfind("\n", start, end)
-            if split > start:
-                end = split + 1
-        chunks.append(text[start:end])
-        start = end
-    return chunks
-
-
-def _telegram_markdown_to_html(text: str) -> str:
-    """Convert a subset of markdown-like model output to Telegram-safe HTML."""
-    if not text:
-        return ""
-
-    fenced_blocks: List[str] = []
-
-    def _capture_fenced_block(match: re.Match[str]) -> str:
-        block = match.group(1) or ""
-        escaped = html.escape(block.strip("\n"))
-        fenced_blocks.append(f"<pre><code>{escaped}</code></pre>")
-        return f"@@TG_CODEBLOCK_{len(fenced_blocks) - 1}@@"
-
-    without_fenced = re.sub(r"```(?:[^\n`]+)?\n([\s\S]*?)```", _capture_fenced_block, text)
-    escaped_text = html.escape(without_fenced)
-
-    lines: List[str] = []
-    for line in escaped_text.split("\n"):
-        heading_match = re.match(r"^\s{0,3}#{1,6}\s+(.+)$", line)
-        if heading_match:
-            lines.append(f"<b>{heading_match.group(1).strip()}</b>")
-        else:
-            lines.append(line)
-    transformed = "\n".join(lines)
-
-    transformed = re.sub(
-        r"\[([^\]]+)\]\((https?://[^\s)]+)\)",
-        lambda m: f'<a href="{m.group(2)}">{m.group(1)}</a>',
-        transformed,
-    )
-    transformed = re.sub(r"\*\*(.+?)\*\*", r"<b>\1</b>", transformed)
-    transformed = re.sub(r"__(.+?)__", r"<b>\1</b>", transformed)
-    transformed = re.sub(r"`([^`\n]+)`", r"<code>\1</code>", transformed)
-
-    for idx, block in enumerate(fenced_blocks):
-        transformed = transformed.replace(f"@@TG_CODEBLOCK_{idx}@@", block)
-
-    return transformed
+    spool = tempfile.SpooledTemporaryFile(max_size=TELEGRAM_SPOOL_MEMORY_BYTES)
+    try:
+        with requests.get(file_url, timeout=60, stream=True) as file_response:
+            file_response.raise_for_status()
+            received = 0
+            for chunk in file_response.iter_content(chunk_size=TELEGRAM_DOWNLOAD_CHUNK_BYTES):
+                received += len(chunk)
+                if received > TELEGRAM_MAX_FILE_BYTES:
+                    raise _too_large_error(received)
+                spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
 
 
 def _should_fallback_from_rich_message_error(error: RuntimeError) -> bool:
@@ -199,26 +198,26 @@ def _should_fallback_from_rich_message_error(error: RuntimeError) -> bool:
     )
 
 
-def _send_legacy_message_part(token: str, chat_id: int, part: str) -> None:
-    payload = {
-        "chat_id": chat_id,
-        "text": _telegram_markdown_to_html(part),
-        "parse_mode": "HTML",
-        "disable_web_page_preview": True,
-    }
-    try:
-        _telegram_api(token, "sendMessage", payload)
-    except RuntimeError as e:
-        # Fallback to plain text if Telegram rejects entities for a specific chunk.
-        error_text = str(e).lower()
-        if "parse entities" in error_text or "can't parse entities" in error_text:
-            _telegram_api(token, "sendMessage", {"chat_id": chat_id, "text": part})
-        else:
-            raise
+def _send_legacy_message(token: str, chat_id: int, text: str) -> None:
+    # Chunks are sized by their HTML and keep tags and code blocks whole, so their visible text fits as well.
+    for part in html_chunks(text, TELEGRAM_TEXT_CHUNK_SIZE):
+        try:
+            _telegram_api(
+                token,
+                "sendMessage",
+                {"chat_id": chat_id, "text": part, "parse_mode": "HTML", "disable_web_page_preview": True},
+            )
+        except RuntimeError as e:
+            # Fallback to plain text if Telegram rejects entities for a specific chunk (e.g. an unsupported href).
+            error_text = str(e).lower()
+            if "parse entities" in error_text or "can't parse entities" in error_text:
+                _telegram_api(token, "sendMessage", {"chat_id": chat_id, "text": html_to_text(part)})
+            else:
+                raise
 
 
 def _send_message(token: str, chat_id: int, text: str) -> None:
-    for part in _chunk_text(text.strip() or "(empty response)", TELEGRAM_RICH_CHUNK_SIZE):
+    for part in markdown_chunks(text.strip() or "(empty response)", TELEGRAM_RICH_CHUNK_SIZE):
         payload = {
             "chat_id": chat_id,
             "rich_message": {"markdown": part},
@@ -228,8 +227,7 @@ def _send_message(token: str, chat_id: int, text: str) -> None:
         except RuntimeError as e:
             if not _should_fallback_from_rich_message_error(e):
                 raise
-            for legacy_part in _chunk_text(part):
-                _send_legacy_message_part(token, chat_id, legacy_part)
+            _send_legacy_message(token, chat_id, part)
 
 
 def _is_allowed_chat(chat_id: int, allowed_chat_ids: List[int]) -> bool:
@@ -237,40 +235,92 @@ def _is_allowed_chat(chat_id: int, allowed_chat_ids: List[int]) -> bool:
     return chat_id in allowed_chat_ids
 
 
-def _extract_pdf_text(file_bytes: bytes) -> str:
-    text_parts: List[str] = []
-    reader = PdfReader(io.BytesIO(file_bytes))
-    for page in reader.pages:
-        text_parts.append(page.extract_text() or "")
-    return "\n".join(text_parts).strip()
-
-
 def _extract_document_content(file_name: str, file_bytes: bytes) -> Optional[str]:
     suffix = Path(file_name or "").suffix.lower()
     if suffix == ".txt":
         return file_bytes.decode("utf-8", errors="replace").strip()
     if suffix == ".pdf":
-        return _extract_pdf_text(file_bytes)
+        return extract_pdf_text_in_pool(file_bytes)
     return None
 
 
+def _encoded_photo(token: str, photo_sizes: List[Dict[str, Any]], model_title: str) -> str:
+    """The photo downscaled for the model and base64 encoded, cached by its file_unique_id."""
+    max_side = image_max_side(model_title)
+    photo = pick_photo_size(photo_sizes, max_side)
+
+    def _process() -> str:
+        with _telegram_download(token, photo["file_id"], photo.get("file_size")) as spool:
+            return encode_image(spool, max_side)
+
+    return media_cache.get_or_create(("photo", photo.get("file_unique_id") or photo["file_id"], max_side), _process)
+
+
+def _document_text(token: str, doc: Dict[str, Any]) -> str:
+    """Text content of a .txt or .pdf document, cached by its file_unique_id."""
+    file_name = doc.get("file_name") or ""
+    if Path(file_name).suffix.lower() not in (".txt", ".pdf"):
+        raise _UnsupportedTelegramInputError(
+            f"Unsupported document type: {file_name}. Please send .txt or .pdf files only."
+            if file_name
+            else "Unsupported document type. Please send .txt or .pdf files only."
+        )
+
+    def _process() -> str:
+        with _telegram_download(token, doc["file_id"], doc.get("file_size")) as spool:
+            return _extract_document_content(file_name, spool.read())
+
+    return media_cache.get_or_create(("document", doc.get("file_unique_id") or doc["file_id"]), _process)
+
+
+# Config values every session starts from, re-read only when config.toml changes on disk
+_config_defaults_cache: Dict[str, Any] = {"signature": None}
+_config_defaults_lock = threading.Lock()
+
+
+def _config_defaults() -> Dict[str, Any]:
+    signature = config_signature()
+    with _config_defaults_lock:
+        if signature is None or _config_defaults_cache["signature"] != signature:
+            _config_defaults_cache.update(
+                signature=signature,
+                models=fetch_variable("models"),
+                model=fetch_variable("defaults", "model"),
+                system_role=fetch_variable("defaults", "system_role"),
+                temperature=fetch_variable("defaults", "temperature"),
+                roles=fetch_variable_resolved("roles"),
+                mcp_tools=bool(
+                    fetch_variable("features", "mcp_client", auto_exit=False)
+                    and fetch_variable("telegram", "mcp_tools", auto_exit=False)
+                ),
+                mcp_allowed_tools=fetch_variable("telegram", "mcp_allowed_tools", auto_exit=False) or ["*"],
+                mcp_chat_tools=fetch_variable("telegram", "mcp_chat_tools", auto_exit=False) or {},
+                mcp_max_tool_rounds=int(
+                    fetch_variable("telegram", "mcp_max_tool_rounds", auto_exit=False) or DEFAULT_MCP_MAX_TOOL_ROUNDS
+                ),
+                mcp_tool_timeout=float(
+                    fetch_variable("telegram", "mcp_tool_timeout", auto_exit=False) or DEFAULT_MCP_TOOL_TIMEOUT
+                ),
+            )
+        return dict(_config_defaults_cache)
+
+
 def _build_default_session(model_key_override: Optional[str] = None) -> Dict[str, Any]:
-    models = fetch_variable("models")
-    default_model = fetch_variable("defaults", "model")
+    defaults = _config_defaults()
+    models = defaults["models"]
+    default_model = defaults["model"]
     selected_model = model_key_override if model_key_override in models else default_model
     model_key = selected_model if selected_model in models else next(iter(models.keys()))
     model_data = dict(models[model_key])
     model_data.update({"model_title": model_key})
 
-    role_key = fetch_variable("defaults", "system_role")
-    role_data = fetch_variable_resolved("roles")
-    system_role = role_data.get(role_key, "Deliver precise and informative virtual assistance.")
+    role_key = defaults["system_role"]
+    system_role = defaults["roles"].get(role_key, "Deliver precise and informative virtual assistance.")
 
-    temperature = fetch_variable("defaults", "temperature")
     return {
         "model": model_data,
         "role_key": role_key,
-        "temperature": temperature,
+        "temperature": defaults["temperature"],
         "reasoning_effort_override": None,
         "mode": "message",
         "web_search_enabled": False,
@@ -349,20 +399,37 @@ def _build_telegram_model_chat_overrides() -> Dict[int, str]:
 
 
 def _default_system_role_content() -> str:
-    role_key = fetch_variable("defaults", "system_role")
-    role_data = fetch_variable_resolved("roles")
-    return role_data.get(role_key, "Deliver precise and informative virtual assistance.")
+    defaults = _config_defaults()
+    return defaults["roles"].get(defaults["system_role"], "Deliver precise and informative virtual assistance.")
 
 
 def _session_system_role_content(session: Dict[str, Any]) -> str:
-    role_data = fetch_variable_resolved("roles")
-    role_key = str(session.get("role_key") or fetch_variable("defaults", "system_role"))
-    return role_data.get(role_key, _default_system_role_content())
+    defaults = _config_defaults()
+    role_key = str(session.get("role_key") or defaults["system_role"])
+    return defaults["roles"].get(role_key, _default_system_role_content())
+
+
+def _session_template(session: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The compiled start of a conversation for this session: the system message, which is also the prompt cache payload.
+    Reused until config.toml changes or the session switches roles.
+    """
+    signature = config_signature()
+    template = session.get("_template")
+    role_key = session.get("role_key")
+    if template is None or signature is None or template["signature"] != signature or template["role_key"] != role_key:
+        template = {
+            "signature": signature,
+            "role_key": role_key,
+            "system_content": _session_system_role_content(session),
+        }
+        session["_template"] = template
+    return template
 
 
 def _set_session_role(session: Dict[str, Any], role_key: str, preserve_history: bool) -> None:
     session["role_key"] = role_key
-    system_content = _session_system_role_content(session)
+    system_content = _session_template(session)["system_content"]
 
     if preserve_history:
         conversation = session.setdefault("conversation", [])
@@ -384,7 +451,10 @@ def _clear_session_runtime_client(session: Dict[str, Any]) -> None:
 
 
 def _reset_session_conversation(session: Dict[str, Any]) -> None:
-    _set_session_role(session, str(session.get("role_key") or fetch_variable("defaults", "system_role")), False)
+    """Start over from the session template. The runtime client does not depend on the conversation and is kept."""
+    if not session.get("role_key"):
+        session["role_key"] = _config_defaults()["system_role"]
+    session["conversation"] = [{"role": "system", "content": _session_template(session)["system_content"]}]
 
 
 def _rollback_last_user_turn(session: Dict[str, Any]) -> None:
@@ -411,7 +481,7 @@ def _session_cached_prompt_payload(session: Dict[str, Any]) -> Any:
     conversation = session.get("conversation", []) or []
     if conversation and isinstance(conversation[0], dict) and conversation[0].get("role") == "system":
         return conversation[0].get("content", "")
-    return _session_system_role_content(session)
+    return _session_template(session)["system_content"]
 
 
 def _sync_session_prompt_cache(session: Dict[str, Any]) -> None:
@@ -696,13 +766,28 @@ def _render_help_message(is_model_locked_chat: bool, model_locked_key: Optional[
     return "\n".join(lines)
 
 
-def _extract_responses_text(response: Any) -> Tuple[str, List[Dict[str, Any]]]:
+def _extract_responses_text(
+    response: Any, tools_enabled: bool = False
+) -> Tuple[str, List[Dict[str, Any]], List[Tuple[str, str, str]]]:
+    """
+    Text, conversation items and (call id, tool name, arguments) of the function calls of a Responses API reply.
+    Function calls keep the reasoning items that led to them, the API expects both when they are sent back.
+    """
     assistant_chunks: List[str] = []
     parsed_output: List[Dict[str, Any]] = []
+    reasoning_output: List[Dict[str, Any]] = []
+    tool_calls: List[Tuple[str, str, str]] = []
 
     for output in getattr(response, "output", []) or []:
         output_type = getattr(output, "type", "")
-        if output_type == "message":
+        if output_type == "reasoning":
+            reasoning_output.append(output.model_dump())
+        elif output_type == "function_call" and tools_enabled:
+            parsed_output.extend(reasoning_output)
+            reasoning_output = []
+            parsed_output.append(output.model_dump())
+            tool_calls.append((output.call_id, output.name, output.arguments))
+        elif output_type == "message":
             text_content = ""
             for content_part in getattr(output, "content", []) or []:
                 part_text = getattr(content_part, "text", None)
@@ -717,10 +802,12 @@ def _extract_responses_text(response: Any) -> Tuple[str, List[Dict[str, Any]]]:
                 "The model tried to call a local tool, but Telegram runtime has MCP tools disabled.",
             )
 
-    return "\n\n".join(assistant_chunks).strip(), parsed_output
+    return "\n\n".join(assistant_chunks).strip(), parsed_output, tool_calls
 
 
-def _extract_completion_text(response: Any) -> Tuple[str, Dict[str, Any]]:
+def _extract_completion_text(
+    response: Any, tools_enabled: bool = False
+) -> Tuple[str, Dict[str, Any], List[Tuple[str, str, str]]]:
     message = response.choices[0].message
     content = getattr(message, "content", "")
 
@@ -736,14 +823,89 @@ def _extract_completion_text(response: Any) -> Tuple[str, Dict[str, Any]]:
     else:
         text_content = str(content or "").strip()
 
+    assistant_msg: Dict[str, Any] = {"role": "assistant", "content": text_content}
     tool_calls = getattr(message, "tool_calls", None)
-    if tool_calls:
+    if not tool_calls:
+        return text_content, assistant_msg, []
+    if not tools_enabled:
         raise _TelegramModelRequestError(
             "Model returned local tool calls, but Telegram runtime has MCP tools disabled.",
             "The model tried to call a local tool, but Telegram runtime has MCP tools disabled.",
         )
 
-    return text_content, {"role": "assistant", "content": text_content}
+    assistant_msg["tool_calls"] = [
+        {
+            "id": tool_call.id,
+            "type": "function",
+            "function": {"name": tool_call.function.name, "arguments": tool_call.function.arguments or "{}"},
+        }
+        for tool_call in tool_calls
+    ]
+    calls = [
+        (call["id"], call["function"]["name"], call["function"]["arguments"]) for call in assistant_msg["tool_calls"]
+    ]
+    return text_content, assistant_msg, calls
+
+
+def _mcp_tools_for_chat(session: Dict[str, Any], chat_id: int) -> List[Dict[str, Any]]:
+    """MCP tool definitions the chat may use, empty while MCP tools are disabled in Telegram runtime or the session."""
+    defaults = _config_defaults()
+    if not defaults["mcp_tools"] or session.get("_mcp_tools_disabled"):
+        return []
+    tools = get_prefetched_tools() or []
+    allowed = defaults["mcp_chat_tools"].get(str(chat_id), defaults["mcp_allowed_tools"])
+    if "*" in allowed:
+        return tools
+    return [tool for tool in tools if tool.get("name") in allowed]
+
+
+def _run_mcp_tool_calls(chat_id: int, calls: List[Tuple[str, str, str]], tools: List[Dict[str, Any]]) -> List[str]:
+    """
+    Run the tool calls of one reply concurrently on the shared bridge pool.
+    Every call has its own timeout and the bridge schedules the calls of each chat fairly,
+    so a slow tool only delays the chat that called it.
+    :param chat_id: the calling chat
+    :param calls: (call id, tool name, JSON arguments) of the reply
+    :param tools: the tools offered to the chat, anything else is refused
+    :return: the output or error message of each call, for the model
+    """
+    allowed_names = {tool.get("name") for tool in tools}
+    results: List[Any] = [None] * len(calls)
+    pending: List[Tuple[int, str, Dict[str, Any]]] = []
+    for index, (_, name, arguments) in enumerate(calls):
+        custom_print("info", f"chat_id={chat_id} triggered tool {name}")
+        if name not in allowed_names:
+            results[index] = f"Tool '{name}' is not available in this chat."
+            continue
+        try:
+            parsed_arguments = json.loads(arguments) if arguments else {}
+        except json.JSONDecodeError as e:
+            results[index] = f"Invalid tool arguments: {e}"
+            continue
+        pending.append((index, name, parsed_arguments))
+
+    if pending:
+        try:
+            outcomes = shared_pool().call_tools(
+                [(name, arguments) for _, name, arguments in pending],
+                client_id=f"telegram-{chat_id}",
+                timeout=_config_defaults()["mcp_tool_timeout"],
+            )
+        except Exception as e:
+            outcomes = [e] * len(pending)
+        for (index, name, _), outcome in zip(pending, outcomes):
+            if isinstance(outcome, Exception):
+                custom_print("warn", f"chat_id={chat_id} tool {name} failed: {outcome}")
+                outcome = f"Error calling tool: {outcome}"
+            results[index] = "" if outcome is None else str(outcome)
+    return results
+
+
+def _tool_round_limit_error(max_rounds: int) -> _TelegramModelRequestError:
+    return _TelegramModelRequestError(
+        f"Model was still calling tools after {max_rounds} tool rounds.",
+        f"The model was still calling tools after {max_rounds} rounds, so the request was stopped.",
+    )
 
 
 def _debug_conversation_snapshot(session: Dict[str, Any], chat_id: int, stage: str) -> None:
@@ -852,10 +1014,13 @@ def _patch_unichat_tool_normalizer_for_server_tools(client: Any) -> None:
     setattr(api_helper, "_server_tools_passthrough_patch", True)
 
 
-def _execute_model_action(action):
-    """Execute a model request without enforcing local request-level timeouts."""
+def _execute_model_action(model_data: Dict[str, Any], action):
+    """
+    Execute a model request through the provider gateway, which throttles bursts per API key and retries
+    rate limits and transient errors, without enforcing local request-level timeouts.
+    """
     try:
-        return action()
+        return call(model_data, action)
     except Exception as e:
         custom_print("error", f"Model request failed: {e}")
         raise _TelegramModelRequestError(str(e)) from e
@@ -929,7 +1094,7 @@ def _request_model_reply(
     if use_responses:
         client_key = ("responses", api_key or "", base_url or "", model_name or "")
         if session.get("_runtime_client_key") != client_key or session.get("_runtime_client") is None:
-            session["_runtime_client"] = openai.OpenAI(**client_params)
+            session["_runtime_client"] = openai.OpenAI(**client_params, http_client=http_client(model_data))
             session["_runtime_client_key"] = client_key
         client = session["_runtime_client"]
         params = {
@@ -942,6 +1107,9 @@ def _request_model_reply(
         if _is_web_search_enabled(session):
             params["tools"] = [{"type": OPENAI_WEB_SEARCH_TOOL_TYPE}]
             params["parallel_tool_calls"] = False
+        mcp_tools = _mcp_tools_for_chat(session, chat_id)
+        if mcp_tools:
+            params.setdefault("tools", []).extend(openai_response_tools(mcp_tools))
 
         model_lower = str(model_name or "").lower()
         responses_reasoning_effort: Optional[str] = None
@@ -973,19 +1141,37 @@ def _request_model_reply(
                 f"[TG DEBUG] stage=request_dispatch chat_id={chat_id} api=responses model={model_name} input_len={input_len}",
             )
 
-        response = _execute_model_action(lambda: client.responses.create(**params))
-        if isinstance(response, dict) and "error" in response:
-            raise _TelegramModelRequestError(str(response["error"]))
-
-        assistant_text, parsed = _extract_responses_text(response)
-        if parsed:
-            conversation.extend(parsed)
-        return assistant_text or "(No text content returned by model.)"
+        max_rounds = _config_defaults()["mcp_max_tool_rounds"]
+        texts: List[str] = []
+        for tool_round in range(max_rounds + 1):
+            response = _execute_model_action(model_data, lambda: client.responses.create(**params))
+            if isinstance(response, dict) and "error" in response:
+                raise _TelegramModelRequestError(str(response["error"]))
+
+            assistant_text, parsed, tool_calls = _extract_responses_text(response, bool(mcp_tools))
+            if parsed:
+                conversation.extend(parsed)
+            if assistant_text:
+                texts.append(assistant_text)
+            if not tool_calls:
+                return "\n\n".join(texts) or "(No text content returned by model.)"
+            if tool_round == max_rounds:
+                raise _tool_round_limit_error(max_rounds)
+            results = _run_mcp_tool_calls(chat_id, tool_calls, mcp_tools)
+            conversation.extend(
+                {"type": "function_call_output", "call_id": call_id, "output": result}
+                for (call_id, _, _), result in zip(tool_calls, results)
+            )
+            params["input"] = conversation[1:] if conversation[0]["role"] == "system" else conversation
 
     client_type = "openai_chat" if ollama_model else "unified_chat"
     client_key = (client_type, api_key or "", base_url or "", model_name or "")
     if session.get("_runtime_client_key") != client_key or session.get("_runtime_client") is None:
-        session["_runtime_client"] = openai.OpenAI(**client_params) if ollama_model else UnifiedChatApi(**client_params)
+        session["_runtime_client"] = (
+            openai.OpenAI(**client_params, http_client=http_client(model_data))
+            if ollama_model
+            else UnifiedChatApi(**client_params)
+        )
         session["_runtime_client_key"] = client_key
     client = session["_runtime_client"]
     if model_title.startswith("anthropic") and not ollama_model:
@@ -1024,6 +1210,9 @@ def _request_model_reply(
 
         if anthropic_tools:
             params["tools"] = anthropic_tools
+    mcp_tools = _mcp_tools_for_chat(session, chat_id)
+    if mcp_tools:
+        params["tools"] = params.get("tools", []) + (openai_completion_tools(mcp_tools) if ollama_model else mcp_tools)
     if model_title.startswith("anthropic") and cache_enabled and cached is not False and cached not in (None, ""):
         params["cached"] = cached
 
@@ -1052,59 +1241,162 @@ def _request_model_reply(
             ),
         )
 
-    response = _execute_model_action(lambda: client.chat.completions.create(**params))
-    if isinstance(response, dict) and "error" in response:
-        raise _TelegramModelRequestError(str(response["error"]))
+    max_rounds = _config_defaults()["mcp_max_tool_rounds"]
+    texts: List[str] = []
+    for tool_round in range(max_rounds + 1):
+        # The conversation is the messages list, tool results appended to it are sent with the next round
+        response = _execute_model_action(model_data, lambda: client.chat.completions.create(**params))
+        if isinstance(response, dict) and "error" in response:
+            raise _TelegramModelRequestError(str(response["error"]))
+
+        assistant_text, assistant_msg, tool_calls = _extract_completion_text(response, bool(mcp_tools))
+        conversation.append(assistant_msg)
+        if assistant_text:
+            texts.append(assistant_text)
+        if not tool_calls:
+            return "\n\n".join(texts) or "(No text content returned by model.)"
+        if tool_round == max_rounds:
+            raise _tool_round_limit_error(max_rounds)
+        results = _run_mcp_tool_calls(chat_id, tool_calls, mcp_tools)
+        conversation.extend(
+            {"role": "tool", "content": result, "tool_call_id": call_id}
+            for (call_id, _, _), result in zip(tool_calls, results)
+        )
+
+
+def _portable_text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    parts = []
+    for part in content if isinstance(content, list) else []:
+        if isinstance(part, dict) and part.get("type") in ("text", "input_text", "output_text"):
+            parts.append(part.get("text", ""))
+        elif isinstance(part, dict) and part.get("type") in ("image", "image_url", "input_image"):
+            parts.append("[image omitted]")
+    return "\n".join(parts)
+
+
+def _fallback_session(session: Dict[str, Any], fallback_title: str) -> Dict[str, Any]:
+    """
+    Copy of the session for the fallback model. Provider specific items (tool calls, reasoning items, image
+    payloads) cannot be replayed to another provider, so the conversation is reduced to its text messages.
+    MCP tools are not offered: the losing request cannot be cancelled, and a tool with side effects must not run
+    once in each request.
+    """
+    fallback = dict(session, _mcp_tools_disabled=True)
+    fallback["model"] = dict(fetch_variable("models", fallback_title), model_title=fallback_title)
+    fallback.pop("reasoning_effort_override", None)
+    fallback["conversation"] = [
+        {"role": item["role"], "content": _portable_text(item.get("content"))}
+        for item in session["conversation"]
+        if isinstance(item, dict) and item.get("role") in ("system", "user", "assistant")
+    ]
+    # The fallback keeps its own cached client between requests
+    fallback["_runtime_client"], fallback["_runtime_client_key"] = session.get("_fallback_runtime", (None, None))
+    return fallback
+
+
+def _request_reply_with_failover(session: Dict[str, Any], debug_context: bool = False, chat_id: int = 0) -> str:
+    """
+    Request the reply, hedged with the model's fallback_model when one is configured.
+    Both requests run on copies of the session; only the winner's conversation is kept.
+    """
+    model_data = session["model"]
+    primary_title = model_data.get("model_title", "")
+    fallback_title = model_data.get("fallback_model")
+    if not fallback_title or fallback_title == primary_title:
+        return _request_model_reply(session, debug_context=debug_context, chat_id=chat_id)
+    if fallback_title not in fetch_variable("models"):
+        custom_print("warn", f"fallback_model '{fallback_title}' of {primary_title} is not configured, ignoring it")
+        return _request_model_reply(session, debug_context=debug_context, chat_id=chat_id)
+
+    primary_session = dict(session, conversation=list(session["conversation"]))
+    fallback_session = _fallback_session(session, fallback_title)
+    winner, reply = hedged_call(
+        primary_title,
+        lambda: _request_model_reply(primary_session, debug_context=debug_context, chat_id=chat_id),
+        fallback_title,
+        lambda: _request_model_reply(fallback_session, debug_context=debug_context, chat_id=chat_id),
+        percentile=model_data.get("hedge_percentile", DEFAULT_PERCENTILE),
+    )
+    if winner == primary_title:
+        session.update(primary_session)
+    else:
+        session["_fallback_runtime"] = (fallback_session["_runtime_client"], fallback_session["_runtime_client_key"])
+        session["conversation"].append({"role": "assistant", "content": reply})
+        custom_print("info", f"chat_id={chat_id} was answered by the fallback model {fallback_title}")
+    return reply
+
+
+def _text_part(text: str, model_title: str, use_responses: bool) -> Dict[str, Any]:
+    if use_responses and not model_title.startswith("anthropic"):
+        return {"type": "input_text", "text": text}
+    return {"type": "text", "text": text}
+
+
+def _image_part(encoded_image: str, model_title: str, use_responses: bool) -> Dict[str, Any]:
+    if model_title.startswith("anthropic"):
+        return {"type": "image", "source": {"type": "base64", "media_type": "image/jpeg", "data": encoded_image}}
+    if use_responses:
+        return {"type": "input_image", "image_url": f"data:image/jpeg;base64,{encoded_image}"}
+    return {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{encoded_image}"}}
 
-    assistant_text, assistant_msg = _extract_completion_text(response)
-    conversation.append(assistant_msg)
-    return assistant_text or "(No text content returned by model.)"
+
+def _build_media_group_content(
+    token: str, messages: List[Dict[str, Any]], model_title: str, use_responses: bool
+) -> List[Dict[str, Any]]:
+    """
+    One multi-part user message from the messages of an album
+    :param token: bot token
+    :param messages: album messages in the order they were sent
+    :param model_title: title of the chat's model
+    :param use_responses: whether the model uses the Responses API
+    :return: content parts with every image and document of the album, the captions as text
+    """
+
+    def _media_part(message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if message.get("photo"):
+            return _image_part(_encoded_photo(token, message["photo"], model_title), model_title, use_responses)
+        if message.get("document"):
+            doc = message["document"]
+            name = doc.get("file_name") or "a file"
+            return _text_part(
+                f"This is the content of {name}:\n{_document_text(token, doc)}", model_title, use_responses
+            )
+        return None
+
+    # Album items are downloaded and processed in parallel, _media_executor is separate from the update workers
+    media_parts = [part for part in _media_executor.map(_media_part, messages) if part is not None]
+    captions = "\n".join(
+        caption for caption in ((message.get("caption") or "").strip() for message in messages) if caption
+    )
+    if not captions:
+        return media_parts
+    caption_part = _text_part(captions, model_title, use_responses)
+    if model_title.startswith("anthropic"):
+        return media_parts + [caption_part]
+    return [caption_part] + media_parts
 
 
 def _build_user_content_from_message(
     token: str, message: Dict[str, Any], model_title: str, use_responses: bool
 ) -> Optional[Any]:
+    if message.get("media_group"):
+        return _build_media_group_content(token, message["media_group"], model_title, use_responses) or None
+
     text = (message.get("text") or "").strip()
     caption = (message.get("caption") or "").strip()
 
     if message.get("photo"):
-        largest_photo = message["photo"][-1]
-        image_bytes = _telegram_get_file_bytes(token, largest_photo["file_id"])
-        encoded_image = base64.b64encode(image_bytes).decode("utf-8")
-
+        image = _image_part(_encoded_photo(token, message["photo"], model_title), model_title, use_responses)
+        if not caption:
+            return [image]
         if model_title.startswith("anthropic"):
-            content: List[Dict[str, Any]] = [
-                {
-                    "type": "image",
-                    "source": {"type": "base64", "media_type": "image/jpeg", "data": encoded_image},
-                }
-            ]
-            if caption:
-                content.append({"type": "text", "text": caption})
-            return content
-
-        content = []
-        if use_responses:
-            if caption:
-                content.append({"type": "input_text", "text": caption})
-            content.append({"type": "input_image", "image_url": f"data:image/jpeg;base64,{encoded_image}"})
-        else:
-            if caption:
-                content.append({"type": "text", "text": caption})
-            content.append({"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{encoded_image}"}})
-        return content
+            return [image, _text_part(caption, model_title, use_responses)]
+        return [_text_part(caption, model_title, use_responses), image]
 
     if message.get("document"):
-        doc = message["document"]
-        file_name = doc.get("file_name") or ""
-        file_bytes = _telegram_get_file_bytes(token, doc["file_id"])
-        extracted = _extract_document_content(file_name, file_bytes)
-        if extracted is None:
-            raise _UnsupportedTelegramInputError(
-                f"Unsupported document type: {file_name}. Please send .txt or .pdf files only."
-                if file_name
-                else "Unsupported document type. Please send .txt or .pdf files only."
-            )
+        extracted = _document_text(token, message["document"])
 
         prefix = "This is the content of a file:\n"
         if caption:
@@ -1302,7 +1594,9 @@ def _handle_command(
             init_stage="session_init",
             sessions_lock=sessions_lock,
         )
-        session["role_key"] = fetch_variable("defaults", "system_role")
+        session["role_key"] = _config_defaults()["system_role"]
+        # Rebuilt from disk so edited role files are picked up
+        session.pop("_template", None)
         _reset_session_conversation(session)
         if debug_context:
             _debug_session_settings_snapshot(session, chat_id, "new")
@@ -1493,6 +1787,201 @@ def _handle_command(
     return False, False
 
 
+def _merge_updates(updates: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """One update standing for buffered updates: an album keeps its messages in "media_group", texts are joined."""
+    if len(updates) == 1:
+        return updates[0]
+    messages = sorted((update["message"] for update in updates), key=lambda message: message.get("message_id", 0))
+    merged = dict(messages[0])
+    if merged.get("media_group_id"):
+        merged["media_group"] = messages
+    else:
+        merged["text"] = "\n".join(message["text"] for message in messages)
+    return {**updates[-1], "message": merged}
+
+
+class _UpdateAggregator:
+    """
+    Holds back the updates of an album, and optionally text messages sent in quick succession, until no
+    further part arrived for the wait time, then submits them as one merged update. Any other update of the
+    chat flushes its pending parts first, so the order of a chat is kept.
+    """
+
+    def __init__(self, submit: Callable[[int, Dict[str, Any]], None], media_group_wait: float, text_wait: float):
+        self.submit = submit
+        self.media_group_wait = media_group_wait
+        self.text_wait = text_wait
+        self.condition = threading.Condition()
+        self.pending: Dict[int, Dict[str, Any]] = {}
+        self.closed = False
+        self.flusher = threading.Thread(target=self._flush_expired, name="tg-aggregator", daemon=True)
+        self.flusher.start()
+
+    def _merge_key(self, update: Dict[str, Any]) -> Optional[Tuple[str, Any]]:
+        message = update.get("message")  # Edits always apply on their own
+        if not message:
+            return None
+        if message.get("media_group_id") and self.media_group_wait > 0:
+            return "album", message["media_group_id"]
+        text = (message.get("text") or "").strip()
+        if self.text_wait > 0 and text and not text.startswith("/"):
+            return "text", None
+        return None
+
+    def add(self, chat_id: int, update: Dict[str, Any]) -> None:
+        key = self._merge_key(update)
+        with self.condition:
+            # Submitting under the lock keeps the flusher thread from reordering a chat's updates
+            pending = self.pending.get(chat_id)
+            if pending is not None and (key is None or pending["key"] != key):
+                self.submit(chat_id, _merge_updates(self.pending.pop(chat_id)["updates"]))
+                pending = None
+            if key is None or self.closed:
+                self.submit(chat_id, update)
+                return
+            if pending is None:
+                pending = self.pending[chat_id] = {"key": key, "updates": []}
+            pending["updates"].append(update)
+            wait = self.media_group_wait if key[0] == "album" else self.text_wait
+            pending["deadline"] = time.monotonic() + wait
+            self.condition.notify()
+
+    def _flush_expired(self) -> None:
+        with self.condition:
+            while not self.closed:
+                now = time.monotonic()
+                for chat_id, pending in list(self.pending.items()):
+                    if pending["deadline"] <= now:
+                        del self.pending[chat_id]
+                        try:
+                            self.submit(chat_id, _merge_updates(pending["updates"]))
+                        except Exception as e:
+                            custom_print("warn", f"Telegram update handling warning: {e}. Continuing...")
+                deadlines = [pending["deadline"] for pending in self.pending.values()]
+                self.condition.wait(max(0.0, min(deadlines) - now) if deadlines else None)
+
+    def close(self) -> None:
+        """Submit whatever is still pending and stop the flusher."""
+        with self.condition:
+            self.closed = True
+            pending, self.pending = self.pending, {}
+            for chat_id, entry in pending.items():
+                self.submit(chat_id, _merge_updates(entry["updates"]))
+            self.condition.notify()
+        self.flusher.join()
+
+
+def _start_webhook(token: str, max_pending: int) -> Optional[WebhookServer]:
+    """
+    Start the webhook server and register it with Telegram
+    :param token: bot token
+    :param max_pending: updates queued by the server before Telegram is asked to retry later
+    :return: the running server, None to fall back to long polling
+    """
+    url = (fetch_variable("telegram", "webhook_url", auto_exit=False) or "").strip()
+    secret = (fetch_variable("telegram", "webhook_secret", auto_exit=False) or "").strip()
+    if not url and not secret:
+        custom_print(
+            "warn",
+            "Telegram webhook needs chat.telegram.webhook_url, or a webhook_secret when the webhook is "
+            "registered elsewhere. Falling back to long polling.",
+        )
+        return None
+    if not secret:
+        secret = secrets.token_urlsafe(32)
+    try:
+        server = WebhookServer(
+            listen=fetch_variable("telegram", "webhook_listen", auto_exit=False) or DEFAULT_WEBHOOK_LISTEN,
+            port=_config_int("webhook_port", DEFAULT_WEBHOOK_PORT, 1, 65535),
+            secret=secret,
+            path=(urlparse(url).path or "/") if url else None,
+            max_pending=max_pending,
+            certfile=fetch_variable("telegram", "webhook_cert", auto_exit=False) or None,
+            keyfile=fetch_variable("telegram", "webhook_key", auto_exit=False) or None,
+        )
+    except (OSError, ssl.SSLError, ValueError) as e:
+        custom_print("warn", f"Telegram webhook server could not start: {e}. Falling back to long polling.")
+        return None
+    server.start()
+
+    if url:
+        try:
+            _telegram_api(
+                token,
+                "setWebhook",
+                {
+                    "url": url,
+                    "secret_token": secret,
+                    "allowed_updates": ["message", "edited_message"],
+                },
+            )
+        except RuntimeError as e:
+            server.close()
+            custom_print("warn", f"Telegram webhook registration failed: {e}. Falling back to long polling.")
+            return None
+        custom_print("info", f"Telegram webhook registered at {url}, listening on port {server.port}.")
+    else:
+        custom_print("info", f"Telegram webhook listening on port {server.port}, registration is left to you.")
+    return server
+
+
+def _stop_webhook(token: str, server: WebhookServer, route: Callable[[Dict[str, Any]], None]) -> None:
+    """
+    Stop the webhook server, hand over the updates it already accepted and unregister the webhook
+    :param token: bot token
+    :param server: running webhook server
+    :param route: handler of the accepted updates
+    """
+    server.close()
+    # Telegram got a 200 for these and never delivers them again
+    for update in server.next_updates(timeout=0):
+        try:
+            route(update)
+        except Exception as e:
+            custom_print("warn", f"Telegram update handling warning: {e}. Continuing...")
+    if not (fetch_variable("telegram", "webhook_url", auto_exit=False) or "").strip():
+        return
+    try:
+        # Telegram keeps new updates for getUpdates/the next start instead of failing deliveries
+        _telegram_api(token, "deleteWebhook", {"drop_pending_updates": False})
+    except RuntimeError as e:
+        custom_print("warn", f"Telegram webhook removal warning: {e}. Continuing...")
+
+
+def _wait_seconds(value: Any, default: float) -> float:
+    if value in (None, "") or isinstance(value, bool):
+        return default
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return default
+
+
+def _config_int(key: str, default: int, minimum: int, maximum: Optional[int] = None) -> int:
+    """
+    Read an integer from the Telegram config, falling back to the default on invalid values
+    :param key: key in chat.telegram
+    :param default: value used when the key is unset or invalid
+    :param minimum: smallest accepted value
+    :param maximum: largest accepted value, unbounded if None
+    :return: the configured integer
+    """
+    value = fetch_variable("telegram", key, auto_exit=False)
+    if value in (None, ""):
+        return default
+    try:
+        if isinstance(value, bool):
+            raise ValueError
+        number = int(value)
+    except (TypeError, ValueError):
+        number = None
+    if number is None or number < minimum or (maximum is not None and number > maximum):
+        bounds = f"between {minimum} and {maximum}" if maximum is not None else f"of at least {minimum}"
+        custom_print("warn", f"chat.telegram.{key} must be an integer {bounds}, got {value!r}. Using {default}.")
+        return default
+    return number
+
+
 def run_telegram_bot() -> None:
     enabled = bool(fetch_variable("telegram", "enabled", auto_exit=False))
     if not enabled:
@@ -1535,8 +2024,13 @@ def run_telegram_bot() -> None:
             "Add chat IDs to allowed_chat_ids to allow more chats.",
         )
 
-    if fetch_variable("features", "mcp_client", auto_exit=False):
-        custom_print("warn", "Telegram mode detected. MCP is disabled in Telegram runtime.")
+    if _config_defaults()["mcp_tools"]:
+        custom_print("info", "MCP tools are enabled in Telegram runtime, starting the MCP server in the background.")
+        start_tool_prefetch()
+    elif fetch_variable("features", "mcp_client", auto_exit=False):
+        custom_print(
+            "warn", "Telegram mode detected. MCP tools are disabled in Telegram runtime (chat.telegram.mcp_tools)."
+        )
         _stop_mcp_server_if_running()
     custom_print("info", "Terminal controls: exit/quit/bye = stop bot, reset/restart = clear in-memory sessions.")
     if model_chat_overrides:
@@ -1544,21 +2038,18 @@ def run_telegram_bot() -> None:
             "info",
             f"Telegram model room mappings active for {len(model_chat_overrides)} chat room(s).",
         )
-    custom_print("info", "Starting Telegram bot polling loop...")
+    custom_print("info", "Starting Telegram bot update loop...")
     if telegram_debug_context:
         _debug_startup_default_settings_snapshot()
 
-    max_workers_raw = fetch_variable("telegram", "max_concurrent_updates", auto_exit=False)
-    if max_workers_raw in (None, "") or isinstance(max_workers_raw, bool):
-        max_workers = 8
-    else:
-        try:
-            max_workers = int(max_workers_raw)
-        except (TypeError, ValueError):
-            max_workers = 8
-    if max_workers < 1:
-        max_workers = 8
+    max_workers = _config_int("max_concurrent_updates", 8, 1)
     custom_print("info", f"Telegram concurrent update workers: {max_workers}")
+    media_group_wait = _wait_seconds(
+        fetch_variable("telegram", "media_group_wait", auto_exit=False), DEFAULT_MEDIA_GROUP_WAIT_SECONDS
+    )
+    text_merge_wait = _wait_seconds(fetch_variable("telegram", "text_merge_wait", auto_exit=False), 0.0)
+    webhook_enabled = bool(fetch_variable("telegram", "webhook", auto_exit=False))
+    webhook_max_pending = _config_int("webhook_max_pending", DEFAULT_MAX_PENDING_UPDATES, 1)
 
     # Validate token early and fail fast with a clear message.
     try:
@@ -1576,6 +2067,9 @@ def run_telegram_bot() -> None:
     worker_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tg-update")
     ordered_futures: Dict[int, Future] = {}
     ordered_futures_lock = threading.Lock()
+    # Updates handed to the workers and not finished yet, throttles the webhook intake
+    backlog = threading.Condition()
+    backlog_state = {"in_flight": 0}
     offset = 0
     process_start_ts = int(time.time())
 
@@ -1642,7 +2136,8 @@ def run_telegram_bot() -> None:
     def _process_update(update: Dict[str, Any]) -> None:
         chat_id = 0
         try:
-            if shutdown_requested.is_set():
+            # Webhook updates were acknowledged to Telegram on receipt, they are handled even during shutdown
+            if shutdown_requested.is_set() and webhook is None:
                 return
 
             message = update.get("message") or update.get("edited_message")
@@ -1718,7 +2213,7 @@ def run_telegram_bot() -> None:
             except Exception as e:
                 custom_print("warn", f"Telegram typing indicator warning: {e}. Continuing...")
             try:
-                reply = _request_model_reply(
+                reply = _request_reply_with_failover(
                     session,
                     debug_context=telegram_debug_context,
                     chat_id=chat_id,
@@ -1748,17 +2243,62 @@ def run_telegram_bot() -> None:
             prev_future = ordered_futures.get(chat_id)
 
             def _run_after_previous(prev: Optional[Future], pending_update: Dict[str, Any]) -> None:
-                if prev is not None:
-                    try:
-                        prev.result()
-                    except Exception:
-                        # Continue processing later updates in the same chat even if a previous one failed.
-                        pass
-                _process_update(pending_update)
-
+                try:
+                    if prev is not None:
+                        try:
+                            prev.result()
+                        except Exception:
+                            # Continue processing later updates in the same chat even if a previous one failed.
+                            pass
+                    _process_update(pending_update)
+                finally:
+                    with backlog:
+                        backlog_state["in_flight"] -= 1
+                        backlog.notify_all()
+
+            with backlog:
+                backlog_state["in_flight"] += 1
             next_future = worker_executor.submit(_run_after_previous, prev_future, update)
             ordered_futures[chat_id] = next_future
 
+    aggregator = _UpdateAggregator(_submit_update, media_group_wait, text_merge_wait)
+
+    def _route_update(update: Dict[str, Any], acknowledged: bool = False) -> None:
+        message = update.get("message") or update.get("edited_message")
+        if not message:
+            return
+
+        chat = message.get("chat") or {}
+        chat_id = int(chat.get("id", 0))
+        if not chat_id:
+            return
+        if not allowed_chat_ids:
+            pairing_text = (message.get("text") or "").strip()
+            pairing_command = pairing_text.split(maxsplit=1)[0].lower() if pairing_text else ""
+            if pairing_command == "/pair" or pairing_command.startswith("/pair@"):
+                _handle_pairing_attempt(chat_id, pairing_text)
+            elif chat_id not in pairing_state["hinted_chats"]:
+                pairing_state["hinted_chats"].add(chat_id)
+                try:
+                    _send_message(
+                        token,
+                        chat_id,
+                        "This bot is not paired yet. Send: /pair <code> — the code is printed "
+                        "in the bot's terminal.",
+                    )
+                except Exception as e:
+                    custom_print("warn", f"Pairing hint message warning: {e}. Continuing...")
+            return
+        if not _is_allowed_chat(chat_id, allowed_chat_ids):
+            return
+
+        if shutdown_requested.is_set() and not acknowledged:
+            return
+
+        aggregator.add(chat_id, update)
+
+    webhook = _start_webhook(token, webhook_max_pending) if webhook_enabled else None
+
     if not allowed_chat_ids:
         _issue_pairing_code()
 
@@ -1785,6 +2325,20 @@ def run_telegram_bot() -> None:
                 custom_print("info", "Reset command received. In-memory Telegram sessions were cleared.")
                 continue
 
+            if webhook is not None:
+                with backlog:
+                    # Backpressure: while the workers are saturated, the webhook queue fills up and
+                    # Telegram is answered with 503 until it redelivers.
+                    if backlog_state["in_flight"] >= webhook_max_pending:
+                        backlog.wait(1)
+                        continue
+                for update in webhook.next_updates(timeout=1):
+                    try:
+                        _route_update(update, acknowledged=True)
+                    except Exception as e:
+                        custom_print("warn", f"Telegram update handling warning: {e}. Continuing...")
+                continue
+
             try:
                 updates = _telegram_api(
                     token,
@@ -1805,41 +2359,12 @@ def run_telegram_bot() -> None:
             for update in updates:
                 try:
                     offset = max(offset, int(update["update_id"]) + 1)
-                    message = update.get("message") or update.get("edited_message")
-                    if not message:
-                        continue
-
-                    chat = message.get("chat") or {}
-                    chat_id = int(chat.get("id", 0))
-                    if not chat_id:
-                        continue
-                    if not allowed_chat_ids:
-                        pairing_text = (message.get("text") or "").strip()
-                        pairing_command = pairing_text.split(maxsplit=1)[0].lower() if pairing_text else ""
-                        if pairing_command == "/pair" or pairing_command.startswith("/pair@"):
-                            _handle_pairing_attempt(chat_id, pairing_text)
-                        elif chat_id not in pairing_state["hinted_chats"]:
-                            pairing_state["hinted_chats"].add(chat_id)
-                            try:
-                                _send_message(
-                                    token,
-                                    chat_id,
-                                    "This bot is not paired yet. Send: /pair <code> — the code is printed "
-                                    "in the bot's terminal.",
-                                )
-                            except Exception as e:
-                                custom_print("warn", f"Pairing hint message warning: {e}. Continuing...")
-                        continue
-                    if not _is_allowed_chat(chat_id, allowed_chat_ids):
-                        continue
-
-                    if shutdown_requested.is_set():
-                        break
-
-                    _submit_update(chat_id, update)
+                    _route_update(update)
                 except Exception as e:
                     custom_print("warn", f"Telegram update handling warning: {e}. Continuing...")
                     continue
+                if shutdown_requested.is_set():
+                    break
 
             if shutdown_requested.is_set():
                 # Confirm processed updates (including /shutdown) without flushing newer pending messages.
@@ -1858,7 +2383,11 @@ def run_telegram_bot() -> None:
     except Exception as e:
         custom_print("error", f"Unexpected fatal Telegram runtime error: {e}")
     finally:
+        if webhook is not None:
+            _stop_webhook(token, webhook, lambda update: _route_update(update, acknowledged=True))
+        aggregator.close()
         worker_executor.shutdown(wait=True)
         _unload_ollama_models_in_sessions(sessions)
+        shared_pool().close()
         _stop_mcp_server_if_running()
         custom_print("exit", "Telegram bot stopped.", 130)
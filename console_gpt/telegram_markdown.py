@@ -0,0 +1,469 @@
+import html
+import re
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+"""
+Markdown-like model output to the HTML subset Telegram's sendMessage accepts.
+
+The text is converted in one pass: fenced code blocks are cut out and escaped, the text between them is escaped
+as a whole and only lines that contain formatting characters go through the inline tokenizer. The tokenizer
+pairs the formatting delimiters on a stack, so nested formatting such as bold text with an italic word or a
+link inside a bold span closes in the right order, and delimiters left open stay text. A span that is still
+open when an enclosing one closes is closed with it and reopened after it, and a run of three asterisks is a
+bold and an italic delimiter. Inline formatting never
+spans lines, which keeps the HTML of every line self-contained.
+
+Long replies are split into chunks by the length of the converted text. Chunks end on line boundaries where
+possible, code blocks are closed at the end of a chunk and reopened in the next one, and overlong lines are
+only cut between tags and entities, with the open tags closed and reopened around the cut.
+"""
+
+_HEADING = re.compile(r" {0,3}#{1,6}[ \t]+(.+?)[ \t]*")
+# Lines with a heading or inline formatting, all others only need escaping
+_FORMATTED_LINE = re.compile(r"^.*[#*_~`\[].*$", re.M)
+_INLINE_TOKEN = re.compile(r"`[^`\n]+`|\[([^\]\n]+)\]\((https?://[^\s)]+)\)|\*\*\*|___|\*\*|__|~~|\*|_")
+# Name between the underscores of a Python dunder such as __init__
+_DUNDER_NAME = re.compile(r"[^\W_](?:\w*[^\W_])?")
+_HTML_TAG = re.compile(r"<[^>]*>")
+_HTML_UNIT = re.compile(r"<[^>]*>|&[^;]*;|[^<&]+")
+_DELIMITER_TAGS = {"**": "b", "__": "b", "*": "i", "_": "i", "~~": "s"}
+# Deeper nesting is left as literal text, it only occurs in malformed input
+_MAX_NESTING = 8
+
+
+class HtmlBlock(NamedTuple):
+    """Converted text, or a fenced code block with its escaped lines."""
+
+    html: str
+    code_lines: Optional[List[str]] = None
+    language: str = ""
+
+
+def _escape(text: str) -> str:
+    return html.escape(text, quote=False)
+
+
+def _inline_escaped(text: str) -> str:
+    """
+    Convert the inline formatting of an escaped line. Escaping leaves the delimiters and the character classes
+    of their neighbours unchanged, so text is escaped once up front instead of piece by piece.
+    """
+    parts: List[str] = []
+    # Open spans: delimiter, index of the opening tag in parts, end of the opening delimiter in text, and the
+    # earlier segments of a span cut by an enclosing span that closed first (opening index, closing index, empty)
+    stack: List[Tuple[str, int, int, List[Tuple[int, int, bool]]]] = []
+    depths: Dict[str, int] = {}
+
+    def close(depth: int, start: int, end: int) -> None:
+        token, index, opened_end, segments = stack[depth]
+        inner = stack[depth + 1 :]
+        for entry in stack[depth:]:
+            del depths[entry[0]]
+        del stack[depth:]
+        # Spans still open inside this one are closed with it and continue after it, which only turns into
+        # formatting if they close later on
+        closing = {}
+        for entry in reversed(inner):
+            closing[entry[0]] = len(parts)
+            parts.append("")
+        tag = _DELIMITER_TAGS[token]
+        for opening, closing_index, empty in segments:
+            parts[opening], parts[closing_index] = ("", "") if empty else (f"<{tag}>", f"</{tag}>")
+        if start > opened_end:
+            parts[index] = f"<{tag}>"
+            parts.append(f"</{tag}>")
+        for inner_token, inner_index, inner_end, inner_segments in inner:
+            segment = (inner_index, closing[inner_token], start == inner_end)
+            depths[inner_token] = len(stack)
+            stack.append((inner_token, len(parts), end, inner_segments + [segment]))
+            parts.append("")
+
+    pos = 0
+    for match in _INLINE_TOKEN.finditer(text):
+        start, end = match.span()
+        parts.append(text[pos:start])
+        pos = end
+        token = match.group(0)
+        first = token[0]
+
+        if first == "`":
+            parts.append(f"<code>{token[1:-1]}</code>")
+            continue
+        if first == "[":
+            href = match.group(2).replace('"', "&quot;")
+            parts.append(f'<a href="{href}">{_inline_escaped(match.group(1))}</a>')
+            continue
+
+        if len(token) == 3:
+            # A run of three is a bold and an italic delimiter: opened bold first, closed innermost first
+            double = token[:2]
+            if first in depths and (double not in depths or depths[first] > depths[double]):
+                delimiters: Tuple[Tuple[str, int, int], ...] = ((first, start, start + 1), (double, start + 1, end))
+            else:
+                delimiters = ((double, start, start + 2), (first, start + 2, end))
+        else:
+            delimiters = ((token, start, end),)
+
+        for token, start, end in delimiters:
+            depth = depths.get(token)
+            if depth is not None:
+                # Closers follow text, spans without text are not formatting since Telegram rejects empty entities,
+                # and underscores inside words (snake_case) never are
+                _, index, opened_end, segments = stack[depth]
+                if (
+                    (
+                        segments
+                        or start > opened_end
+                        and (text[start - 1] not in "*_~" or text[opened_end:start].strip("*_~"))
+                    )
+                    and not text[start - 1].isspace()
+                    and not (first == "_" and end < len(text) and text[end].isalnum())
+                ):
+                    if token != "__" or segments or not _DUNDER_NAME.fullmatch(text, opened_end, start):
+                        if segments or depth < len(stack) - 1:
+                            close(depth, start, end)
+                        else:
+                            # The innermost span closing without crossing another one
+                            del depths[token]
+                            stack.pop()
+                            tag = _DELIMITER_TAGS[token]
+                            parts[index] = f"<{tag}>"
+                            parts.append(f"</{tag}>")
+                        continue
+                    # Python dunder names such as __init__ are text
+                    if depth == len(stack) - 1:
+                        del depths[token]
+                        stack.pop()
+            elif (
+                len(stack) < _MAX_NESTING
+                and end < len(text)
+                and not text[end].isspace()
+                and not (first == "_" and start > 0 and text[start - 1].isalnum())
+            ):
+                depths[token] = len(stack)
+                stack.append((token, len(parts), end, []))
+            parts.append(token)
+    parts.append(text[pos:])
+    return "".join(parts)
+
+
+def inline_to_html(text: str) -> str:
+    """Convert the inline formatting of a single line."""
+    return _inline_escaped(_escape(text))
+
+
+def _formatted_line(match: re.Match) -> str:
+    line = match.group(0)
+    heading = _HEADING.fullmatch(line) if "#" in line else None
+    if heading is not None:
+        return f"<b>{_inline_escaped(heading.group(1))}</b>"
+    return _inline_escaped(line)
+
+
+def _fences(text: str) -> Iterator[Tuple[int, int, int, int, str]]:
+    """
+    Find the fenced code blocks with plain string searches
+    :param text: markdown-like text
+    :return: start, body start, body end, end and language of every block, an unterminated one runs to the end
+    """
+    search = 0
+    while True:
+        start = text.find("```", search)
+        if start < 0:
+            return
+        line_start = text.rfind("\n", 0, start) + 1
+        line_end = text.find("\n", start)
+        if line_end < 0:
+            line_end = len(text)
+        info = text[start + 3 : line_end]
+        # Fences open a line, backticks elsewhere are inline code
+        if start - line_start > 3 or text[line_start:start].strip(" ") or "`" in info:
+            search = start + 3
+            continue
+
+        body_start = min(line_end + 1, len(text))
+        body_end = end = len(text)
+        close = text.find("```", body_start)
+        while close >= 0:
+            close_start = text.rfind("\n", 0, close) + 1
+            close_end = text.find("\n", close)
+            if close_end < 0:
+                close_end = len(text)
+            if not text[close_start:close_end].strip().strip("`"):
+                body_end, end = max(body_start, close_start - 1), close_end
+                break
+            close = text.find("```", close_end)
+        yield line_start, body_start, body_end, end, (info.split() or [""])[0]
+        search = end
+
+
+def html_blocks(text: str) -> Iterator[HtmlBlock]:
+    """
+    Convert text block by block
+    :param text: markdown-like text
+    :return: the text between fenced code blocks and the code blocks in order, joined by newlines they form
+        the HTML
+    """
+    pos = 0
+    for start, body_start, body_end, end, language in _fences(text):
+        segment = text[pos:start]
+        # The newlines around a fence become the separators between the blocks
+        if pos and segment.startswith("\n"):
+            segment = segment[1:]
+        if segment:
+            yield HtmlBlock(_FORMATTED_LINE.sub(_formatted_line, _escape(segment.removesuffix("\n"))))
+        code_lines = _escape(text[body_start:body_end]).split("\n")
+        yield HtmlBlock(code_block_html(code_lines, language), code_lines, language)
+        pos = end
+    segment = text[pos + 1 :] if pos else text
+    if segment:
+        yield HtmlBlock(_FORMATTED_LINE.sub(_formatted_line, _escape(segment)))
+
+
+def code_block_html(code_lines: List[str], language: str = "") -> str:
+    attribute = f' class="language-{html.escape(language)}"' if language else ""
+    return f"<pre><code{attribute}>" + "\n".join(code_lines) + "</code></pre>"
+
+
+def markdown_to_html(text: str) -> str:
+    """Convert a subset of markdown-like model output to Telegram-safe HTML."""
+    if not text:
+        return ""
+    return "\n".join(block.html for block in html_blocks(text))
+
+
+def html_to_text(text: str) -> str:
+    """Visible text of converted HTML, for sending a chunk as plain text."""
+    return html.unescape(_HTML_TAG.sub("", text))
+
+
+def utf16_len(text: str) -> int:
+    """Length as Telegram counts it, in UTF-16 code units."""
+    return len(text) if text.isascii() else len(text.encode("utf-16-le")) // 2
+
+
+def _cut(text: str, room: int) -> int:
+    """
+    Length of the longest prefix within room, ending after a newline or space when one is near the end.
+    0 only when the first code point alone does not fit.
+    """
+    end = min(room, len(text))
+    excess = utf16_len(text[:end]) - room
+    while excess > 0:
+        # A code point is one or two UTF-16 units, backing off half the excess never overshoots by more than one
+        end -= (excess + 1) // 2
+        excess = utf16_len(text[:end]) - room
+    if excess < 0 and end < len(text) and utf16_len(text[end]) <= -excess:
+        end += 1
+    for separator in ("\n", " "):
+        split = text.rfind(separator, end // 2, end)
+        if split >= 0:
+            return split + 1
+    return end
+
+
+def _split_html_line(line: str, limit: int) -> List[str]:
+    """
+    Split a line of converted HTML that is longer than limit
+    :param line: converted line
+    :param limit: maximum length of a piece
+    :return: pieces with balanced tags, cut only between tags and entities or inside text
+    """
+    pieces: List[str] = []
+    parts: List[str] = []
+    # Open tags: opening tag, closing tag, index of the opening tag in parts
+    stack: List[List[Any]] = []
+    size = closing = 0
+
+    def flush() -> None:
+        nonlocal size
+        # Tags opened right before the cut would be empty entities, they only open in the next piece
+        kept = len(stack)
+        while kept and stack[kept - 1][2] == len(parts) - 1:
+            parts.pop()
+            kept -= 1
+        if parts:
+            pieces.append("".join(parts) + "".join(entry[1] for entry in reversed(stack[:kept])))
+        parts.clear()
+        size = 0
+        for entry in stack:
+            entry[2] = len(parts)
+            parts.append(entry[0])
+            size += utf16_len(entry[0])
+
+    for unit in _HTML_UNIT.findall(line):
+        if unit.startswith("</"):
+            opening, _, index = stack.pop()
+            closing -= len(unit)
+            if index == len(parts) - 1:
+                # Reopened after the cut without any content left
+                parts.pop()
+                size -= utf16_len(opening)
+            else:
+                parts.append(unit)
+                size += len(unit)
+            continue
+        if unit[0] == "<":
+            close = f"</{unit[1:].split(None, 1)[0].rstrip('>')}>"
+            if parts and size + utf16_len(unit) + len(close) + closing > limit:
+                flush()
+            stack.append([unit, close, len(parts)])
+            closing += len(close)
+            parts.append(unit)
+            size += utf16_len(unit)
+            continue
+        if unit[0] == "&":
+            if size + len(unit) + closing > limit:
+                flush()
+            parts.append(unit)
+            size += len(unit)
+            continue
+        while unit:
+            room = limit - size - closing
+            if utf16_len(unit) <= room:
+                parts.append(unit)
+                size += utf16_len(unit)
+                break
+            # Always make progress, even if the reopened tags alone fill the piece
+            end = _cut(unit, room) if room > 0 else 0
+            if end == 0 and size <= sum(utf16_len(entry[0]) for entry in stack):
+                end = 1
+            if end:
+                parts.append(unit[:end])
+                unit = unit[end:]
+            flush()
+    if parts:
+        pieces.append("".join(parts))
+    return pieces
+
+
+def html_chunks(text: str, limit: int) -> List[str]:
+    """
+    Convert text and split the HTML into messages
+    :param text: markdown-like text
+    :param limit: maximum length of a chunk in UTF-16 code units of the HTML, which bounds the visible text
+    :return: chunks that are valid HTML on their own
+    """
+    chunks: List[str] = []
+    lines: List[str] = []
+    size = 0
+
+    def room() -> int:
+        return limit - size - (1 if lines else 0)
+
+    def add(piece: str, length: int) -> None:
+        nonlocal size
+        if length > room():
+            flush()
+        if not lines and not piece.strip():
+            # Telegram rejects empty messages, blank lines at a chunk boundary are dropped
+            return
+        size += length + (1 if lines else 0)
+        lines.append(piece)
+
+    def flush() -> None:
+        nonlocal size
+        while lines and not lines[-1].strip():
+            lines.pop()
+        if lines:
+            chunks.append("\n".join(lines))
+        lines.clear()
+        size = 0
+
+    for block in html_blocks(text):
+        if block.code_lines is None:
+            for line in block.html.split("\n"):
+                length = utf16_len(line)
+                if length <= limit:
+                    add(line, length)
+                else:
+                    for piece in _split_html_line(line, limit):
+                        add(piece, utf16_len(piece))
+            continue
+
+        opening = code_block_html([], block.language)[: -len("</code></pre>")]
+        if utf16_len(opening) > limit // 4:
+            # The language is dropped rather than leave almost no room for the code
+            opening = code_block_html([])[: -len("</code></pre>")]
+        overhead = utf16_len(opening) + len("</code></pre>")
+        code: List[str] = []
+        code_size = overhead
+        for code_line in block.code_lines:
+            length = utf16_len(code_line)
+            parts = [code_line] if length + overhead <= limit else _split_html_line(code_line, limit - overhead)
+            for part in parts:
+                length = utf16_len(part) + (1 if code else 0)
+                if code_size + length > room():
+                    # The block continues in the next chunk
+                    if code:
+                        add(opening + "\n".join(code) + "</code></pre>", code_size)
+                        code = []
+                        code_size = overhead
+                        length = utf16_len(part)
+                    flush()
+                code.append(part)
+                code_size += length
+        add(opening + "\n".join(code) + "</code></pre>", code_size)
+    flush()
+    return chunks
+
+
+def markdown_chunks(text: str, limit: int) -> List[str]:
+    """
+    Split markdown on line boundaries, closing a fenced code block at the end of a chunk and reopening it in the
+    next one
+    :param text: markdown-like text
+    :param limit: maximum length of a chunk in UTF-16 code units
+    :return: chunks
+    """
+    chunks: List[str] = []
+    lines: List[str] = []
+    size = 0
+    fence: Optional[str] = None
+    # Fence that reopens a block continued in the next chunk, without a language that would crowd out the code
+    reopen: Optional[str] = None
+
+    def flush(closing: List[str]) -> None:
+        if fence is None:
+            while lines and not lines[-1].strip():
+                lines.pop()
+        if "".join(lines).strip():
+            chunks.append("\n".join(lines + closing))
+
+    for source_line in text.split("\n"):
+        pending = [source_line]
+        while pending:
+            line = pending.pop()
+            if not lines and fence is None and not line.strip():
+                # Telegram rejects empty messages, blank lines at a chunk boundary are dropped
+                continue
+            length = utf16_len(line) + (1 if lines else 0)
+            # Room for a closing fence is always kept
+            if size + length + 4 > limit and lines and lines != [reopen]:
+                if lines[-1] == fence:
+                    # A block opened right before the cut starts in the next chunk
+                    lines.pop()
+                    flush([])
+                else:
+                    flush(["```"] if fence is not None else [])
+                lines = [reopen] if reopen is not None else []
+                size = utf16_len(reopen) if reopen is not None else 0
+                length = utf16_len(line) + (1 if lines else 0)
+            room = limit - size - 4 - (1 if lines else 0)
+            if utf16_len(line) > room:
+                # Two units fit any code point, so every cut makes progress
+                end = _cut(line, max(room, 2))
+                line, rest = line[:end], line[end:]
+                if rest:
+                    pending.append(rest)
+                length = utf16_len(line) + (1 if lines else 0)
+            lines.append(line)
+            size += length
+        stripped = source_line.strip()
+        if fence is None and stripped.startswith("```") and "`" not in stripped[3:]:
+            fence = stripped
+            reopen = fence if utf16_len(fence) <= limit // 4 else "```"
+        elif fence is not None and stripped.startswith("```") and not stripped.strip("`"):
+            fence = reopen = None
+    flush([])
+    return chunks
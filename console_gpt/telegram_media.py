@@ -0,0 +1,150 @@
+import atexit
+import base64
+import io
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import IO, Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+from pypdf import PdfReader
+
+"""
+Processing of the photos and documents received by the Telegram bot.
+
+Images are downscaled to the resolution the models actually use before they are encoded, PDF text is extracted
+in worker processes so large documents do not hold the GIL of the update workers, and the processed result is
+cached by the file_unique_id Telegram assigns, so a re-forwarded file is neither downloaded nor processed again.
+"""
+
+# Longest image side the providers work with, larger images are scaled down on their side anyway
+ANTHROPIC_IMAGE_MAX_SIDE = 1568
+DEFAULT_IMAGE_MAX_SIDE = 2048
+JPEG_QUALITY = 85
+# Processed media kept in memory, by the size of the cached values
+MEDIA_CACHE_BYTES = 64 * 1024 * 1024
+PDF_WORKERS = 2
+
+
+def image_max_side(model_title: str) -> int:
+    return ANTHROPIC_IMAGE_MAX_SIDE if model_title.startswith("anthropic") else DEFAULT_IMAGE_MAX_SIDE
+
+
+def pick_photo_size(photo_sizes: List[Dict[str, Any]], max_side: int) -> Dict[str, Any]:
+    """The smallest photo size that still covers max_side, so larger versions are never downloaded."""
+    for size in sorted(photo_sizes, key=lambda item: item.get("width", 0) * item.get("height", 0)):
+        if max(size.get("width", 0), size.get("height", 0)) >= max_side:
+            return size
+    return photo_sizes[-1]
+
+
+def encode_image(source: IO[bytes], max_side: int) -> str:
+    """
+    Downscale an image to max_side and return it base64 encoded as JPEG
+    :param source: file object with the image
+    :param max_side: longest side of the result
+    :return: base64 encoded JPEG
+    """
+    with Image.open(source) as image:
+        if image.format == "JPEG" and max(image.size) <= max_side and image.getexif().get(0x0112, 1) == 1:
+            # Already fit for the model, recompressing would only lose quality
+            source.seek(0)
+            return base64.b64encode(source.read()).decode("utf-8")
+        image = ImageOps.exif_transpose(image)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    return base64.b64encode(output.getvalue()).decode("utf-8")
+
+
+def extract_pdf_text(file_bytes: bytes) -> str:
+    text_parts: List[str] = []
+    reader = PdfReader(io.BytesIO(file_bytes))
+    for page in reader.pages:
+        text_parts.append(page.extract_text() or "")
+    return "\n".join(text_parts).strip()
+
+
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+_pdf_pool_lock = threading.Lock()
+
+
+def _shutdown_pdf_pool() -> None:
+    with _pdf_pool_lock:
+        if _pdf_pool is not None:
+            _pdf_pool.shutdown(wait=False, cancel_futures=True)
+
+
+def extract_pdf_text_in_pool(file_bytes: bytes) -> str:
+    """Extract the PDF text in a worker process, in this thread if worker processes are unavailable."""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            try:
+                _pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+                atexit.register(_shutdown_pdf_pool)
+            except (OSError, NotImplementedError):
+                return extract_pdf_text(file_bytes)
+        pool = _pdf_pool
+    try:
+        return pool.submit(extract_pdf_text, file_bytes).result()
+    except BrokenProcessPool:
+        with _pdf_pool_lock:
+            if _pdf_pool is pool:
+                _pdf_pool = None
+        return extract_pdf_text(file_bytes)
+
+
+class MediaCache:
+    """
+    LRU cache of processed media with a size budget. Concurrent requests for the same key wait for the
+    first one instead of processing the file again.
+    """
+
+    def __init__(self, max_bytes: int = MEDIA_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.lock = threading.Lock()
+        self.values: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self.in_flight: Dict[Hashable, Future] = {}
+
+    def get_or_create(self, key: Hashable, produce: Callable[[], Any]) -> Any:
+        with self.lock:
+            if key in self.values:
+                self.values.move_to_end(key)
+                return self.values[key][0]
+            future = self.in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self.in_flight[key] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            value = produce()
+        except BaseException as e:
+            with self.lock:
+                del self.in_flight[key]
+            future.set_exception(e)
+            raise
+        with self.lock:
+            del self.in_flight[key]
+            self._store(key, value)
+        future.set_result(value)
+        return value
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        size = len(value) if isinstance(value, (str, bytes)) else 0
+        if size > self.max_bytes:
+            return
+        self.values[key] = (value, size)
+        self.size += size
+        while self.size > self.max_bytes:
+            _, (_, evicted_size) = self.values.popitem(last=False)
+            self.size -= evicted_size
+
+
+media_cache = MediaCache()
@@ -0,0 +1,137 @@
+import hmac
+import json
+import queue
+import ssl
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+"""
+Webhook ingestion for the Telegram bot.
+
+A small HTTP server, optionally serving HTTPS itself, receives the updates Telegram POSTs to the webhook URL.
+Requests must carry the secret token registered with setWebhook. Accepted updates wait in a bounded queue for
+the bot's scheduler. While the queue is full, requests are answered with 503 and Telegram delivers them again
+later, so a busy bot slows Telegram down instead of piling up updates in memory.
+"""
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+MAX_BODY_BYTES = 1024 * 1024
+RETRY_AFTER_SECONDS = 1
+DEFAULT_MAX_PENDING_UPDATES = 100
+
+
+class WebhookServer:
+    """
+    Receives Telegram updates over HTTP(S) and queues them for the bot
+    :param listen: address to bind
+    :param port: port to bind
+    :param secret: secret token every request must send in the X-Telegram-Bot-Api-Secret-Token header
+    :param path: URL path of the webhook, None accepts any path
+    :param max_pending: updates queued before requests are refused
+    :param certfile: certificate for HTTPS, None serves plain HTTP (e.g. behind a reverse proxy)
+    :param keyfile: private key of the certificate, None if certfile contains it
+    """
+
+    def __init__(
+        self,
+        listen: str,
+        port: int,
+        secret: str,
+        path: Optional[str] = None,
+        max_pending: int = DEFAULT_MAX_PENDING_UPDATES,
+        certfile: Optional[str] = None,
+        keyfile: Optional[str] = None,
+    ):
+        self.secret = secret.encode("utf-8")
+        self.path = path
+        self.updates: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max(1, max_pending))
+        self.accepting = True
+        # Held while an update is checked against accepting and queued, so none is queued once close() returns
+        self.accepting_lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((listen, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        if certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile or None)
+            # The handshake then runs in the request thread, a slow client cannot stall the accept loop
+            self.httpd.socket = context.wrap_socket(self.httpd.socket, server_side=True, do_handshake_on_connect=False)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="tg-webhook", daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def next_updates(self, timeout: float) -> List[Dict[str, Any]]:
+        """Wait up to timeout for an update and return it along with any others already queued."""
+        try:
+            updates = [self.updates.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                updates.append(self.updates.get_nowait())
+            except queue.Empty:
+                return updates
+
+    def close(self) -> None:
+        """Refuse further deliveries with 503 and stop the server, updates already queued stay in the queue."""
+        with self.accepting_lock:
+            self.accepting = False
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _handler_class(self) -> type:
+        server = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                if server.path is not None and self.path.split("?", 1)[0] != server.path:
+                    self._reply(404)
+                    return
+                token = (self.headers.get(SECRET_HEADER) or "").encode("utf-8")
+                if not hmac.compare_digest(token, server.secret):
+                    self._reply(403)
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0 or length > MAX_BODY_BYTES:
+                    self._reply(413)
+                    return
+                try:
+                    update = json.loads(self.rfile.read(length))
+                except ValueError:
+                    self._reply(400)
+                    return
+                if not isinstance(update, dict) or "update_id" not in update:
+                    self._reply(400)
+                    return
+                with server.accepting_lock:
+                    accepted = server.accepting
+                    if accepted:
+                        try:
+                            server.updates.put_nowait(update)
+                        except queue.Full:
+                            accepted = False
+                self._reply(200 if accepted else 503)
+
+            def _reply(self, status: int) -> None:
+                body = b"{}" if status == 200 else b""
+                self.send_response(status)
+                if status == 503:
+                    self.send_header("Retry-After", str(RETRY_AFTER_SECONDS))
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                # Every update would otherwise be logged to stderr
+                pass
+
+        return _Handler
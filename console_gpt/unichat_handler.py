@@ -1,4 +1,6 @@
+import asyncio
 import json
+from typing import List, Optional, Tuple, Union
 
 from rich.live import Live
 from rich.markdown import Markdown
@@ -6,10 +8,103 @@ from rich.markdown import Markdown
 from console_gpt.custom_stdout import custom_print, markdown_print
 from console_gpt.prompts.assistant_prompt import assistance_reply
 from console_gpt.prompts.image_prompt import save_image
-from mcp_servers.mcp_tcp_client import MCPClient
-
-
-def handle_streaming_completion(model_name, response_stream, conversation):
+from mcp_servers.mcp_tcp_client import MCPClient, MCPClientError
+
+# Seconds between Markdown re-renders while a reply is streamed
+RENDER_INTERVAL = 0.1
+
+
+class LiveMarkdown:
+    """
+    Live view of a streamed reply. Chunks only replace the text, the Markdown is parsed
+    and rendered on a fixed tick so long replies are not re-parsed for every chunk.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._rendered: Optional[str] = None
+        self._live = Live(refresh_per_second=10)
+        self._ticker: Optional[asyncio.Task] = None
+
+    async def __aenter__(self):
+        self._live.__enter__()
+        self._ticker = asyncio.create_task(self._tick())
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._ticker.cancel()
+        self._render()
+        self._live.__exit__(exc_type, exc_val, exc_tb)
+
+    def _render(self) -> None:
+        if self.text != self._rendered:
+            self._live.update(Markdown(self.text, code_theme="dracula"))
+            self._rendered = self.text
+
+    async def _tick(self) -> None:
+        while True:
+            await asyncio.sleep(RENDER_INTERVAL)
+            self._render()
+
+
+def _with_reasoning(reasoning_content: str, content: str) -> str:
+    if not reasoning_content:
+        return content
+    return f"{reasoning_content}\n\n\n***** **REASONING END** *****\n\n\n{content}"
+
+
+def _call_mcp_tool(tool_name: str, function_arguments: str) -> str:
+    """
+    Blocking MCP tool call, run in a worker thread
+    :param tool_name: name of the tool
+    :param function_arguments: JSON encoded arguments as produced by the model
+    :return: tool result or the error message for the model
+    """
+    outcome: Union[str, Exception] = ConnectionError("MCP server is not available")
+    try:
+        tool_arguments = json.loads(function_arguments) if function_arguments else {}
+        with MCPClient() as mcp:
+            if mcp is not None:
+                try:
+                    outcome = str(mcp.call_tool(tool_name, tool_arguments))
+                except (ConnectionError, MCPClientError) as e:
+                    outcome = e  # The context manager would swallow it
+    except Exception as e:
+        outcome = e
+    if isinstance(outcome, Exception):
+        custom_print("error", f"Error calling tool: {outcome}")
+        return str(outcome)
+    return outcome
+
+
+async def run_tool_calls(calls: List[Tuple[str, str]]) -> List[str]:
+    """
+    Execute the tool calls of one reply concurrently
+    :param calls: (tool name, JSON arguments) pairs
+    :return: the results in the order of the calls
+    """
+    for tool_name, _ in calls:
+        markdown_print(f"> Triggered: `{tool_name}`.")
+    return await asyncio.gather(*(asyncio.to_thread(_call_mcp_tool, name, arguments) for name, arguments in calls))
+
+
+async def _close_stream(response_stream) -> None:
+    close = getattr(response_stream, "close", None)
+    if close:
+        result = close()
+        if asyncio.iscoroutine(result):
+            await result
+
+
+async def _append_tool_results(conversation, tool_calls) -> None:
+    results = await run_tool_calls(
+        [(tool_call["function"]["name"], tool_call["function"]["arguments"]) for tool_call in tool_calls]
+    )
+    for tool_call, content in zip(tool_calls, results):
+        conversation.append({"role": "tool", "content": content, "tool_call_id": tool_call["id"]})
+
+
+async def handle_streaming_completion(model_name, response_stream, conversation):
     """Handle streaming response and tool calls."""
     if (
         isinstance(conversation[-1], str)
@@ -27,96 +122,68 @@ def handle_streaming_completion(model_name, response_stream, conversation):
     }
 
     last_tool_call_index = -1
-    with Live(refresh_per_second=10) as live:
-        for chunk in response_stream:
-            delta = chunk.choices[0].delta
-            finish_reason = chunk.choices[0].finish_reason
-
-            if hasattr(delta, "reasoning_content") and delta.reasoning_content:
-                reasoning_content += delta.reasoning_content
-                rmd = Markdown(reasoning_content, code_theme="dracula")
-                live.update(rmd)
-
-            if hasattr(delta, "reasoning") and delta.reasoning:
-                reasoning_content += delta.reasoning
-                rmd = Markdown(reasoning_content, code_theme="dracula")
-                live.update(rmd)
-
-            if hasattr(delta, "content") and delta.content:
-                current_content += delta.content
-                current_assistant_message["content"] = current_content
-                formatted_content = (
-                    f"{reasoning_content}\n\n\n***** **REASONING END** *****\n\n\n{current_content}"
-                    if reasoning_content
-                    else current_content
-                )
-                md = Markdown(formatted_content, code_theme="dracula")
-                live.update(md)
-
-            # Handle tool calls
-            if hasattr(delta, "tool_calls") and delta.tool_calls:
-                # Initialize tool_calls if not present
-                if "tool_calls" not in current_assistant_message:
-                    current_assistant_message["tool_calls"] = []
-
-                for tool_call in delta.tool_calls:
-                    # If we have an ID, this is a new tool call
-                    if hasattr(tool_call, "id") and tool_call.id:
-                        new_tool_call = {
-                            "id": tool_call.id,
-                            "type": "function",
-                            "function": {
-                                "name": tool_call.function.name if hasattr(tool_call.function, "name") else "",
-                                "arguments": "",
-                            },
-                        }
-                        current_assistant_message["tool_calls"].append(new_tool_call)
-                        last_tool_call_index = len(current_assistant_message["tool_calls"]) - 1
-
-                    # If we have arguments, append to the last tool call
-                    if (
-                        hasattr(tool_call, "function")
-                        and hasattr(tool_call.function, "arguments")
-                        and tool_call.function.arguments
-                    ):
-                        if last_tool_call_index >= 0:
-                            current_assistant_message["tool_calls"][last_tool_call_index]["function"][
-                                "arguments"
-                            ] += tool_call.function.arguments
-
-            if finish_reason:
-                conversation.append(current_assistant_message)
+    try:
+        async with LiveMarkdown() as live:
+            async for chunk in response_stream:
+                delta = chunk.choices[0].delta
+                finish_reason = chunk.choices[0].finish_reason
+
+                if hasattr(delta, "reasoning_content") and delta.reasoning_content:
+                    reasoning_content += delta.reasoning_content
+                    live.text = reasoning_content
+
+                if hasattr(delta, "reasoning") and delta.reasoning:
+                    reasoning_content += delta.reasoning
+                    live.text = reasoning_content
+
+                if hasattr(delta, "content") and delta.content:
+                    current_content += delta.content
+                    current_assistant_message["content"] = current_content
+                    live.text = _with_reasoning(reasoning_content, current_content)
+
+                # Handle tool calls
+                if hasattr(delta, "tool_calls") and delta.tool_calls:
+                    # Initialize tool_calls if not present
+                    if "tool_calls" not in current_assistant_message:
+                        current_assistant_message["tool_calls"] = []
+
+                    for tool_call in delta.tool_calls:
+                        # If we have an ID, this is a new tool call
+                        if hasattr(tool_call, "id") and tool_call.id:
+                            new_tool_call = {
+                                "id": tool_call.id,
+                                "type": "function",
+                                "function": {
+                                    "name": tool_call.function.name if hasattr(tool_call.function, "name") else "",
+                                    "arguments": "",
+                                },
+                            }
+                            current_assistant_message["tool_calls"].append(new_tool_call)
+                            last_tool_call_index = len(current_assistant_message["tool_calls"]) - 1
+
+                        # If we have arguments, append to the last tool call
+                        if (
+                            hasattr(tool_call, "function")
+                            and hasattr(tool_call.function, "arguments")
+                            and tool_call.function.arguments
+                        ):
+                            if last_tool_call_index >= 0:
+                                current_assistant_message["tool_calls"][last_tool_call_index]["function"][
+                                    "arguments"
+                                ] += tool_call.function.arguments
+
+                if finish_reason:
+                    conversation.append(current_assistant_message)
+    finally:
+        await _close_stream(response_stream)
 
     # Process tool calls
     if current_assistant_message.get("tool_calls"):
-        for tool_call in current_assistant_message["tool_calls"]:
-            tool_name = tool_call["function"]["name"]
-            function_arguments = tool_call["function"]["arguments"]
-            if function_arguments:
-                tool_arguments = json.loads(function_arguments)
-            else:
-                tool_arguments = {}
-            markdown_print(f"> Triggered: `{tool_name}`.")
-            try:
-                with MCPClient() as mcp:
-                    result = {
-                        "role": "tool",
-                        "content": str(mcp.call_tool(tool_name, tool_arguments)),
-                        "tool_call_id": tool_call["id"],
-                    }
-                conversation.append(result)
-            except Exception as e:
-                custom_print("error", f"Error calling tool: {e}")
-                result = {
-                    "role": "tool",
-                    "content": str(e),
-                    "tool_call_id": tool_call["id"],
-                }
-                conversation.append(result)
+        await _append_tool_results(conversation, current_assistant_message["tool_calls"])
     return conversation
 
 
-def handle_non_streaming_completion(model_name, response, conversation):
+async def handle_non_streaming_completion(model_name, response, conversation):
     """Handle non-streaming response and tool calls."""
     assistant_response = {
         "role": "assistant",
@@ -174,70 +241,47 @@ def handle_non_streaming_completion(model_name, response, conversation):
 
     # Process tool calls if they exist
     if tool_calls:
-        for tool_call in assistant_response.get("tool_calls"):
-            tool_name = tool_call["function"]["name"]
-            function_arguments = tool_call["function"]["arguments"]
-            if function_arguments:
-                tool_arguments = json.loads(function_arguments)
-            else:
-                tool_arguments = {}
-            markdown_print(f"> Triggered: `{tool_name}`.")
-            try:
-                with MCPClient() as mcp:
-                    result = {
-                        "role": "tool",
-                        "content": str(mcp.call_tool(tool_name, tool_arguments)),
-                        "tool_call_id": tool_call["id"],
-                    }
-                conversation.append(result)
-            except Exception as e:
-                custom_print("error", f"Error calling tool: {e}")
-                result = {
-                    "role": "tool",
-                    "content": str(e),
-                    "tool_call_id": tool_call["id"],
-                }
-                conversation.append(result)
+        await _append_tool_results(conversation, assistant_response["tool_calls"])
 
     return conversation
 
 
-def handle_streaming_response(model_name, response_stream, conversation):
+async def handle_streaming_response(model_name, response_stream, conversation):
     """Handle streaming response and tool calls."""
     if isinstance(conversation[-1], str) or conversation[-1].get("type") != "function_call_output":
         assistance_reply("", model_name)
 
     reasoning_content = ""
     current_content = ""
+    output = None
 
-    with Live(refresh_per_second=10) as live:
-        for event in response_stream:
+    try:
+        async with LiveMarkdown() as live:
+            async for event in response_stream:
 
-            if event.type == "response.reasoning_summary_text.delta":
-                reasoning_content += event.delta
-                rmd = Markdown(reasoning_content, code_theme="dracula")
-                live.update(rmd)
+                if event.type == "response.reasoning_summary_text.delta":
+                    reasoning_content += event.delta
+                    live.text = reasoning_content
 
-            if event.type == "response.reasoning_summary_text.done":
-                reasoning_content += "\n\n"
+                if event.type == "response.reasoning_summary_text.done":
+                    reasoning_content += "\n\n"
 
-            if event.type == "response.output_text.delta":
-                current_content += event.delta
-                formatted_content = (
-                    f"{reasoning_content}\n\n\n***** **REASONING END** *****\n\n\n{current_content}"
-                    if reasoning_content
-                    else current_content
-                )
-                md = Markdown(formatted_content, code_theme="dracula")
-                live.update(md)
+                if event.type == "response.output_text.delta":
+                    current_content += event.delta
+                    live.text = _with_reasoning(reasoning_content, current_content)
 
-            if event.type == "response.completed":
-                conversation.extend(response_parser(event.response.output))
+                if event.type == "response.completed":
+                    output = event.response.output
+    finally:
+        await _close_stream(response_stream)
+
+    if output is not None:
+        conversation.extend(await response_parser(output))
 
     return conversation
 
 
-def handle_non_streaming_response(model_name, response, conversation):
+async def handle_non_streaming_response(model_name, response, conversation):
     """Handle non-streaming response and tool calls."""
 
     for output in response.output:
@@ -249,14 +293,16 @@ def handle_non_streaming_response(model_name, response, conversation):
         if output.type == "message":
             assistance_reply(output.content[0].text, model_name)
 
-    conversation.extend(response_parser(response.output))
+    conversation.extend(await response_parser(response.output))
 
     return conversation
 
 
-def response_parser(output):
+async def response_parser(output):
     dict_output = []
     reasoning_output = []
+    # (index in dict_output, call id, tool name, arguments), executed together once the output is parsed
+    function_calls = []
     for o in output:
         if o.type not in ("message", "function_call", "image_generation_call"):
             markdown_print(f"> Triggered: `{o.type}`.")
@@ -271,30 +317,14 @@ def response_parser(output):
             dict_output.extend(reasoning_output)
             reasoning_output = []
             dict_output.append(o.model_dump())
-            tool_name = o.name
-            function_arguments = o.arguments
-            if function_arguments:
-                tool_arguments = json.loads(function_arguments)
-            else:
-                tool_arguments = {}
-            markdown_print(f"> Triggered: `{tool_name}`.")
-            try:
-                with MCPClient() as mcp:
-                    result = {
-                        "type": "function_call_output",
-                        "call_id": o.call_id,
-                        "output": str(mcp.call_tool(tool_name, tool_arguments)),
-                    }
-                    dict_output.append(result)
-            except Exception as e:
-                custom_print("error", f"Error calling tool: {e}")
-                result = {
-                    "type": "function_call_output",
-                    "call_id": o.call_id,
-                    "output": str(e),
-                }
-                dict_output.append(result)
+            function_calls.append((len(dict_output), o.call_id, o.name, o.arguments))
+            dict_output.append(None)  # Replaced by the function_call_output
         if o.type == "image_generation_call":
             image_base64 = o.result
             save_image(image_base64)
+
+    if function_calls:
+        results = await run_tool_calls([(name, arguments) for _, _, name, arguments in function_calls])
+        for (index, call_id, _, _), result in zip(function_calls, results):
+            dict_output[index] = {"type": "function_call_output", "call_id": call_id, "output": result}
     return dict_output
@@ -0,0 +1,106 @@
+"""
+Measure the round-trip cost of MCP bridge messages against payload size, for the legacy framing
+(stdlib json + 4 KB recv chunks) and every wire format available in this interpreter.
+
+The peer is an echo thread on a socket pair, so the numbers cover encoding, framing, the socket
+and decoding on the client side without any MCP server work.
+
+Usage:
+    python helpers/benchmark_mcp_framing.py [--sizes 1024 65536 1048576] [--rounds 20]
+"""
+
+import argparse
+import json
+import socket
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from mcp_servers.mcp_tcp_client import MCPClient  # noqa: E402
+from mcp_servers.wire_format import CODECS, HEADER_SIZE  # noqa: E402
+
+DEFAULT_SIZES = [1024, 16 * 1024, 256 * 1024, 1024 * 1024, 8 * 1024 * 1024]
+
+
+def echo_frames(sock: socket.socket) -> None:
+    """Send every received frame back unchanged."""
+    with sock:
+        while True:
+            header = sock.recv(HEADER_SIZE, socket.MSG_WAITALL)
+            if len(header) < HEADER_SIZE:
+                return
+            body = sock.recv(int.from_bytes(header, "big"), socket.MSG_WAITALL)
+            sock.sendall(header + body)
+
+
+def legacy_round_trip(sock: socket.socket, message: dict) -> dict:
+    """The framing used before the negotiated formats, kept here as the baseline."""
+    data = json.dumps(message).encode()
+    sock.sendall(len(data).to_bytes(4, "big"))
+    sock.sendall(data)
+    msg_length = int.from_bytes(sock.recv(4), "big")
+    chunks = []
+    received = 0
+    while received < msg_length:
+        chunk = sock.recv(min(msg_length - received, 4096))
+        chunks.append(chunk)
+        received += len(chunk)
+    return json.loads(b"".join(chunks).decode())
+
+
+def make_message(size: int) -> dict:
+    # Shaped like a tool result: mostly text with some non-ASCII content
+    text = ("MCP tool output line with unicode ✓ and numbers 1234567890\n" * (size // 60 + 1))[:size]
+    return {"status": "success", "id": 1, "result": text}
+
+
+def measure(round_trip, message: dict, rounds: int) -> float:
+    round_trip(message)  # Warm up buffers
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        round_trip(message)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Payload sizes in bytes")
+    parser.add_argument("--rounds", type=int, default=20, help="Timed round trips per size (median is reported)")
+    args = parser.parse_args()
+
+    client_sock, peer_sock = socket.socketpair()
+    threading.Thread(target=echo_frames, args=(peer_sock,), daemon=True).start()
+
+    client = MCPClient(auto_start=False, silent=True)
+    client.sock = client_sock
+
+    def codec_round_trip(codec):
+        def round_trip(message: dict) -> dict:
+            client.codec = codec
+            return client._send_request(message)
+
+        return round_trip
+
+    candidates = [("legacy json", lambda message: legacy_round_trip(client_sock, message))]
+    candidates += [(name, codec_round_trip(codec)) for name, codec in CODECS.items()]
+
+    header = f"{'payload':>10}" + "".join(f"{name + ' ms':>16}" for name, _ in candidates) + f"{'best speedup':>14}"
+    print(header)
+    print("-" * len(header))
+    for size in args.sizes:
+        message = make_message(size)
+        timings = [measure(round_trip, message, args.rounds) for _, round_trip in candidates]
+        speedup = timings[0] / min(timings[1:]) if len(timings) > 1 else 1.0
+        print(f"{size:>10}" + "".join(f"{t * 1000:>16.3f}" for t in timings) + f"{speedup:>13.1f}x")
+
+    client_sock.close()
+
+
+if __name__ == "__main__":
+    main()
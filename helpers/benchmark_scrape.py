@@ -0,0 +1,115 @@
+"""
+Compare the legacy scraping pipeline (html.parser + per-tag cleanup + markdownify)
+with the single-pass extraction engine on a corpus of saved HTML pages.
+
+Usage:
+    python helpers/benchmark_scrape.py <directory with *.html files> [--rounds 5]
+
+Token counts use tiktoken (cl100k_base) when installed, otherwise a chars/4 estimate.
+"""
+
+import argparse
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+from markdownify import markdownify as md
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from console_gpt.scrape_page import HTML_PARSER, html_to_markdown  # noqa: E402
+
+try:
+    import tiktoken
+
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+
+    def count_tokens(text: str) -> int:
+        return len(_ENCODING.encode(text))
+
+except ImportError:
+
+    def count_tokens(text: str) -> int:
+        return len(text) // 4
+
+
+LEGACY_USELESS_TAGS = [
+    "script",
+    "style",
+    "meta",
+    "link",
+    "head",
+    "noscript",
+    "footer",
+    "iframe",
+    "input",
+    "form",
+    "comment",
+]
+
+
+def legacy_html_to_markdown(html_content: str) -> str:
+    """The pipeline used before the single-pass engine, kept here as the baseline."""
+    soup = BeautifulSoup(html_content, "html.parser")
+    for tag in LEGACY_USELESS_TAGS:
+        for element in soup(tag):
+            element.decompose()
+    return re.sub(r"\n{3,}", "\n\n", md(str(soup))).strip()
+
+
+def measure(converter, html_content: str, rounds: int):
+    timings = []
+    output = ""
+    for _ in range(rounds):
+        start = time.perf_counter()
+        output = converter(html_content)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), count_tokens(output)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", type=Path, help="Directory with saved *.html / *.htm pages")
+    parser.add_argument("--rounds", type=int, default=5, help="Timed runs per page (median is reported)")
+    args = parser.parse_args()
+
+    pages = sorted(p for p in args.corpus.iterdir() if p.suffix.lower() in (".html", ".htm"))
+    if not pages:
+        print(f"No .html files found in {args.corpus}")
+        sys.exit(1)
+
+    print(f"Parser used by the single-pass engine: {HTML_PARSER}\n")
+    header = f"{'page':<40} {'legacy ms':>10} {'new ms':>10} {'speedup':>8} {'legacy tok':>11} {'new tok':>9}"
+    print(header)
+    print("-" * len(header))
+
+    totals = [0.0, 0.0, 0, 0]
+    for page in pages:
+        html_content = page.read_text(encoding="utf-8", errors="replace")
+        legacy_time, legacy_tokens = measure(legacy_html_to_markdown, html_content, args.rounds)
+        new_time, new_tokens = measure(html_to_markdown, html_content, args.rounds)
+        totals[0] += legacy_time
+        totals[1] += new_time
+        totals[2] += legacy_tokens
+        totals[3] += new_tokens
+        speedup = legacy_time / new_time if new_time else float("inf")
+        print(
+            f"{page.name[:40]:<40} {legacy_time * 1000:>10.1f} {new_time * 1000:>10.1f} {speedup:>7.1f}x "
+            f"{legacy_tokens:>11} {new_tokens:>9}"
+        )
+
+    print("-" * len(header))
+    speedup = totals[0] / totals[1] if totals[1] else float("inf")
+    saved = 100 * (1 - totals[3] / totals[2]) if totals[2] else 0.0
+    print(
+        f"{'TOTAL':<40} {totals[0] * 1000:>10.1f} {totals[1] * 1000:>10.1f} {speedup:>7.1f}x "
+        f"{totals[2]:>11} {totals[3]:>9}"
+    )
+    print(f"\nOutput tokens reduced by {saved:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
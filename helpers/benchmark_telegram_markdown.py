@@ -0,0 +1,119 @@
+"""
+Measure the Markdown-to-HTML conversion of Telegram replies against reply size, for the legacy multi-pass
+regex converter and the single-pass converter in console_gpt.telegram_markdown.
+
+The replies are synthetic model output: headings, paragraphs with bold, italic, inline code and links,
+bullet lists and fenced code blocks.
+
+Usage:
+    python helpers/benchmark_telegram_markdown.py [--sizes 4000 32000 256000] [--rounds 20]
+"""
+
+import argparse
+import html
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from console_gpt.telegram_markdown import markdown_to_html  # noqa: E402
+
+DEFAULT_SIZES = [4000, 32000, 256000, 1024000]
+
+SECTION = """## Step {n}: configure the **client**
+
+The `MCPClient` reads **all settings** from *config.toml*, see [the docs](https://example.com/docs/{n}).
+Values such as __max_retries__ and `timeout_seconds` are validated on start, snake_case_names stay as they are.
+
+- first item with **bold and *nested italic* text**
+- second item with ~~removed~~ text & an <angle> bracket
+
+```python
+def handler(event: dict) -> bool:
+    return event.get("type") == "message" and len(event) < {n}
+```
+
+"""
+
+
+def legacy_markdown_to_html(text: str) -> str:
+    """The converter used before, kept here as the baseline."""
+    if not text:
+        return ""
+
+    fenced_blocks = []
+
+    def _capture_fenced_block(match):
+        block = match.group(1) or ""
+        escaped = html.escape(block.strip("\n"))
+        fenced_blocks.append(f"<pre><code>{escaped}</code></pre>")
+        return f"@@TG_CODEBLOCK_{len(fenced_blocks) - 1}@@"
+
+    without_fenced = re.sub(r"```(?:[^\n`]+)?\n([\s\S]*?)```", _capture_fenced_block, text)
+    escaped_text = html.escape(without_fenced)
+
+    lines = []
+    for line in escaped_text.split("\n"):
+        heading_match = re.match(r"^\s{0,3}#{1,6}\s+(.+)$", line)
+        if heading_match:
+            lines.append(f"<b>{heading_match.group(1).strip()}</b>")
+        else:
+            lines.append(line)
+    transformed = "\n".join(lines)
+
+    transformed = re.sub(
+        r"\[([^\]]+)\]\((https?://[^\s)]+)\)",
+        lambda m: f'<a href="{m.group(2)}">{m.group(1)}</a>',
+        transformed,
+    )
+    transformed = re.sub(r"\*\*(.+?)\*\*", r"<b>\1</b>", transformed)
+    transformed = re.sub(r"__(.+?)__", r"<b>\1</b>", transformed)
+    transformed = re.sub(r"`([^`\n]+)`", r"<code>\1</code>", transformed)
+
+    for idx, block in enumerate(fenced_blocks):
+        transformed = transformed.replace(f"@@TG_CODEBLOCK_{idx}@@", block)
+
+    return transformed
+
+
+def make_reply(size: int) -> str:
+    sections = []
+    length = 0
+    while length < size:
+        sections.append(SECTION.format(n=len(sections)))
+        length += len(sections[-1])
+    return "".join(sections)
+
+
+def measure(convert, text: str, rounds: int) -> float:
+    convert(text)  # Warm up the pattern caches
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        convert(text)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Reply sizes in characters")
+    parser.add_argument("--rounds", type=int, default=20, help="Timed conversions per size (median is reported)")
+    args = parser.parse_args()
+
+    header = f"{'reply chars':>12}{'code blocks':>13}{'legacy ms':>12}{'single-pass ms':>16}{'speedup':>10}"
+    print(header)
+    print("-" * len(header))
+    for size in args.sizes:
+        reply = make_reply(size)
+        legacy = measure(legacy_markdown_to_html, reply, args.rounds)
+        current = measure(markdown_to_html, reply, args.rounds)
+        blocks = reply.count("```") // 2
+        print(f"{len(reply):>12}{blocks:>13}{legacy * 1000:>12.3f}{current * 1000:>16.3f}{legacy / current:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
+import argparse
+
 from rich.console import Console
 
 from console_gpt.assistant import assistant
+from console_gpt.batch import DEFAULT_CONCURRENCY, DEFAULT_RETRIES, run_batch
 from console_gpt.chat import chat
 from console_gpt.config_manager import check_config_version, fetch_variable
 from console_gpt.custom_stdin import custom_input
@@ -10,6 +13,7 @@ from console_gpt.menus.combined_menu import (AssistantObject, ChatObject,
                                              combined_menu)
 from console_gpt.prompts.save_chat_prompt import _validate_confirmation
 from console_gpt.telegram_bot import run_telegram_bot
+from mcp_servers.tool_prefetch import start_tool_prefetch
 
 
 def console_gpt() -> None:
@@ -19,6 +23,9 @@ def console_gpt() -> None:
     if fetch_variable("telegram", "enabled", auto_exit=False):
         run_telegram_bot()
         return
+    if fetch_variable("features", "mcp_client"):
+        # Start MCP servers and discover tools while the user goes through the menus
+        start_tool_prefetch()
     intro_message()
     # Outer loop
     while True:
@@ -48,5 +55,35 @@ def console_gpt() -> None:
             raise TypeError("combined_menu() returned an unexpected type.")
 
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="console-chat-gpt. Without arguments the interactive chat starts.")
+    batch = parser.add_argument_group("headless batch mode")
+    batch.add_argument("--batch", metavar="INPUT", help="JSONL file of conversations to run without the menus")
+    batch.add_argument("--output", metavar="OUTPUT", help="JSONL file for the results (default: INPUT.results.jsonl)")
+    batch.add_argument("--model", help="model title from config.toml for entries without a model")
+    batch.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="requests in flight")
+    batch.add_argument(
+        "--rpm", type=int, default=0, help="requests per minute per provider key (0: learn from headers)"
+    )
+    batch.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help="retries on rate limits and server errors")
+    batch.add_argument(
+        "--provider-batch", action="store_true", help="submit requests of OpenAI models through the Batch API"
+    )
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    console_gpt()
+    args = parse_args()
+    if args.batch:
+        set_locale()
+        run_batch(
+            args.batch,
+            args.output or f"{args.batch}.results.jsonl",
+            model=args.model,
+            concurrency=args.concurrency,
+            rpm=args.rpm,
+            retries=args.retries,
+            provider_batch=args.provider_batch,
+        )
+    else:
+        console_gpt()
@@ -46,3 +46,14 @@ class CommandNotFoundError(MCPError):
                 "help": "The command might need to be installed or added to your system's PATH.",
             },
         )
+
+
+class BridgeBusyError(MCPError):
+    """Rejected by admission control, the same request may be sent again after retry_after seconds."""
+
+    def __init__(self, error_type: str, message: str, retry_after: float, **details: Any):
+        super().__init__(
+            error_type=error_type,
+            message=message,
+            details={"retryable": True, "retry_after": retry_after, **details},
+        )
@@ -0,0 +1,210 @@
+"""
+Thread-safe pooled client of the MCP bridge, for callers that run tool calls from many threads at once.
+
+Every connection is multiplexed: requests are tagged with an "id", a reader thread matches the responses to
+their callers, so a slow tool never holds a connection for the calls queued behind it. The bridge schedules
+calls fairly per client id, callers pass one id per user or chat.
+"""
+
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .mcp_errors import MCPError
+from .mcp_tcp_client import MCPClient, MCPClientError
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_TOOL_TIMEOUT = 60.0
+
+
+class _MultiplexedConnection(MCPClient):
+    """One bridge connection shared by concurrent callers."""
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(auto_start=False, silent=True, **kwargs)
+        self.send_lock = threading.Lock()
+        self.pending: Dict[int, Future] = {}
+        self.pending_lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.reader: Optional[threading.Thread] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.sock is not None
+
+    def open(self) -> bool:
+        # The format is negotiated before the reader starts, while requests are still answered in order
+        if not self._connect():
+            return False
+        self.reader = threading.Thread(target=self._read_responses, name="mcp-pool-reader", daemon=True)
+        self.reader.start()
+        return True
+
+    def submit(self, request: Dict[str, Any]) -> Future:
+        """Send a request and return the future of its response."""
+        future: Future = Future()
+        request_id = next(self.ids)
+        with self.pending_lock:
+            self.pending[request_id] = future
+        try:
+            with self.send_lock:
+                self.sock.sendall(self.codec.frame({**request, "id": request_id}))
+        except (OSError, AttributeError) as e:
+            self._fail_pending(MCPClientError(MCPError("CONNECTION_ERROR", f"Could not send the request: {e}")))
+        return future
+
+    def discard(self, future: Future) -> None:
+        """Forget a request nobody waits for anymore, its late response is dropped."""
+        with self.pending_lock:
+            for request_id, pending in list(self.pending.items()):
+                if pending is future:
+                    del self.pending[request_id]
+
+    def _read_responses(self) -> None:
+        try:
+            while True:
+                message = self._receive_message()
+                if message.get("stream"):
+                    # Frames of one response are never interleaved with other responses
+                    message["result"] = self._join_stream(self._receive_stream())
+                future = None
+                with self.pending_lock:
+                    if "id" in message:
+                        future = self.pending.pop(message["id"], None)
+                if future is not None and not future.done():
+                    future.set_result(message)
+        except (OSError, MCPClientError) as e:
+            error = e if isinstance(e, MCPClientError) else MCPClientError(MCPError("CONNECTION_ERROR", str(e)))
+            self._fail_pending(error)
+
+    def _fail_pending(self, error: MCPClientError) -> None:
+        self.close()
+        with self.pending_lock:
+            pending, self.pending = self.pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+
+class MCPBridgePool:
+    """
+    A few multiplexed connections to the bridge, opened lazily and reopened when they drop.
+    Safe to use from any number of threads.
+    """
+
+    def __init__(self, size: int = DEFAULT_POOL_SIZE):
+        self.size = max(1, size)
+        self.lock = threading.Lock()
+        self.connections: List[_MultiplexedConnection] = []
+
+    def _connection(self) -> _MultiplexedConnection:
+        """The live connection with the fewest requests in flight, opening one while the pool is not full."""
+        with self.lock:
+            self.connections = [connection for connection in self.connections if connection.alive]
+            idle = [connection for connection in self.connections if not connection.pending]
+            if idle:
+                return idle[0]
+            if len(self.connections) < self.size:
+                connection = _MultiplexedConnection()
+                if connection.open():
+                    self.connections.append(connection)
+                    return connection
+            if not self.connections:
+                raise MCPClientError(MCPError("CONNECTION_ERROR", "MCP server is not available"))
+            return min(self.connections, key=lambda connection: len(connection.pending))
+
+    def _submit(self, request: Dict[str, Any]) -> Tuple[_MultiplexedConnection, Future]:
+        connection = self._connection()
+        return connection, connection.submit(request)
+
+    def _result(self, connection: _MultiplexedConnection, future: Future, timeout: Optional[float]) -> Any:
+        try:
+            response = future.result(timeout)
+        except FutureTimeoutError:
+            connection.discard(future)
+            raise
+        return connection._handle_response(response)
+
+    def fetch_tools(self, timeout: Optional[float] = DEFAULT_TOOL_TIMEOUT) -> List[Dict[str, Any]]:
+        """Get the available tools of the bridge."""
+        connection, future = self._submit({"command": "get_tools"})
+        try:
+            response = future.result(timeout)
+        except FutureTimeoutError:
+            connection.discard(future)
+            raise
+        return response.get("tools", [])
+
+    def call_tools(
+        self,
+        calls: Sequence[Tuple[str, Dict[str, Any]]],
+        client_id: str,
+        timeout: float = DEFAULT_TOOL_TIMEOUT,
+        retries: int = 2,
+    ) -> List[Any]:
+        """
+        Run tool calls concurrently, each with its own deadline
+        :param calls: (tool name, arguments) pairs
+        :param client_id: id the bridge uses for fair scheduling and quotas
+        :param timeout: seconds each call may take, busy retries included
+        :param retries: resends of a call the bridge rejected as busy
+        :return: the result of each call in order, or the exception it failed with
+        """
+        deadlines = [time.monotonic() + timeout] * len(calls)
+        requests = [
+            {"command": "call_tool", "tool_name": name, "arguments": arguments, "client_id": client_id, "stream": True}
+            for name, arguments in calls
+        ]
+        in_flight: List[Optional[Tuple[_MultiplexedConnection, Future]]] = []
+        results: List[Any] = [None] * len(calls)
+        for index, request in enumerate(requests):
+            try:
+                in_flight.append(self._submit(request))
+            except MCPClientError as e:
+                in_flight.append(None)
+                results[index] = e
+
+        for index, submitted in enumerate(in_flight):
+            attempts = retries
+            while submitted is not None:
+                connection, future = submitted
+                submitted = None
+                remaining = deadlines[index] - time.monotonic()
+                try:
+                    results[index] = self._result(connection, future, max(0.0, remaining))
+                except FutureTimeoutError:
+                    results[index] = TimeoutError(f"Tool '{calls[index][0]}' timed out after {timeout:g}s")
+                except MCPClientError as e:
+                    delay = e.error.details.get("retry_after", 1)
+                    if not e.retryable or attempts <= 0 or time.monotonic() + delay >= deadlines[index]:
+                        results[index] = e
+                        continue
+                    attempts -= 1
+                    time.sleep(delay)
+                    try:
+                        submitted = self._submit(requests[index])
+                    except MCPClientError as resubmit_error:
+                        results[index] = resubmit_error
+        return results
+
+    def close(self) -> None:
+        with self.lock:
+            connections, self.connections = self.connections, []
+        for connection in connections:
+            connection._fail_pending(MCPClientError(MCPError("CONNECTION_ERROR", "Connection pool closed")))
+
+
+_shared_pool: Optional[MCPBridgePool] = None
+_shared_pool_lock = threading.Lock()
+
+
+def shared_pool() -> MCPBridgePool:
+    """The process-wide pool, created on first use."""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = MCPBridgePool()
+        return _shared_pool
@@ -1,11 +1,20 @@
-import json
+import os
 import socket
-from typing import Any, Dict, List, Tuple
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from console_gpt.custom_stdout import custom_print
 
 from .mcp_errors import MCPError
 from .server_manager import ServerManager
+from .server_registry import TRANSPORT_UNIX
+from .wire_format import (CODECS, FORMAT_JSON, HEADER_SIZE, JSON_CODEC,
+                          supported_formats)
+
+RECEIVE_BUFFER_SIZE = 64 * 1024
+MAX_RETAINED_BUFFER = 4 * 1024 * 1024
+# Ceiling on a result joined in memory, it also applies when the bridge is configured without a limit
+MAX_RESULT_CHARS = 16 * 1024 * 1024
 
 
 class MCPClientError(Exception):
@@ -13,35 +22,64 @@ class MCPClientError(Exception):
         self.error = error
         super().__init__(str(error.message))
 
+    @property
+    def retryable(self) -> bool:
+        """The bridge rejected the request because it is busy, it may succeed when sent again."""
+        return bool(self.error.details.get("retryable"))
+
 
 class MCPClient:
     _server_failed = False  # Class-level flag to track server failure
 
-    def __init__(self, host: str = "localhost", port: int = 8765, auto_start: bool = True):
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 8765,
+        auto_start: bool = True,
+        silent: bool = False,
+        transport: Optional[str] = None,
+        client_id: Optional[str] = None,
+    ):
         self.host = host
         self.port = port
         self.sock = None
-        self.server_manager = ServerManager(host, port)
+        self.silent = silent
+        # Quotas of the bridge apply per client id, by default every connection of this process shares one
+        self.client_id = client_id or f"pid-{os.getpid()}"
+        self.codec = JSON_CODEC
+        self._buffer = bytearray(RECEIVE_BUFFER_SIZE)
+        self.server_manager = ServerManager(host, port, silent=silent, transport=transport)
         self.auto_start = auto_start
 
+    def _print(self, ptype: str, text: str) -> None:
+        if not self.silent:
+            custom_print(ptype, text)
+
     def _connect(self) -> bool:
         """Internal method to establish connection."""
+        address = self.server_manager.address()
         try:
-            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.sock.connect((self.host, self.port))
-            return True
+            if address["transport"] == TRANSPORT_UNIX:
+                self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self.sock.connect(address["path"])
+            else:
+                self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                self.sock.connect((address["host"], address["port"]))
+            self.codec = JSON_CODEC
+            self._negotiate_format()
+            return self.sock is not None
 
-        except ConnectionRefusedError as e:
+        except (ConnectionRefusedError, FileNotFoundError) as e:
             self.sock = None
-            custom_print("error", f"Connection refused: {e}")
+            self._print("error", f"Connection refused: {e}")
             if self.auto_start:
-                custom_print("error", "Failed to connect to MCP server even after starting it")
+                self._print("error", "Failed to connect to MCP server even after starting it")
             else:
-                custom_print("error", "MCP Server is not running.")
+                self._print("error", "MCP Server is not running.")
             return False
         except Exception as e:
             self.sock = None
-            custom_print("error", f"Error during connection attempt: {e}")
+            self._print("error", f"Error during connection attempt: {e}")
             return False
 
     def _handle_response(self, response: Dict[str, Any]) -> Any:
@@ -52,63 +90,140 @@ class MCPClient:
             raise MCPClientError(error)
         return response.get("result")
 
-    def _send_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
-        """Send a request to the server and receive the response."""
-        try:
-            data = json.dumps(request).encode()
-            self.sock.sendall(len(data).to_bytes(4, "big"))
-            self.sock.sendall(data)
+    def _negotiate_format(self) -> None:
+        """Offer the binary formats available here, servers that do not know "hello" keep talking JSON."""
+        formats = supported_formats()
+        if formats == [FORMAT_JSON]:
+            return
+        response = self._send_request({"command": "hello", "formats": formats})
+        if response.get("status") == "success" and response.get("format") in CODECS:
+            self.codec = CODECS[response["format"]]
 
-            length_bytes = self.sock.recv(4)
-            if not length_bytes:
+    def _recv_exactly(self, size: int) -> memoryview:
+        """Receive exactly size bytes into the reusable buffer, the view is valid until the next receive."""
+        if len(self._buffer) < size:
+            self._buffer = bytearray(max(size, 2 * len(self._buffer)))
+        view = memoryview(self._buffer)[:size]
+        received = 0
+        while received < size:
+            count = self.sock.recv_into(view[received:], size - received)
+            if not count:
                 raise ConnectionError("Connection closed by server")
+            received += count
+        return view
 
-            msg_length = int.from_bytes(length_bytes, "big")
-
-            chunks = []
-            bytes_received = 0
-            while bytes_received < msg_length:
-                chunk = self.sock.recv(min(msg_length - bytes_received, 4096))
-                if not chunk:
-                    raise ConnectionError("Connection closed by server")
-                chunks.append(chunk)
-                bytes_received += len(chunk)
-
-            response_data = b"".join(chunks)
-            if response_data:
-                try:
-                    return json.loads(response_data.decode())
-                except json.JSONDecodeError as e:
-                    custom_print("error", f"Failed to decode JSON response: {e}")
-                    return {"status": "error", "error": {"type": "JSON_DECODE_ERROR", "message": str(e)}}
-            else:
-                return {
-                    "status": "error",
-                    "error": {"type": "EMPTY_RESPONSE", "message": "Empty response received from server"},
-                }
+    def _receive_message(self) -> Dict[str, Any]:
+        """Receive a single length-prefixed message and decode it straight from the receive buffer."""
+        msg_length = int.from_bytes(self._recv_exactly(HEADER_SIZE), "big")
+        if not msg_length:
+            return {
+                "status": "error",
+                "error": {"type": "EMPTY_RESPONSE", "message": "Empty response received from server"},
+            }
+
+        try:
+            return self.codec.loads(self._recv_exactly(msg_length))
+        except ValueError as e:
+            self._print("error", f"Failed to decode {self.codec.name} response: {e}")
+            return {"status": "error", "error": {"type": "DECODE_ERROR", "message": str(e)}}
+        finally:
+            # Do not keep the memory of an exceptionally large message around
+            if len(self._buffer) > MAX_RETAINED_BUFFER:
+                self._buffer = bytearray(RECEIVE_BUFFER_SIZE)
+
+    def _send_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Send a request to the server and receive the response."""
+        try:
+            self.sock.sendall(self.codec.frame(request))
+            return self._receive_message()
         except (ConnectionError, socket.error, Exception) as e:
-            custom_print("error", f"Communication error: {str(e)}")
+            self._print("error", f"Communication error: {str(e)}")
             self.close()
             return {"status": "error", "error": {"type": "CONNECTION_ERROR", "message": str(e)}}
 
-    def call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
-        """Call a tool on the server."""
-        request = {"command": "call_tool", "tool_name": tool_name, "arguments": arguments}
+    def _receive_stream(self) -> Iterator[str]:
+        """Yield the chunk frames of a streamed result until its end frame."""
+        while True:
+            try:
+                message = self._receive_message()
+            except (ConnectionError, socket.error) as e:
+                self.close()
+                raise MCPClientError(MCPError("CONNECTION_ERROR", f"Result stream interrupted: {e}"))
+            if message.get("end"):
+                return
+            if "chunk" not in message:
+                self.close()
+                raise MCPClientError(MCPError.from_dict(message.get("error") or {"message": "Malformed stream"}))
+            yield message["chunk"]
+
+    @staticmethod
+    def _join_stream(chunks: Iterable[str], limit: int = MAX_RESULT_CHARS) -> str:
+        """Join result chunks up to limit characters, the rest is still read from the connection but discarded."""
+        parts: List[str] = []
+        kept = total = 0
+        for chunk in chunks:
+            total += len(chunk)
+            if kept < limit:
+                parts.append(chunk[: limit - kept])
+                kept += len(parts[-1])
+        if total > limit:
+            parts.append(f"\n\n[Result truncated: showing {limit} of {total} characters]")
+        return "".join(parts)
+
+    def stream_tool(self, tool_name: str, arguments: Dict[str, Any], retries: int = 2) -> Iterator[str]:
+        """
+        Call a tool and yield its result in chunks as they arrive, large results are never held in one buffer.
+        The call is sent again when the bridge is too busy to accept it.
+        """
+        request = {
+            "command": "call_tool",
+            "tool_name": tool_name,
+            "arguments": arguments,
+            "client_id": self.client_id,
+            "stream": True,
+        }
+
+        while True:
+            response = self._send_request(request)
+            if response.get("stream"):
+                yield from self._receive_stream()
+                return
+            try:
+                result = self._handle_response(response)
+            except MCPClientError as e:
+                if not e.retryable or retries <= 0:
+                    raise
+                retries -= 1
+                time.sleep(e.error.details.get("retry_after", 1))
+                continue
+            yield "" if result is None else str(result)
+            return
+
+    def call_tool(self, tool_name: str, arguments: Dict[str, Any], retries: int = 2) -> Any:
+        """Call a tool on the server, sending it again when the bridge is too busy to accept it."""
+        return self._join_stream(self.stream_tool(tool_name, arguments, retries=retries))
+
+    def stats(self) -> Dict[str, Any]:
+        """Get queue depths and per-client load of the bridge."""
+        response = self._send_request({"command": "stats"})
+        self._handle_response(response)
+        return response.get("stats", {})
 
+    def fetch_tools(self) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Get the available tools together with the servers that failed to initialize."""
+        request = {"command": "get_tools"}
         response = self._send_request(request)
-        return self._handle_response(response)
+        return response.get("tools", []), response.get("initialization_errors") or []
 
     def get_available_tools(self) -> List[Dict[str, Any]]:
         """Get list of available tools from the server."""
-        request = {"command": "get_tools"}
-        response = self._send_request(request)
+        tools, initialization_errors = self.fetch_tools()
 
         # Check for initialization errors
-        if response.get("initialization_errors"):
-            for error in response["initialization_errors"]:
-                custom_print("error", f"Server '{error['server']}' failed to initialize: {error['error']}")
+        for error in initialization_errors:
+            custom_print("error", f"Server '{error['server']}' failed to initialize: {error['error']}")
 
-        return response.get("tools", [])
+        return tools
 
     def start_server(self) -> Tuple[bool, str]:
         """Start the server if it's not running."""
@@ -142,7 +257,7 @@ class MCPClient:
             if not self.server_manager.is_server_running():
                 success, message = self.server_manager.start_server()
                 if not success:
-                    custom_print("error", f"Failed to start MCP server: {message}")
+                    self._print("error", f"Failed to start MCP server: {message}")
                     MCPClient._server_failed = True
                     self.close()
                     return None
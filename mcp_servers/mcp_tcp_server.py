@@ -1,6 +1,9 @@
 # More about Model Context Protocol (MCP) and how to create custom MCP servers at https://modelcontextprotocol.io/introduction
 
+import argparse
 import asyncio
+import hashlib
+import itertools
 import json
 import logging
 import os
@@ -8,12 +11,21 @@ import shutil
 import signal
 import subprocess
 import sys
-from typing import Any, Dict, List, Optional, Tuple
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
 
+import anyio
 from mcp import ClientSession, StdioServerParameters, Tool, types
 from mcp.client.stdio import stdio_client
-from mcp_errors import (CommandNotFoundError, ConfigError, MCPError,
-                        ServerInitError, ToolExecutionError)
+from mcp.shared.exceptions import McpError
+from mcp_errors import (BridgeBusyError, CommandNotFoundError, ConfigError,
+                        MCPError, ServerInitError, ToolExecutionError)
+from request_scheduler import RETRY_AFTER, ServerQueue
+from result_cache import ResultCache
+from server_registry import (TRANSPORT_TCP, TRANSPORT_UNIX, acquire_pidfile,
+                             clear_ready, mark_ready)
+from wire_format import JSON_CODEC, Codec, choose_codec
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -47,46 +59,162 @@ if not os.path.exists(MCP_PATH):
         logger.error('"mcp_config.json.sample" is either missing or renamed, please update from source.')
         exit(1)
 
+# Seconds without calls after which a server process is stopped (0 keeps it resident), overridable per server
+DEFAULT_IDLE_TIMEOUT = 600
+# Per server limits of parallel tool calls and of calls waiting for a slot, overridable per server
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_MAX_QUEUE = 16
+# Calls a single client may have queued or running at once, overridable with "bridge": {"clientQuota": ...}
+DEFAULT_CLIENT_QUOTA = 8
+# Tool output above this size is truncated before it reaches the conversation (0 disables), overridable per server
+DEFAULT_MAX_RESULT_BYTES = 128 * 1024
+# Results longer than this are sent as a stream of chunk frames to clients that accept it
+STREAM_CHUNK_CHARS = 64 * 1024
+# Full results of truncated calls are saved here for servers with "spillResults": true
+SPILL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tool_results")
+SPILL_RETENTION = 24 * 60 * 60
+# Exponential backoff between restarts of a server that crashed or failed to start
+RESTART_BACKOFF_BASE = 1.0
+RESTART_BACKOFF_MAX = 60.0
+
+# Tool schemas discovered on previous runs, so the bridge can serve them without spawning every server
+TOOL_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tool_cache.json")
+
+
+def server_config_hash(server_config: Dict[str, Any]) -> str:
+    """Hash the parts of a server configuration that can change the tools it exposes."""
+    relevant = {
+        "command": server_config.get("command"),
+        "args": server_config.get("args", []),
+        "env": server_config.get("env", {}),
+    }
+    return hashlib.sha256(json.dumps(relevant, sort_keys=True).encode()).hexdigest()
+
 
 class MCPServer:
+    """
+    A configured MCP server. The subprocess is owned by a dedicated task that enters and exits the stdio
+    and session contexts, so it can be started on demand and stopped from any other task.
+    """
+
     def __init__(self, server_name, server_config):
         self.server_name = server_name
         self.server_config = server_config
-        self.client = None
+        self.config_hash = server_config_hash(server_config)
+        self.idle_timeout = server_config.get("idleTimeout", DEFAULT_IDLE_TIMEOUT)
+        self.max_result_bytes = server_config.get("maxResultBytes", DEFAULT_MAX_RESULT_BYTES)
+        self.spill_results = server_config.get("spillResults", False)
+        self.result_cache = ResultCache(server_config["resultCache"]) if "resultCache" in server_config else None
+        self.queue = ServerQueue(
+            server_name,
+            server_config.get("maxConcurrency", DEFAULT_MAX_CONCURRENCY),
+            server_config.get("maxQueue", DEFAULT_MAX_QUEUE),
+        )
         self.session = None
-        self.tools = {}
-        self.client_entered = False  # Track if client context was entered successfully
+        self.tools: Dict[str, Dict[str, Any]] = {}
+        self.start_lock = asyncio.Lock()  # Parallel callers share a single spawn
+        self.owner_task: Optional[asyncio.Task] = None
+        self.stop_event: Optional[asyncio.Event] = None
+        self.idle_handle: Optional[asyncio.TimerHandle] = None
+        self.pending_users = 0  # Callers waiting for or holding the server
+        self.crash_count = 0
+        self.restart_not_before = 0.0
         self.logger = logging.getLogger(f"{__name__}.MCPServer.{server_name}")
 
+    @property
+    def is_running(self) -> bool:
+        return self.session is not None
+
     async def __aenter__(self):
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         await self.cleanup()
 
-    async def cleanup(self):
-        """Clean up resources associated with the server."""
-        if self.session:
-            try:
-                await self.session.__aexit__(None, None, None)
-            except Exception as e:
-                self.logger.error(f"Error during session cleanup: {e}")
+    async def start(self, server_params: StdioServerParameters) -> List[Tool]:
+        """
+        Spawn the server and wait until its session is initialized.
+
+        Returns:
+            The tools listed by the server
+        """
+        ready = asyncio.get_running_loop().create_future()
+        self.stop_event = asyncio.Event()
+        self.owner_task = asyncio.create_task(self._run(server_params, ready), name=f"mcp-{self.server_name}")
+        try:
+            return await ready
+        except BaseException:
+            await self.cleanup()
+            raise
+
+    async def _run(self, server_params: StdioServerParameters, ready: asyncio.Future) -> None:
+        try:
+            async with stdio_client(server_params) as (read_stream, write_stream):
+                async with ClientSession(read_stream, write_stream) as session:
+                    await session.initialize()
+                    tools_list = await session.list_tools()
+                    self.session = session
+                    if not ready.done():
+                        ready.set_result([tool for tool in tools_list.tools if isinstance(tool, Tool)])
+                    await self.stop_event.wait()
+        except asyncio.CancelledError:
+            if not ready.done():
+                ready.cancel()
+            raise
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                self.logger.error(f"Server stopped with an error: {e}")
+        finally:
             self.session = None
-        if self.client and self.client_entered:  # Check if client context was entered
-            try:
-                await self.client.__aexit__(None, None, None)
-            except Exception as e:
-                self.logger.error(f"Error during client cleanup: {e}")
-            self.client = None
+
+    def record_crash(self) -> float:
+        """
+        Count a crash or failed start and compute when the next start is allowed.
+
+        Returns:
+            The backoff delay in seconds
+        """
+        delay = min(RESTART_BACKOFF_BASE * 2**self.crash_count, RESTART_BACKOFF_MAX)
+        self.crash_count += 1
+        self.restart_not_before = time.monotonic() + delay
+        return delay
+
+    def cancel_idle_shutdown(self) -> None:
+        if self.idle_handle is not None:
+            self.idle_handle.cancel()
+            self.idle_handle = None
+
+    async def cleanup(self):
+        """Stop the server process and release its session."""
+        self.cancel_idle_shutdown()
+        task, self.owner_task = self.owner_task, None
+        if task is None:
+            return
+        self.stop_event.set()
+        done, _ = await asyncio.wait({task}, timeout=5)
+        if not done:
+            self.logger.warning("Server did not stop in time, cancelling")
+            task.cancel()
+            await asyncio.wait({task})
+        self.session = None
 
 
 class MCPTCPServer:
-    def __init__(self, host: str = "localhost", port: int = 8765):
+    def __init__(self, host: str = "localhost", port: int = 8765, unix_path: Optional[str] = None):
         self.host = host
         self.port = port
+        self.unix_path = unix_path  # Listen on a Unix domain socket instead of TCP when set
         self.servers: Dict[str, MCPServer] = {}
         self.initialization_timeout = 30  # 30 seconds timeout for tool initialization
         self.server_processes: Dict[str, subprocess.Popen] = {}
+        self.tool_cache: Dict[str, Dict[str, Any]] = {}
+        self.revalidation_task: Optional[asyncio.Task] = None
+        self.background_tasks: set = set()
+        self.client_quota = DEFAULT_CLIENT_QUOTA
+        self.client_load: Dict[str, int] = {}  # Calls queued or running per client
+        self.connection_count = 0
         self.logger = logging.getLogger(f"{__name__}.MCPTCPServer")
 
     @staticmethod
@@ -135,6 +263,76 @@ class MCPTCPServer:
                             MCP_PATH,
                         )
 
+            # Check idleTimeout field if present
+            if "idleTimeout" in server_config:
+                idle_timeout = server_config["idleTimeout"]
+                if isinstance(idle_timeout, bool) or not isinstance(idle_timeout, (int, float)) or idle_timeout < 0:
+                    raise ConfigError(
+                        f"Field 'idleTimeout' must be a non-negative number in server '{server_name}'", MCP_PATH
+                    )
+
+            if "spillResults" in server_config and not isinstance(server_config["spillResults"], bool):
+                raise ConfigError(f"Field 'spillResults' must be a boolean in server '{server_name}'", MCP_PATH)
+
+            if "resultCache" in server_config:
+                MCPTCPServer.validate_result_cache(server_name, server_config["resultCache"])
+
+            for field, minimum in (("maxConcurrency", 1), ("maxQueue", 0), ("maxResultBytes", 0)):
+                if field in server_config:
+                    value = server_config[field]
+                    if isinstance(value, bool) or not isinstance(value, int) or value < minimum:
+                        raise ConfigError(
+                            f"Field '{field}' must be an integer of at least {minimum} in server '{server_name}'",
+                            MCP_PATH,
+                        )
+
+    @staticmethod
+    def validate_result_cache(server_name: str, settings: Any) -> None:
+        """
+        Validate the "resultCache" object of a server.
+
+        Raises:
+            ConfigError: If the object is invalid
+        """
+
+        def is_number(value: Any, minimum: float) -> bool:
+            return not isinstance(value, bool) and isinstance(value, (int, float)) and value >= minimum
+
+        if not isinstance(settings, dict):
+            raise ConfigError(f"Field 'resultCache' must be a dictionary in server '{server_name}'", MCP_PATH)
+        for field, minimum in (("ttl", 0), ("maxEntries", 1), ("maxBytes", 1)):
+            if field in settings and not is_number(settings[field], minimum):
+                raise ConfigError(
+                    f"Field 'resultCache.{field}' must be a number of at least {minimum} in server '{server_name}'",
+                    MCP_PATH,
+                )
+        tools = settings.get("tools")
+        if tools is None:
+            return
+        valid_list = isinstance(tools, list) and all(isinstance(name, str) for name in tools)
+        valid_dict = isinstance(tools, dict) and all(is_number(ttl, 0) for ttl in tools.values())
+        if not (valid_list or valid_dict):
+            raise ConfigError(
+                f"Field 'resultCache.tools' must be a list of tool names or a mapping of tool names to TTLs "
+                f"in server '{server_name}'",
+                MCP_PATH,
+            )
+
+    @staticmethod
+    def validate_bridge_settings(settings: Dict[str, Any]) -> None:
+        """
+        Validate the optional "bridge" section of the MCP configuration.
+
+        Raises:
+            ConfigError: If the section is invalid
+        """
+        if not isinstance(settings, dict):
+            raise ConfigError("Field 'bridge' must be a dictionary", MCP_PATH)
+        if "clientQuota" in settings:
+            quota = settings["clientQuota"]
+            if isinstance(quota, bool) or not isinstance(quota, int) or quota < 1:
+                raise ConfigError("Field 'clientQuota' in 'bridge' must be a positive integer", MCP_PATH)
+
     @staticmethod
     def tool_to_dict(tool: Tool) -> Dict[str, Any]:
         """Convert a Tool object to a dictionary with the specified schema."""
@@ -211,15 +409,22 @@ class MCPTCPServer:
             raise CommandNotFoundError(command, available_paths=available_paths) from e
 
     @staticmethod
-    def load_config() -> Dict[str, Dict[str, Any]]:
-        """Load and parse the MCP configuration file."""
+    def load_config() -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Any]]:
+        """
+        Load and parse the MCP configuration file.
+
+        Returns:
+            The "mcpServers" section and the optional "bridge" settings
+        """
         try:
             with open(MCP_PATH, "r") as f:
                 config = json.load(f)
                 mcp_servers = config.get("mcpServers", {})
+                bridge_settings = config.get("bridge", {})
                 # Validate the configuration structure
                 MCPTCPServer.validate_config(mcp_servers)
-                return mcp_servers
+                MCPTCPServer.validate_bridge_settings(bridge_settings)
+                return mcp_servers, bridge_settings
         except json.JSONDecodeError as e:
             raise ConfigError(f"Invalid JSON in config file: {str(e)}", MCP_PATH)
         except FileNotFoundError:
@@ -227,11 +432,142 @@ class MCPTCPServer:
         except Exception as e:
             raise ConfigError(f"Error reading config file: {str(e)}", MCP_PATH)
 
-    async def init_server(self, server_name: str, server_config: Dict[str, Any]) -> MCPServer:
+    def load_tool_cache(self) -> None:
+        """Load the tool schemas persisted by previous runs."""
+        try:
+            with open(TOOL_CACHE_PATH, "r") as f:
+                cache = json.load(f)
+            self.tool_cache = cache.get("servers", {}) if isinstance(cache, dict) else {}
+        except FileNotFoundError:
+            self.tool_cache = {}
+        except (json.JSONDecodeError, OSError) as e:
+            self.logger.warning(f"Ignoring unreadable tool cache: {e}")
+            self.tool_cache = {}
+
+    def save_tool_cache(self) -> None:
+        """Persist the discovered tool schemas (write to a temp file, then replace)."""
+        tmp_path = f"{TOOL_CACHE_PATH}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"servers": self.tool_cache}, f)
+            os.replace(tmp_path, TOOL_CACHE_PATH)
+        except OSError as e:
+            self.logger.warning(f"Could not persist tool cache: {e}")
+
+    def cache_server_tools(self, server: MCPServer) -> bool:
+        """
+        Record the tools of a started server in the cache.
+
+        Returns:
+            True if the cached schemas changed
+        """
+        entry = {"hash": server.config_hash, "tools": list(server.tools.values())}
+        if self.tool_cache.get(server.server_name) == entry:
+            return False
+        self.tool_cache[server.server_name] = entry
+        return True
+
+    def cached_tools_for(self, server_name: str, server_config: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """Return the cached tools of a server if they were discovered with the same command, args and env."""
+        entry = self.tool_cache.get(server_name)
+        if not isinstance(entry, dict) or entry.get("hash") != server_config_hash(server_config):
+            return None
+        tools = entry.get("tools")
+        return tools if isinstance(tools, list) else None
+
+    async def ensure_server_started(self, server: MCPServer) -> None:
+        """Start a stopped server, waiting out the restart backoff if it crashed recently. Call with start_lock held."""
+        if server.is_running:
+            return
+        delay = server.restart_not_before - time.monotonic()
+        if delay > 0:
+            self.logger.info(f"Waiting {delay:.1f}s before restarting server: {server.server_name}")
+            await asyncio.sleep(delay)
+        self.logger.info(f"Starting server on demand: {server.server_name}")
+        try:
+            await asyncio.wait_for(self.init_server(server), timeout=self.initialization_timeout)
+        except asyncio.TimeoutError:
+            server.record_crash()
+            raise ServerInitError(
+                f"Server initialization timed out after {self.initialization_timeout} seconds", server.server_name
+            )
+        except (ServerInitError, CommandNotFoundError):
+            server.record_crash()
+            raise
+        if self.cache_server_tools(server):
+            self.save_tool_cache()
+
+    def schedule_idle_shutdown(self, server: MCPServer) -> None:
+        """Stop the server once it has been idle for its idle timeout."""
+        server.cancel_idle_shutdown()
+        if server.idle_timeout and server.is_running:
+            server.idle_handle = asyncio.get_running_loop().call_later(
+                server.idle_timeout, self.spawn_background, self.stop_idle_server, server
+            )
+
+    def spawn_background(self, coro_func, *args) -> None:
+        # The loop only keeps weak references to tasks
+        task = asyncio.create_task(coro_func(*args))
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+
+    async def stop_idle_server(self, server: MCPServer) -> None:
+        async with server.start_lock:
+            if server.pending_users or not server.is_running:
+                return
+            self.logger.info(f"Stopping idle server: {server.server_name}")
+            await server.cleanup()
+
+    @asynccontextmanager
+    async def use_server(self, server: MCPServer) -> AsyncIterator[ClientSession]:
+        """Hold a running server for the duration of a call, starting it if needed."""
+        server.pending_users += 1
+        server.cancel_idle_shutdown()
+        try:
+            async with server.start_lock:
+                await self.ensure_server_started(server)
+            yield server.session
+        finally:
+            server.pending_users -= 1
+            if not server.pending_users:
+                self.schedule_idle_shutdown(server)
+
+    async def handle_server_crash(self, server: MCPServer, error: BaseException) -> None:
+        """Tear down a server whose connection broke; the next call restarts it after a backoff."""
+        async with server.start_lock:
+            delay = server.record_crash()
+            self.logger.error(f"Server {server.server_name} crashed ({error!r}), restart allowed in {delay:.0f}s")
+            await server.cleanup()
+
+    async def revalidate_cached_servers(self) -> None:
+        """
+        Start the servers that were served from the cache one by one and refresh their schemas in the background.
+        Servers nobody asked for in the meantime are stopped again right away.
+        """
+        changed = False
+        for server in list(self.servers.values()):
+            if not isinstance(server, MCPServer) or server.is_running:
+                continue
+            async with server.start_lock:
+                if server.is_running:
+                    continue
+                try:
+                    await self.ensure_server_started(server)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.logger.warning(f"Revalidation of {server.server_name} failed, keeping cached tools: {e}")
+                    continue
+                changed = True
+                if not server.pending_users:
+                    await server.cleanup()
+        if changed:
+            self.logger.info("Cached tool schemas revalidated")
+
+    async def init_server(self, server: MCPServer) -> MCPServer:
         """Initialize a single MCP server."""
-        server = MCPServer(server_name, server_config)
-        read_stream = None  # Initialize to None
-        write_stream = None  # Initialize to None
+        server_name = server.server_name
+        server_config = server.server_config
 
         try:
             command_path = self.get_executable_path(server_config["command"])
@@ -243,15 +579,8 @@ class MCPTCPServer:
 
             server_params = StdioServerParameters(command=command_path, args=server_config.get("args", []), env=env)
 
-            server.client = stdio_client(server_params)
-            read_stream, write_stream = await server.client.__aenter__()
-            server.client_entered = True  # Mark client context as entered
-            server.session = ClientSession(read_stream, write_stream)
-            await server.session.__aenter__()
-            await server.session.initialize()
-
-            tools_list = await server.session.list_tools()
-            server.tools = {tool.name: tool for tool in tools_list.tools if isinstance(tool, Tool)}
+            tools = await server.start(server_params)
+            server.tools = {tool.name: self.tool_to_dict(tool) for tool in tools}
 
             return server
 
@@ -274,13 +603,17 @@ class MCPTCPServer:
                 raise ServerInitError(str(e), server_name)
 
     async def initialize_tools(self) -> Tuple[List[Dict[str, Any]], List[Exception]]:
-        """Initialize all MCP tools asynchronously with timeout."""
+        """
+        Initialize all MCP tools asynchronously with timeout.
+        Servers with cached schemas for the same configuration are not started here.
+        """
         config = {}
         all_tools = []
         initialization_errors = []
 
         try:
-            config = self.load_config()
+            config, bridge_settings = self.load_config()
+            self.client_quota = bridge_settings.get("clientQuota", DEFAULT_CLIENT_QUOTA)
         except ConfigError as e:
             initialization_errors.append(e)
             await self.cleanup()
@@ -290,15 +623,25 @@ class MCPTCPServer:
             await self.cleanup()
             return [], initialization_errors
 
+        self.load_tool_cache()
+
         async def init_with_timeout(server_name: str, server_config: Dict[str, Any]):
+            server = MCPServer(server_name, server_config)
+            cached_tools = self.cached_tools_for(server_name, server_config)
+            if cached_tools is not None:
+                server.tools = {tool["name"]: tool for tool in cached_tools}
+                self.servers[server_name] = server
+                self.logger.info(f"Serving cached tools for server: {server_name}")
+                return cached_tools
+
             self.logger.info(f"Initializing server: {server_name}")
             try:
-                server = await asyncio.wait_for(
-                    self.init_server(server_name, server_config), timeout=self.initialization_timeout
-                )
+                await asyncio.wait_for(self.init_server(server), timeout=self.initialization_timeout)
                 self.servers[server_name] = server
+                self.cache_server_tools(server)
+                self.schedule_idle_shutdown(server)
                 self.logger.info(f"Server {server_name} initialized successfully")
-                return [self.tool_to_dict(tool) for tool in server.tools.values()]
+                return list(server.tools.values())
             except asyncio.TimeoutError:
                 error = ServerInitError(
                     f"Server initialization timed out after {self.initialization_timeout} seconds", server_name
@@ -341,10 +684,208 @@ class MCPTCPServer:
             if isinstance(item, Exception):
                 initialization_errors.append(item)
 
+        # Drop schemas of servers that were removed from the configuration
+        for server_name in list(self.tool_cache):
+            if server_name not in config:
+                del self.tool_cache[server_name]
+        self.save_tool_cache()
+
         return all_tools, initialization_errors
 
+    async def call_tool(self, tool_name: str, arguments: Dict[str, Any], client_id: str) -> str:
+        """Run a tool call once the client is within its quota and the server has a free slot."""
+        # Find server for tool
+        server = next(
+            (s for s in self.servers.values() if isinstance(s, MCPServer) and tool_name in s.tools),
+            None,
+        )
+        if not server:
+            raise ToolExecutionError(f"Tool not found", tool_name, arguments)
+
+        # Repeated idempotent calls are answered without a queue slot
+        cache = server.result_cache if server.result_cache and server.result_cache.ttl_for(tool_name) else None
+        if cache:
+            cached = cache.get(tool_name, arguments)
+            if cached is not None:
+                return cached
+
+        if self.client_load.get(client_id, 0) >= self.client_quota:
+            raise BridgeBusyError(
+                "CLIENT_QUOTA_EXCEEDED",
+                f"Client has {self.client_quota} calls in progress, try again later",
+                retry_after=RETRY_AFTER,
+                client_id=client_id,
+            )
+
+        self.client_load[client_id] = self.client_load.get(client_id, 0) + 1
+        try:
+            await server.queue.acquire(client_id)
+            try:
+                async with self.use_server(server) as session:
+                    try:
+                        result = await session.call_tool(tool_name, arguments)
+                    except (anyio.ClosedResourceError, anyio.BrokenResourceError, McpError) as e:
+                        if isinstance(e, McpError) and e.error.code != types.CONNECTION_CLOSED:
+                            raise
+                        await self.handle_server_crash(server, e)
+                        raise ServerInitError(
+                            "Server process exited during the call, it will be restarted", server.server_name
+                        )
+                    server.crash_count = 0
+            finally:
+                server.queue.release()
+        finally:
+            self.client_load[client_id] -= 1
+            if not self.client_load[client_id]:
+                del self.client_load[client_id]
+
+        output = ""
+        if result.structuredContent:
+            output = json.dumps(result.structuredContent)
+        elif result.content:
+            output = "".join(item.text for item in result.content if isinstance(item, types.TextContent))
+        output = await self.limit_result(server, tool_name, output)
+        if cache and not result.isError:
+            cache.put(tool_name, arguments, output)
+        return output
+
+    async def limit_result(self, server: MCPServer, tool_name: str, output: str) -> str:
+        """Truncate output above the size limit of the server, optionally saving the full result to a file."""
+        limit = server.max_result_bytes
+        if not limit or len(output) <= limit // 4:  # Cannot exceed the limit even with 4-byte characters
+            return output
+        encoded = output.encode()
+        if len(encoded) <= limit:
+            return output
+
+        marker = f"\n\n[Result truncated: showing {limit} of {len(encoded)} bytes"
+        if server.spill_results:
+            try:
+                path = await asyncio.to_thread(self.spill_result, tool_name, encoded)
+                marker += f", full result saved to {path}"
+            except OSError as e:
+                self.logger.error(f"Could not save the full result of {tool_name}: {e}")
+        self.logger.info(f"Truncated the {len(encoded)} bytes result of {tool_name}")
+        return encoded[:limit].decode(errors="ignore") + marker + "]"
+
+    @staticmethod
+    def spill_result(tool_name: str, encoded: bytes) -> str:
+        """Write a full tool result to the spill directory, dropping files older than the retention period."""
+        os.makedirs(SPILL_DIR, exist_ok=True)
+        expired = time.time() - SPILL_RETENTION
+        for entry in os.scandir(SPILL_DIR):
+            if entry.is_file() and entry.stat().st_mtime < expired:
+                os.remove(entry.path)
+        digest = hashlib.sha256(encoded).hexdigest()[:12]
+        safe_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in tool_name)
+        path = os.path.join(SPILL_DIR, f"{safe_name}-{time.strftime('%Y%m%d-%H%M%S')}-{digest}.txt")
+        with open(path, "wb") as f:
+            f.write(encoded)
+        return path
+
+    @staticmethod
+    def response_frames(response: Dict[str, Any], stream: bool, codec: Codec = JSON_CODEC) -> Iterator[bytes]:
+        """
+        Encode a response into frames. Long results for clients that accept streams are split into
+        a header, chunk frames and an end frame, so neither side handles them as one huge message.
+        """
+        result = response.get("result")
+        if not stream or not isinstance(result, str) or len(result) <= STREAM_CHUNK_CHARS:
+            messages = [response]
+        else:
+            header = {key: value for key, value in response.items() if key != "result"}
+            messages = itertools.chain(
+                [{**header, "stream": True}],
+                ({"chunk": result[i : i + STREAM_CHUNK_CHARS]} for i in range(0, len(result), STREAM_CHUNK_CHARS)),
+                [{"end": True}],
+            )
+        for message in messages:
+            yield codec.frame(message)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depths and load of the bridge, served by the "stats" command."""
+        servers = {}
+        for server_name, server in self.servers.items():
+            if isinstance(server, MCPServer):
+                servers[server_name] = {"running": server.is_running, **server.queue.stats()}
+                if server.result_cache:
+                    servers[server_name]["result_cache"] = server.result_cache.stats()
+        return {
+            "servers": servers,
+            "clients": dict(self.client_load),
+            "client_quota": self.client_quota,
+            "connections": self.connection_count,
+        }
+
+    async def process_request(self, request: Dict[str, Any], client_id: str) -> Dict[str, Any]:
+        """Execute a single request and build its response."""
+        command = request.get("command")
+        response = {"status": "error", "error": MCPError("INVALID_COMMAND", "Invalid command").to_dict()}
+
+        try:
+            if command == "call_tool":
+                output = await self.call_tool(request["tool_name"], request["arguments"], client_id)
+                response = {"status": "success", "result": output}
+
+            elif command == "get_tools":
+                tools = []
+                initialization_errors = []
+                for server_name, server in self.servers.items():
+                    if isinstance(server, MCPServer):
+                        tools.extend(server.tools.values())
+                    elif isinstance(server, Exception):
+                        initialization_errors.append(
+                            {
+                                "server": server_name,
+                                "error": server.to_dict() if hasattr(server, "to_dict") else str(server),
+                            }
+                        )
+
+                response = {
+                    "status": "success",
+                    "tools": tools,
+                    "initialization_errors": initialization_errors if initialization_errors else None,
+                }
+
+            elif command == "stats":
+                response = {"status": "success", "stats": self.stats()}
+
+        except Exception as e:
+            if isinstance(e, MCPError):
+                response = {"status": "error", "error": e.to_dict()}
+            else:
+                response = {"status": "error", "error": MCPError("UNKNOWN_ERROR", str(e)).to_dict()}
+
+        # Let clients with several requests in flight match the responses
+        if "id" in request:
+            response["id"] = request["id"]
+        return response
+
     async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
-        """Handle individual TCP client connections."""
+        """
+        Handle individual client connections. Requests are processed concurrently and answered as they complete,
+        clients that send several requests at once tag them with an "id".
+        A "hello" request as the very first message switches the connection to the best format both sides support.
+        """
+        self.connection_count += 1
+        connection_id = f"connection-{id(writer):x}"
+        write_lock = asyncio.Lock()
+        in_flight: set = set()
+        codec = JSON_CODEC
+        first_message = True
+
+        async def respond(request: Dict[str, Any], codec: Codec) -> None:
+            response = await self.process_request(request, request.get("client_id") or connection_id)
+            frames = self.response_frames(response, stream=bool(request.get("stream")), codec=codec)
+            # Frames of one response are never interleaved with other responses
+            async with write_lock:
+                try:
+                    for frame in frames:
+                        writer.write(frame)
+                        await writer.drain()  # Make sure data is sent before continuing
+                except ConnectionError as e:
+                    self.logger.warning(f"Client went away before its response was sent: {e}")
+
         try:
             while True:
                 try:
@@ -358,75 +899,41 @@ class MCPTCPServer:
                 except asyncio.IncompleteReadError:
                     break
 
-                request = json.loads(data.decode())
-                command = request.get("command")
-                response = {"status": "error", "error": MCPError("INVALID_COMMAND", "Invalid command").to_dict()}
-
-                try:
-                    if command == "call_tool":
-                        tool_name = request["tool_name"]
-                        arguments = request["arguments"]
-
-                        # Find server for tool
-                        server = next(
-                            (s for s in self.servers.values() if isinstance(s, MCPServer) and tool_name in s.tools),
-                            None,
-                        )
-
-                        if not server:
-                            raise ToolExecutionError(f"Tool not found", tool_name, arguments)
-
-                        else:
-                            result = await server.session.call_tool(tool_name, arguments)
-                            output = ""
-                            if result.structuredContent:
-                                output = json.dumps(result.structuredContent)
-                            elif result.content:
-                                for content_item in result.content:
-                                    if isinstance(content_item, types.TextContent):
-                                        output += content_item.text
-                            response = {"status": "success", "result": output}
-
-                    elif command == "get_tools":
-                        tools = []
-                        initialization_errors = []
-                        for server_name, server in self.servers.items():
-                            if isinstance(server, MCPServer):
-                                tools.extend(self.tool_to_dict(tool) for tool in server.tools.values())
-                            elif isinstance(server, Exception):
-                                initialization_errors.append(
-                                    {
-                                        "server": server_name,
-                                        "error": server.to_dict() if hasattr(server, "to_dict") else str(server),
-                                    }
-                                )
-
-                        response = {
-                            "status": "success",
-                            "tools": tools,
-                            "initialization_errors": initialization_errors if initialization_errors else None,
-                        }
-
-                except Exception as e:
-                    if isinstance(e, (ConfigError, ServerInitError, ToolExecutionError, CommandNotFoundError)):
-                        response = {"status": "error", "error": e.to_dict()}
-                    else:
-                        response = {"status": "error", "error": MCPError("UNKNOWN_ERROR", str(e)).to_dict()}
-
-                # Ensure response is sent and connection is drained
-                response_data = json.dumps(response).encode()
-                writer.write(len(response_data).to_bytes(4, "big"))
-                writer.write(response_data)
-                await writer.drain()  # Make sure data is sent before continuing
+                request = codec.loads(data)
+                if first_message and request.get("command") == "hello":
+                    chosen = choose_codec(request.get("formats", []))
+                    # The answer is still in JSON, everything after it uses the chosen format
+                    writer.write(JSON_CODEC.frame({"status": "success", "format": chosen.name}))
+                    await writer.drain()
+                    codec = chosen
+                    first_message = False
+                    continue
+                first_message = False
+
+                task = asyncio.create_task(respond(request, codec))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
 
         except Exception as e:
             self.logger.error(f"Error handling client: {e}")
         finally:
+            # Nobody is left to read the answers, free the queue slots
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+            self.connection_count -= 1
             writer.close()
-            await writer.wait_closed()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
 
     async def cleanup(self):
         """Cleanup all MCP sessions and connections."""
+        if self.revalidation_task and not self.revalidation_task.done():
+            self.revalidation_task.cancel()
+        for task in list(self.background_tasks):
+            task.cancel()
         cleanup_tasks = [
             asyncio.wait_for(server.cleanup(), timeout=5)
             for server in self.servers.values()
@@ -439,6 +946,12 @@ class MCPTCPServer:
 
         self.servers.clear()
 
+        if self.unix_path and os.path.exists(self.unix_path):
+            try:
+                os.remove(self.unix_path)
+            except OSError as e:
+                self.logger.warning(f"Could not remove socket {self.unix_path}: {e}")
+
         # Terminate server processes
         for server_name, process in self.server_processes.items():
             if process.poll() is None:  # Check if process is still running
@@ -455,6 +968,22 @@ class MCPTCPServer:
                     process.kill()
         self.server_processes.clear()
 
+    async def start_unix_server(self) -> asyncio.AbstractServer:
+        """
+        Listen on the Unix domain socket. Access is limited to the current user by the socket mode
+        (and by the private directory it is created in).
+        """
+        # Holding the pidfile lock means a socket left at this path belongs to a dead bridge
+        if os.path.exists(self.unix_path):
+            os.remove(self.unix_path)
+        old_umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(self.handle_client, path=self.unix_path)
+        finally:
+            os.umask(old_umask)
+        os.chmod(self.unix_path, 0o600)
+        return server
+
     async def start(self):
         """Start the TCP server and initialize MCP tools."""
         try:
@@ -467,8 +996,13 @@ class MCPTCPServer:
                 self.logger.error(f"Failed to start server: {config_error}")
                 exit(1)
 
-            # Start TCP server even if some tools failed to initialize
-            server = await asyncio.start_server(self.handle_client, self.host, self.port)
+            # Start the server even if some tools failed to initialize
+            if self.unix_path:
+                server = await self.start_unix_server()
+                address = {"transport": TRANSPORT_UNIX, "path": self.unix_path}
+            else:
+                server = await asyncio.start_server(self.handle_client, self.host, self.port)
+                address = {"transport": TRANSPORT_TCP, "host": self.host, "port": self.port}
 
             # Print information about successful tool initialization
             if tools:
@@ -483,8 +1017,12 @@ class MCPTCPServer:
                     if isinstance(error, Exception):
                         self.logger.warning(f"  - {error}")
 
+            # Servers answered from the cache are started and their schemas refreshed in the background
+            self.revalidation_task = asyncio.create_task(self.revalidate_cached_servers())
+
             async with server:
-                self.logger.info(f"Server running on {self.host}:{self.port}")
+                self.logger.info(f"Server running on {self.unix_path or f'{self.host}:{self.port}'}")
+                mark_ready(address)
                 await server.serve_forever()
 
         except Exception as e:
@@ -494,13 +1032,29 @@ class MCPTCPServer:
 
 
 if __name__ == "__main__":
-    server = MCPTCPServer()
+    parser = argparse.ArgumentParser(description="Bridge between console-gpt and the MCP servers in mcp_config.json")
+    parser.add_argument("--unix", metavar="PATH", help="Listen on a Unix domain socket instead of TCP")
+    parser.add_argument("--host", default="localhost", help="TCP host (default: localhost)")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port (default: 8765)")
+    cli_args = parser.parse_args()
+
+    pidfile_fd = acquire_pidfile()  # Held open until the process exits
+    if pidfile_fd is None:
+        logger.error("Another MCP server instance is already running")
+        exit(1)
+
+    server = MCPTCPServer(cli_args.host, cli_args.port, unix_path=cli_args.unix)
 
     async def main():
+        if os.name != "nt":
+            # Let ServerManager.stop_server() shut the MCP servers down instead of orphaning them
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
         try:
             await server.start()
-        except KeyboardInterrupt:
+        except (KeyboardInterrupt, asyncio.CancelledError):
             logger.info("\nShutting down server...")
             await server.cleanup()
+        finally:
+            clear_ready()
 
     asyncio.run(main())
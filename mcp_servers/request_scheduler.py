@@ -0,0 +1,90 @@
+"""
+Admission control and fair scheduling of tool calls inside the MCP bridge.
+
+Every MCP server gets a queue with a concurrency limit. When a slot frees up it is handed to the next client in
+round-robin order rather than to the oldest request, so one client flooding a server cannot starve the others.
+"""
+
+import asyncio
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict
+
+from mcp_errors import BridgeBusyError
+
+# Suggested delay in seconds returned with the retryable errors
+RETRY_AFTER = 1.0
+
+
+class ServerQueue:
+    def __init__(self, server_name: str, max_concurrency: int, max_queue: int):
+        self.server_name = server_name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.active = 0
+        self.queued = 0
+        self.completed = 0
+        self.rejected = 0
+        # client id -> waiting requests of that client, the order of the keys is the round-robin order
+        self.waiters: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+
+    async def acquire(self, client_id: str) -> None:
+        """Wait for an execution slot, or fail right away if the queue is full."""
+        if self.active < self.max_concurrency and not self.queued:
+            self.active += 1
+            return
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise BridgeBusyError(
+                "SERVER_BUSY",
+                f"Server '{self.server_name}' has {self.queued} queued calls, try again later",
+                retry_after=RETRY_AFTER,
+                server_name=self.server_name,
+            )
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.setdefault(client_id, deque()).append(waiter)
+        self.queued += 1
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was already handed over, pass it on
+                self.release()
+            else:
+                self._discard(client_id, waiter)
+            raise
+
+    def release(self) -> None:
+        """Hand the slot to the next client in turn, or free it."""
+        self.completed += 1
+        while self.waiters:
+            client_id, client_waiters = next(iter(self.waiters.items()))
+            waiter = client_waiters.popleft()
+            if client_waiters:
+                self.waiters.move_to_end(client_id)
+            else:
+                del self.waiters[client_id]
+            self.queued -= 1
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def _discard(self, client_id: str, waiter: asyncio.Future) -> None:
+        client_waiters = self.waiters.get(client_id)
+        if client_waiters and waiter in client_waiters:
+            client_waiters.remove(waiter)
+            self.queued -= 1
+            if not client_waiters:
+                del self.waiters[client_id]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "queued_by_client": {client_id: len(waiters) for client_id, waiters in self.waiters.items()},
+        }
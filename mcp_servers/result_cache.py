@@ -0,0 +1,96 @@
+"""
+Opt-in cache of tool results inside the MCP bridge, for tools that are safe to answer from memory
+(reading a file, running a search) when the model repeats a call with identical arguments.
+"""
+
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_TTL = 300
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+
+
+def cache_key(tool_name: str, arguments: Dict[str, Any]) -> str:
+    """Tool name plus the canonical JSON of the arguments, so key order and spacing do not matter."""
+    return tool_name + "\0" + json.dumps(arguments, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+class ResultCache:
+    """
+    LRU cache with per-entry expiry, bounded by entry count and total size.
+
+    Args:
+        settings: the "resultCache" object of a server in mcp_config.json:
+            {"ttl": seconds, "maxEntries": n, "maxBytes": n, "tools": ["name", ...] or {"name": ttl, ...}}
+            Without "tools" every tool of the server is cached.
+    """
+
+    def __init__(self, settings: Dict[str, Any]):
+        self.ttl = settings.get("ttl", DEFAULT_TTL)
+        self.max_entries = settings.get("maxEntries", DEFAULT_MAX_ENTRIES)
+        self.max_bytes = settings.get("maxBytes", DEFAULT_MAX_BYTES)
+        tools = settings.get("tools")
+        if isinstance(tools, list):
+            tools = {name: self.ttl for name in tools}
+        self.tool_ttls: Optional[Dict[str, float]] = tools
+        # key -> (expiry, size, result)
+        self.entries: "OrderedDict[str, Tuple[float, int, str]]" = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def ttl_for(self, tool_name: str) -> Optional[float]:
+        """TTL of the tool, or None if its results are not cached."""
+        if self.tool_ttls is None:
+            return self.ttl
+        return self.tool_ttls.get(tool_name)
+
+    def get(self, tool_name: str, arguments: Dict[str, Any]) -> Optional[str]:
+        key = cache_key(tool_name, arguments)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expiry, size, result = entry
+        if expiry <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, tool_name: str, arguments: Dict[str, Any], result: str) -> None:
+        ttl = self.ttl_for(tool_name)
+        if not ttl:
+            return
+        size = len(result.encode())
+        if size > self.max_bytes:
+            return
+        key = cache_key(tool_name, arguments)
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = (time.monotonic() + ttl, size, result)
+        self.total_bytes += size
+        while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self.entries.pop(key)
+        self.total_bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
@@ -1,54 +1,79 @@
 import os
+import select
 import signal
-import socket
 import subprocess
 import sys
 import time
-from typing import Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 import psutil
 
 from console_gpt.custom_stdout import custom_print
 
+from .server_registry import (READY_FD_ENV, READY_MESSAGE, TRANSPORT_TCP,
+                              TRANSPORT_UNIX, default_transport,
+                              default_unix_socket_path, read_ready,
+                              running_server_pid)
+
 
 class ServerManager:
-    def __init__(self, host: str = "localhost", port: int = 8765):
+    def __init__(
+        self, host: str = "localhost", port: int = 8765, silent: bool = False, transport: Optional[str] = None
+    ):
         self.host = host
         self.port = port
+        self.silent = silent  # Used when bootstrapping in the background to keep the menus clean
+        self.transport = transport or default_transport()
         self.server_process: Optional[subprocess.Popen] = None
         self.server_script = os.path.join(os.path.dirname(__file__), "mcp_tcp_server.py")
 
-    def is_port_open(self) -> bool:
-        """Check if the server port is open."""
-        try:
-            with socket.create_connection((self.host, self.port), timeout=1):
-                return True
-        except (ConnectionRefusedError, socket.timeout, OSError):
-            return False
+    def _print(self, ptype: str, text: str) -> None:
+        if not self.silent:
+            custom_print(ptype, text)
+
+    def address(self) -> Dict[str, Any]:
+        """
+        Address to connect to: the one published by the running server,
+        otherwise the one a server started by this manager would listen on.
+        """
+        ready = read_ready()
+        if ready and ready.get("transport") in (TRANSPORT_UNIX, TRANSPORT_TCP):
+            return ready
+        if self.transport == TRANSPORT_UNIX:
+            return {"transport": TRANSPORT_UNIX, "path": default_unix_socket_path()}
+        return {"transport": TRANSPORT_TCP, "host": self.host, "port": self.port}
+
+    def _server_command(self) -> List[str]:
+        if self.transport == TRANSPORT_UNIX:
+            return [sys.executable, self.server_script, "--unix", default_unix_socket_path()]
+        return [sys.executable, self.server_script, "--host", self.host, "--port", str(self.port)]
 
     def is_process_running(self) -> bool:
         """Check if the server process is running."""
-        return self.find_server_process() is not None
+        return running_server_pid() is not None
 
     def is_server_running(self) -> bool:
-        """Check if the server is fully running by checking both process and port."""
-        return self.is_process_running() and self.is_port_open()
+        """Check if the server is running and has reported that it accepts connections."""
+        pid = running_server_pid()
+        if pid is None:
+            return False
+        ready = read_ready()
+        return bool(ready) and ready.get("pid") == pid
 
     def find_server_process(self) -> Optional[psutil.Process]:
         """Find the server process if it's running"""
-        if self.server_process and self.server_process.poll() is None:
-            return self.server_process
+        pid = running_server_pid()
+        if pid is None:
+            return None
+        try:
+            return psutil.Process(pid)
+        except psutil.NoSuchProcess:
+            return None
 
-        server_name = os.path.basename(self.server_script)
-        for proc in psutil.process_iter(["pid", "name", "cmdline"]):
-            try:
-                if proc.info["cmdline"]:
-                    cmdline = " ".join(proc.info["cmdline"])
-                    if server_name in cmdline and "python" in cmdline.lower():
-                        return proc
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                pass
-        return None
+    def _wait_for_ready(self, ready_fd: int, timeout: float) -> bool:
+        """Block until the server writes to the readiness pipe, closes it by exiting, or the timeout expires."""
+        readable, _, _ = select.select([ready_fd], [], [], timeout)
+        return bool(readable) and os.read(ready_fd, len(READY_MESSAGE)) == READY_MESSAGE
 
     def start_server(self) -> Tuple[bool, str]:
         """Start the server if it's not already running."""
@@ -56,37 +81,46 @@ class ServerManager:
             return True, "Server is already running"
 
         try:
-            custom_print("info", "Starting MCP server...")
+            self._print("info", "Starting MCP server...")
 
             # Start the server as a subprocess
             if os.name == "nt":  # Windows
                 self.server_process = subprocess.Popen(
-                    [sys.executable, self.server_script],
+                    self._server_command(),
                     stdout=subprocess.DEVNULL,
                     stderr=subprocess.DEVNULL,
                     creationflags=subprocess.CREATE_NEW_PROCESS_GROUP,
                 )
-            else:  # Unix-like systems
+                return self._wait_for_ready_file(timeout=60)
+
+            # Unix-like systems: the server reports readiness through an inherited pipe
+            ready_fd, notify_fd = os.pipe()
+            try:
                 self.server_process = subprocess.Popen(
-                    [sys.executable, self.server_script],
+                    self._server_command(),
                     stdout=subprocess.DEVNULL,
                     stderr=subprocess.DEVNULL,
                     start_new_session=True,
+                    pass_fds=(notify_fd,),
+                    env={**os.environ, READY_FD_ENV: str(notify_fd)},
                 )
-
-            start_time = time.time()
-            while time.time() - start_time < 60:
-                time.sleep(0.5)
-                # Check if process has exited
-                if self.server_process.poll() is not None:
-                    # Process has exited
-                    if self.server_process.returncode != 0:
-                        return False, "Server failed to start: Please check your mcp_config.json file"
-                if self.is_port_open():
-                    custom_print("info", "Server is accepting connections.")
-                    return True, "Server process started successfully"
-
-            return False, "Server failed to start: Port did not open within timeout"
+            finally:
+                os.close(notify_fd)
+            try:
+                ready = self._wait_for_ready(ready_fd, timeout=60)
+            finally:
+                os.close(ready_fd)
+
+            if ready:
+                self._print("info", "Server is accepting connections.")
+                return True, "Server process started successfully"
+            if self.server_process.poll() is None:
+                return False, "Server failed to start: Port did not open within timeout"
+            # The server exited without becoming ready, possibly because another instance won the pidfile lock
+            self.server_process.wait()
+            if self.is_server_running():
+                return True, "Server is already running"
+            return False, "Server failed to start: Please check your mcp_config.json file"
 
         except Exception as e:
             if self.server_process:
@@ -96,48 +130,55 @@ class ServerManager:
                     pass
             return False, f"Failed to start server: {str(e)}"
 
+    def _wait_for_ready_file(self, timeout: float) -> Tuple[bool, str]:
+        """Fallback for platforms without inherited pipes: watch for the ready file of the new process."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.server_process.poll() is not None:
+                return False, "Server failed to start: Please check your mcp_config.json file"
+            ready = read_ready()
+            if ready and ready.get("pid") == self.server_process.pid:
+                self._print("info", "Server is accepting connections.")
+                return True, "Server process started successfully"
+            time.sleep(0.1)
+        return False, "Server failed to start: Port did not open within timeout"
+
     def stop_server(self) -> Tuple[bool, str]:
         """Stop the server."""
-        if not self.is_server_running():
+        server_proc = self.find_server_process()
+        if server_proc is None:
             return True, "Server is not running"
 
         try:
-            custom_print("info", "Stopping MCP server...")
-            server_proc = self.find_server_process()
-
-            if server_proc:
-                # Try graceful shutdown first
-                if os.name == "nt":  # Windows
-                    server_proc.send_signal(signal.CTRL_C_EVENT)
-                else:  # Unix-like systems
-                    server_proc.send_signal(signal.SIGTERM)
-
-                # Wait for the process to terminate (max 5 seconds)
-                for _ in range(10):
-                    if not self.is_server_running():
-                        self.server_process = None
-                        custom_print("info", "Server stopped successfully")
-                        return True, "Server stopped successfully"
-                    time.sleep(0.5)
-
-                # If server still running, force kill
-                custom_print("warn", "Server didn't stop gracefully, forcing shutdown...")
-                if os.name == "nt":
-                    server_proc.kill()
-                else:
-                    server_proc.send_signal(signal.SIGKILL)
+            self._print("info", "Stopping MCP server...")
+
+            # Try graceful shutdown first, the server stops its MCP servers on SIGTERM
+            if os.name == "nt":  # Windows
+                server_proc.send_signal(signal.CTRL_C_EVENT)
+            else:  # Unix-like systems
+                server_proc.send_signal(signal.SIGTERM)
 
+            try:
+                server_proc.wait(timeout=10)
                 self.server_process = None
-                for _ in range(10):
-                    if not self.is_port_open():
-                        break
-                    time.sleep(0.5)
-                else:
-                    return False, "Failed to stop server: Port still in use"
+                self._print("info", "Server stopped successfully")
+                return True, "Server stopped successfully"
+            except psutil.TimeoutExpired:
+                pass
+
+            # If server still running, force kill
+            self._print("warn", "Server didn't stop gracefully, forcing shutdown...")
+            server_proc.kill()
+            self.server_process = None
+            try:
+                server_proc.wait(timeout=5)
+            except psutil.TimeoutExpired:
+                return False, "Failed to stop server: Process did not exit"
 
-                return True, "Server force stopped"
-            else:
-                return False, "Could not find server process to stop"
+            return True, "Server force stopped"
 
+        except psutil.NoSuchProcess:
+            self.server_process = None
+            return True, "Server stopped successfully"
         except Exception as e:
             return False, f"Failed to stop server: {str(e)}"
@@ -0,0 +1,204 @@
+"""
+Registry of the running MCP bridge, shared by the server script, the ServerManager and the MCPClient.
+
+The server holds an advisory lock on a pidfile for its whole lifetime, so the lock disappears together with
+the process and a stale pidfile never reports a running server. Without advisory locks (Windows) the recorded
+pid must belong to a live bridge process instead. Once it listens, the server publishes its
+address in a ready file and notifies the process that spawned it through an inherited pipe. Socket, pidfile
+and ready file live in the private runtime dir of the user, named after the installation.
+"""
+
+import hashlib
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Optional
+
+import psutil
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, the pid in the pidfile is checked against the process table
+    fcntl = None
+
+INSTALLATION_DIR = os.path.dirname(os.path.abspath(__file__))
+# Environment variable carrying the write end of the readiness pipe to the server process
+READY_FD_ENV = "MCP_READY_FD"
+SERVER_SCRIPT = "mcp_tcp_server.py"
+READY_MESSAGE = b"ready\n"
+
+TRANSPORT_UNIX = "unix"
+TRANSPORT_TCP = "tcp"
+
+
+def default_transport() -> str:
+    """Unix domain sockets on Linux, TCP everywhere else."""
+    if sys.platform.startswith("linux") and hasattr(socket, "AF_UNIX"):
+        return TRANSPORT_UNIX
+    return TRANSPORT_TCP
+
+
+def user_runtime_dir() -> str:
+    """
+    Return a directory only the current user can access, used for the bridge socket, pidfile and ready file.
+    Prefers $XDG_RUNTIME_DIR and otherwise creates a private directory in the temp dir.
+    """
+    if os.name == "nt":
+        # The temp dir is already per user on Windows
+        path = os.path.join(tempfile.gettempdir(), "console-gpt")
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    xdg_runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if xdg_runtime_dir and os.path.isdir(xdg_runtime_dir):
+        return xdg_runtime_dir
+
+    path = os.path.join(tempfile.gettempdir(), f"console-gpt-{os.getuid()}")
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    stat = os.lstat(path)
+    if stat.st_uid != os.getuid() or stat.st_mode & 0o077:
+        raise PermissionError(
+            f"Refusing to use {path}: it must be a directory owned by the current user with mode 0700"
+        )
+    return path
+
+
+def _runtime_path(suffix: str) -> str:
+    """Path in the user runtime dir keyed by this installation, so bridges of separate checkouts never collide."""
+    installation = hashlib.sha256(INSTALLATION_DIR.encode()).hexdigest()[:12]
+    return os.path.join(user_runtime_dir(), f"console-gpt-mcp-{installation}.{suffix}")
+
+
+def default_unix_socket_path() -> str:
+    """Socket path of this installation."""
+    return _runtime_path("sock")
+
+
+def pid_file_path() -> str:
+    return _runtime_path("pid")
+
+
+def ready_file_path() -> str:
+    return _runtime_path("ready")
+
+
+def acquire_pidfile() -> Optional[int]:
+    """
+    Lock the pidfile and record the current pid. The descriptor must stay open while the server runs.
+
+    Returns:
+        The locked file descriptor, or None if another server holds the lock
+    """
+    fd = os.open(pid_file_path(), os.O_RDWR | os.O_CREAT, 0o600)
+    if fcntl is not None:
+        # Probes from running_server_pid() hold the lock for a moment only
+        for _ in range(20):
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                time.sleep(0.05)
+        else:
+            os.close(fd)
+            return None
+    os.ftruncate(fd, 0)
+    os.write(fd, f"{os.getpid()}\n".encode())
+    return fd
+
+
+def _read_pid(fd: int) -> Optional[int]:
+    os.lseek(fd, 0, os.SEEK_SET)
+    try:
+        return int(os.read(fd, 32).decode().strip())
+    except ValueError:
+        return None
+
+
+def _is_server_process(pid: Optional[int]) -> bool:
+    """Check that pid is a live process running the bridge script, not an unrelated process that reused it."""
+    if pid is None:
+        return False
+    try:
+        cmdline = psutil.Process(pid).cmdline()
+    except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+        return False
+    return any(os.path.basename(arg) == SERVER_SCRIPT for arg in cmdline)
+
+
+def _remove_stale_files() -> None:
+    for path in (pid_file_path(), ready_file_path()):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def running_server_pid() -> Optional[int]:
+    """Return the pid of the running server, or None if no server holds the pidfile lock."""
+    try:
+        fd = os.open(pid_file_path(), os.O_RDONLY)
+    except FileNotFoundError:
+        return None
+    if fcntl is None:
+        try:
+            pid = _read_pid(fd)
+        finally:
+            # Windows cannot remove a file that is still open
+            os.close(fd)
+        if _is_server_process(pid):
+            return pid
+        # The server died without cleaning up, or its pid now belongs to another process
+        _remove_stale_files()
+        return None
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return _read_pid(fd)
+        # Nobody holds the lock, the pidfile is left over from a stopped server
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        return None
+    finally:
+        os.close(fd)
+
+
+def read_ready() -> Optional[Dict[str, Any]]:
+    """
+    Return the address published by the server once it accepts connections:
+    {"pid", "transport": "unix", "path"} or {"pid", "transport": "tcp", "host", "port"}
+    """
+    try:
+        with open(ready_file_path(), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError, OSError):
+        return None
+
+
+def mark_ready(address: Dict[str, Any]) -> None:
+    """Publish the address in the ready file and wake up the process waiting on the readiness pipe, if any."""
+    ready_file = ready_file_path()
+    tmp_path = f"{ready_file}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"pid": os.getpid(), **address}, f)
+    os.replace(tmp_path, ready_file)
+
+    ready_fd = os.environ.pop(READY_FD_ENV, None)
+    if ready_fd is not None:
+        try:
+            os.write(int(ready_fd), READY_MESSAGE)
+            os.close(int(ready_fd))
+        except (OSError, ValueError):
+            pass
+
+
+def clear_ready() -> None:
+    """Remove the ready file if it belongs to the current process."""
+    ready = read_ready()
+    if ready and ready.get("pid") == os.getpid():
+        try:
+            os.remove(ready_file_path())
+        except OSError:
+            pass
@@ -0,0 +1,97 @@
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from console_gpt.custom_stdout import custom_print
+
+from .mcp_tcp_client import MCPClient
+from .server_manager import ServerManager
+
+# A failed bootstrap is tried again by a later call once this many seconds have passed
+PREFETCH_RETRY_SECONDS = 30.0
+
+# One successful bootstrap per process: the result is shared by every conversation
+_prefetch_future: Optional[Future] = None
+_prefetch_failed_at = 0.0
+_prefetch_lock = threading.Lock()
+_errors_reported = False
+
+
+class MCPPrefetchError(Exception):
+    pass
+
+
+def _bootstrap() -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Start the MCP server if needed and discover its tools without printing over the menus."""
+    server_manager = ServerManager(silent=True)
+    if not server_manager.is_server_running():
+        success, message = server_manager.start_server()
+        if not success:
+            MCPClient._server_failed = True
+            raise MCPPrefetchError(f"Failed to start MCP server: {message}")
+    # The server may be up on a retry after an earlier failure
+    MCPClient._server_failed = False
+
+    with MCPClient(auto_start=False, silent=True) as mcp:
+        if mcp is not None:
+            return mcp.fetch_tools()
+    raise MCPPrefetchError("Could not establish connection to MCP server.")
+
+
+def start_tool_prefetch() -> None:
+    """
+    Kick off MCP server start and tool discovery in the background.
+    Safe to call repeatedly, only the first call spawns the bootstrap. After a failure, the first call
+    PREFETCH_RETRY_SECONDS later spawns a new one, so a long-running process recovers once the server is up.
+    """
+    global _prefetch_future, _errors_reported
+    with _prefetch_lock:
+        if _prefetch_future is not None:
+            if not _prefetch_future.done() or _prefetch_future.exception() is None:
+                return
+            if time.monotonic() - _prefetch_failed_at < PREFETCH_RETRY_SECONDS:
+                return
+        future = Future()
+        _prefetch_future = future
+        _errors_reported = False
+
+    def _run() -> None:
+        global _prefetch_failed_at
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(_bootstrap())
+        except BaseException as e:
+            _prefetch_failed_at = time.monotonic()
+            future.set_exception(e)
+
+    # Daemon thread so leaving the app from a menu never waits for a slow MCP server
+    threading.Thread(target=_run, name="mcp-prefetch", daemon=True).start()
+
+
+def get_prefetched_tools() -> Optional[List[Dict[str, Any]]]:
+    """
+    Wait for the background bootstrap (starting it if needed) and return the cached tool list
+    :return: list of tools or None if the MCP server is not available
+    """
+    global _errors_reported
+    start_tool_prefetch()
+    try:
+        tools, initialization_errors = _prefetch_future.result()
+    except MCPPrefetchError as e:
+        if not _errors_reported:
+            _errors_reported = True
+            custom_print("error", str(e))
+        return None
+    except Exception as e:
+        if not _errors_reported:
+            _errors_reported = True
+            custom_print("error", f"MCP tools discovery failed: {e}")
+        return None
+
+    if not _errors_reported:
+        _errors_reported = True
+        for error in initialization_errors:
+            custom_print("error", f"Server '{error['server']}' failed to initialize: {error['error']}")
+    return list(tools)
@@ -0,0 +1,72 @@
+"""
+Wire formats of the MCP bridge, shared by the server script and the MCPClient.
+
+Every message is a 4-byte big-endian length followed by the encoded payload. Connections start in JSON, a client
+may then offer other formats with a "hello" request and both sides switch to the one the server picks.
+orjson produces the same bytes as the stdlib encoder, so it is used transparently whenever it is installed.
+"""
+
+import json
+from typing import Any, Callable, Dict, Iterable, List
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+FORMAT_JSON = "json"
+FORMAT_MSGPACK = "msgpack"
+HEADER_SIZE = 4
+
+
+class Codec:
+    def __init__(self, name: str, dumps: Callable[[Any], bytes], loads: Callable[[Any], Any]):
+        self.name = name
+        self.dumps = dumps
+        # Accepts bytes, bytearray or memoryview
+        self.loads = loads
+
+    def frame(self, message: Dict[str, Any]) -> bytes:
+        data = self.dumps(message)
+        return len(data).to_bytes(HEADER_SIZE, "big") + data
+
+
+def _json_dumps(message: Any) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(message)
+        except TypeError:  # Non-string keys or integers beyond 64 bits
+            pass
+    return json.dumps(message).encode()
+
+
+def _json_loads(data: Any) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(bytes(data) if isinstance(data, memoryview) else data)
+
+
+CODECS: Dict[str, Codec] = {FORMAT_JSON: Codec(FORMAT_JSON, _json_dumps, _json_loads)}
+if msgpack is not None:
+    CODECS[FORMAT_MSGPACK] = Codec(
+        FORMAT_MSGPACK,
+        lambda message: msgpack.packb(message, use_bin_type=True),
+        lambda data: msgpack.unpackb(data, raw=False),
+    )
+
+JSON_CODEC = CODECS[FORMAT_JSON]
+
+
+def supported_formats() -> List[str]:
+    """Formats available in this interpreter, most preferred first."""
+    return [name for name in (FORMAT_MSGPACK, FORMAT_JSON) if name in CODECS]
+
+
+def choose_codec(offered: Iterable[str]) -> Codec:
+    """Pick the first format offered by the peer that is available here, JSON otherwise."""
+    return next((CODECS[name] for name in offered if name in CODECS), JSON_CODEC)
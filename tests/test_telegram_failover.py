@@ -0,0 +1,65 @@
+import threading
+import time
+
+import console_gpt.failover as failover
+import console_gpt.telegram_bot as telegram_bot
+
+MODELS = {
+    "primary": {"model_name": "primary-model", "fallback_model": "fallback"},
+    "fallback": {"model_name": "fallback-model"},
+}
+
+
+class _CountingPool:
+    def __init__(self):
+        self.calls = []
+
+    def call_tools(self, calls, client_id, timeout):
+        self.calls.extend(name for name, _ in calls)
+        return ["sent" for _ in calls]
+
+
+def test_hedge_on_tool_enabled_session_runs_tool_once(monkeypatch):
+    pool = _CountingPool()
+    primary_done = threading.Event()
+    offered = {}
+
+    def fake_fetch_variable(*keys, **kwargs):
+        return MODELS[keys[1]] if len(keys) > 1 else MODELS
+
+    def fake_request_model_reply(session, debug_context=False, chat_id=0):
+        title = session["model"]["model_title"]
+        tools = telegram_bot._mcp_tools_for_chat(session, chat_id)
+        offered[title] = [tool["name"] for tool in tools]
+        if tools:
+            telegram_bot._run_mcp_tool_calls(chat_id, [("call-1", "send_email", "{}")], tools)
+        if title == "primary":
+            # Slower than its recent latencies, so the fallback is started as a hedge
+            time.sleep(0.5)
+            primary_done.set()
+        return f"{title} reply"
+
+    monkeypatch.setattr(telegram_bot, "fetch_variable", fake_fetch_variable)
+    monkeypatch.setattr(
+        telegram_bot,
+        "_config_defaults",
+        lambda: {"mcp_tools": True, "mcp_allowed_tools": ["*"], "mcp_chat_tools": {}, "mcp_tool_timeout": 5.0},
+    )
+    monkeypatch.setattr(telegram_bot, "get_prefetched_tools", lambda: [{"name": "send_email"}])
+    monkeypatch.setattr(telegram_bot, "shared_pool", lambda: pool)
+    monkeypatch.setattr(telegram_bot, "_request_model_reply", fake_request_model_reply)
+    monkeypatch.setattr(failover, "MIN_DEADLINE", 0.05)
+    monkeypatch.setattr(failover, "_health", {})
+    for _ in range(failover.MIN_SAMPLES):
+        failover.health_of("primary").record(0.01, True)
+
+    session = {
+        "model": dict(MODELS["primary"], model_title="primary"),
+        "conversation": [{"role": "user", "content": "mail the report"}],
+    }
+    reply = telegram_bot._request_reply_with_failover(session, chat_id=7)
+    assert primary_done.wait(5)
+
+    assert reply == "fallback reply"
+    assert offered == {"primary": ["send_email"], "fallback": []}
+    assert pool.calls == ["send_email"]
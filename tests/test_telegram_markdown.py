@@ -0,0 +1,51 @@
+import pytest
+
+from console_gpt.telegram_markdown import inline_to_html, markdown_to_html
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("***bi***", "<b><i>bi</i></b>"),
+        ("___bi___", "<b><i>bi</i></b>"),
+        ("**bold *it***", "<b>bold <i>it</i></b>"),
+        ("*it **bold***", "<i>it <b>bold</b></i>"),
+        ("***a** b*", "<b><i>a</i></b><i> b</i>"),
+        ("***a* b**", "<b><i>a</i> b</b>"),
+        ("~~**x~~**", "<s><b>x</b></s>"),
+        ("**~~x~~**", "<b><s>x</s></b>"),
+        ("**bold *both** italic*", "<b>bold <i>both</i></b><i> italic</i>"),
+        ("~~a**~~b**", "<s>a</s><b>b</b>"),
+    ],
+)
+def test_bold_italic_and_crossing_spans(text, expected):
+    assert inline_to_html(text) == expected
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["__init__", "call __init__.py", "__init__ and __del__", "snake_case_name", "2 * 3 * 4", "*****", "a***b"],
+)
+def test_literal_delimiters(text):
+    assert inline_to_html(text) == text
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("**a *b** c", "<b>a *b</b> c"),
+        ("~~**x~~ y", "<s>**x</s> y"),
+        ("__bold text__", "<b>bold text</b>"),
+        ("[**l**](https://e.org/?a=1&b=2)", '<a href="https://e.org/?a=1&amp;b=2"><b>l</b></a>'),
+        ("`x < *y*`", "<code>x &lt; *y*</code>"),
+    ],
+)
+def test_inline_formatting(text, expected):
+    assert inline_to_html(text) == expected
+
+
+def test_code_block_is_escaped_and_not_formatted():
+    text = "```py\nif a<b and **c**:\n  pass\n```\nafter ***x***"
+    assert markdown_to_html(text) == (
+        '<pre><code class="language-py">if a&lt;b and **c**:\n  pass</code></pre>\nafter <b><i>x</i></b>'
+    )